@@ -0,0 +1 @@
+"""Caching, checkpointing, tracing, rate limiting and load testing shared by the agents."""
@@ -0,0 +1,304 @@
+"""Two-tier cache: a bounded in-memory LRU tier backed by SQLite on disk."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "LLM_PRACTICE_CACHE_PATH", ".cache/llm_practice.sqlite3"
+)
+
+# Search results follow the recency window of the query: a search over the last
+# day goes stale faster than one over the last week.
+SEARCH_TTL_PER_DAY = 30 * 60
+DEFAULT_SEARCH_TTL = 60 * 60
+MAX_SEARCH_TTL = 24 * 60 * 60
+
+# Expired rows are only skipped on read, so they are deleted when a store is
+# opened and then at most this often while it is written to
+PURGE_INTERVAL = 60 * 60
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters of a cache."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        """The hits of every tier."""
+        return self.memory_hits + self.disk_hits + self.semantic_hits
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups that hit, 0 before any lookup."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class MemoryStore:
+    """Bounded in-memory LRU store with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        """Get a value, or None if it is missing or expired.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Any | None: The cached value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Set a value, evicting the least recently used entries over `maxsize`.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value to cache.
+            ttl (float | None): Seconds until the entry expires. None never expires.
+        """
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteStore:
+    """SQLite-backed store of text values with per-entry expiry."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, table: str = "cache") -> None:
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+        self.purge_expired()
+
+    def get(self, key: str) -> str | None:
+        """Get a value, or None if it is missing or expired.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            str | None: The cached value.
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> tuple[str, float | None] | None:
+        """Get a value with its expiry time, or None if it is missing or expired.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            tuple[str, float | None] | None: The cached value and its expiry time.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value, expires_at
+
+    def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        """Set a value.
+
+        Args:
+            key (str): The cache key.
+            value (str): The value to cache.
+            ttl (float | None): Seconds until the entry expires. None never expires.
+        """
+        now = time.time()
+        if now - self._purged_at >= PURGE_INTERVAL:
+            self.purge_expired()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        """Delete expired entries.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        self._purged_at = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)
+            )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+
+class TieredCache:
+    """Cache that reads the memory tier first and falls back to the disk tier."""
+
+    def __init__(
+        self,
+        memory: MemoryStore,
+        disk: SQLiteStore | None = None,
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ) -> None:
+        self.memory = memory
+        self.disk = disk
+        self.dumps = dumps
+        self.loads = loads
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Any | None:
+        """Get a value from the first tier that has it.
+
+        Disk hits are promoted to the memory tier for the rest of their TTL.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Any | None: The cached value.
+        """
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.memory_hits += 1
+            return value
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                raw, expires_at = entry
+                value = self.loads(raw)
+                ttl = expires_at - time.time() if expires_at is not None else None
+                self.memory.set(key, value, ttl)
+                self.stats.disk_hits += 1
+                return value
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Set a value in every tier.
+
+        Args:
+            key (str): The cache key.
+            value (Any): The value to cache.
+            ttl (float | None): Seconds until the entry expires. None never expires.
+        """
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, self.dumps(value), ttl)
+
+
+def make_key(*parts: Any) -> str:
+    """Build a content-addressed cache key from JSON-serializable parts.
+
+    Args:
+        *parts (Any): The values that identify the cached entry.
+
+    Returns:
+        str: The SHA-256 hex digest of the canonical JSON of `parts`.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def search_key(query: str, **params: Any) -> str:
+    """Build the cache key of a search from its normalized query and parameters.
+
+    Args:
+        query (str): The search query. Case and whitespace are ignored.
+        **params (Any): The search parameters, e.g. `topic`, `days`,
+            `max_results` and `include_raw_content`.
+
+    Returns:
+        str: The cache key.
+    """
+    return make_key("search", " ".join(query.lower().split()), params)
+
+
+def search_ttl(days: int | None) -> float:
+    """Get how long a search result stays fresh.
+
+    Args:
+        days (int | None): The recency window of the search in days.
+
+    Returns:
+        float: The TTL in seconds.
+    """
+    if days is None:
+        return DEFAULT_SEARCH_TTL
+    return min(days * SEARCH_TTL_PER_DAY, MAX_SEARCH_TTL)
+
+
+_search_cache: TieredCache | None = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> TieredCache:
+    """Get the process-wide search result cache.
+
+    Returns:
+        TieredCache: The shared search cache.
+    """
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = TieredCache(
+                    MemoryStore(maxsize=512),
+                    SQLiteStore(table="search_results"),
+                )
+    return _search_cache
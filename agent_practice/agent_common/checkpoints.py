@@ -0,0 +1,182 @@
+"""SQLite checkpoints of graph runs, so a failed or interrupted run can resume."""
+
+import contextlib
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph.state import CompiledStateGraph
+
+DEFAULT_CHECKPOINT_PATH = os.environ.get(
+    "LLM_PRACTICE_CHECKPOINT_PATH", ".cache/checkpoints.sqlite3"
+)
+# Finished runs are kept for inspection for a day. Unfinished runs can be resumed
+# for a few hours after they started, after which their searches are stale and
+# the same input starts over
+DEFAULT_FINISHED_TTL = 24 * 60 * 60
+DEFAULT_UNFINISHED_TTL = 6 * 60 * 60
+# A run that fails this many times after resuming fails the same way every time,
+# e.g. on a search without articles, so the next try starts over
+DEFAULT_MAX_RESUMES = 2
+
+
+class CheckpointStore:
+    """Checkpoint saver with a registry of one resumable thread per run input.
+
+    Every run gets a thread. A run whose input matches an unfinished thread
+    started within `unfinished_ttl` resumes that thread from its last completed
+    node, at most `max_resumes` times. A finished thread is never continued, so
+    a repeated input starts over. Old threads are deleted with their
+    checkpoints whenever a store is opened.
+    """
+
+    def __init__(
+        self,
+        saver: AsyncSqliteSaver,
+        finished_ttl: float = DEFAULT_FINISHED_TTL,
+        unfinished_ttl: float = DEFAULT_UNFINISHED_TTL,
+        max_resumes: int = DEFAULT_MAX_RESUMES,
+    ) -> None:
+        self.saver = saver
+        self.finished_ttl = finished_ttl
+        self.unfinished_ttl = unfinished_ttl
+        self.max_resumes = max_resumes
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def open(
+        cls, path: str = DEFAULT_CHECKPOINT_PATH, **options
+    ) -> AsyncIterator["CheckpointStore"]:
+        """Open the store on the running event loop and purge old threads.
+
+        The saver's connection belongs to the event loop it was opened on, so a
+        store is opened per `asyncio.run`, e.g. per Streamlit run.
+
+        Args:
+            path (str): The SQLite database file.
+            **options: Other keyword arguments of `CheckpointStore`.
+
+        Yields:
+            CheckpointStore: The store.
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        async with AsyncSqliteSaver.from_conn_string(path) as saver:
+            await saver.setup()
+            await saver.conn.execute(
+                "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, "
+                "run_key TEXT NOT NULL, updated_at REAL NOT NULL, finished INTEGER "
+                "NOT NULL DEFAULT 0)"
+            )
+            # Threads of stores created before these columns count as stale
+            async with saver.conn.execute("PRAGMA table_info(threads)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            for column in ("created_at REAL", "resumes INTEGER"):
+                if column.split()[0] not in columns:
+                    await saver.conn.execute(
+                        f"ALTER TABLE threads ADD COLUMN {column} NOT NULL DEFAULT 0"
+                    )
+            await saver.conn.execute(
+                "CREATE INDEX IF NOT EXISTS threads_run_key ON threads (run_key)"
+            )
+            await saver.conn.commit()
+            store = cls(saver, **options)
+            await store.purge()
+            yield store
+
+    def attach(self, graph: CompiledStateGraph) -> CompiledStateGraph:
+        """Get a copy of a compiled graph that checkpoints to this store."""
+        return graph.copy(update={"checkpointer": self.saver})
+
+    async def thread(
+        self, graph: CompiledStateGraph, run_key: str
+    ) -> tuple[RunnableConfig, bool]:
+        """Get the thread to run an input on, and whether it resumes a run.
+
+        Args:
+            graph (CompiledStateGraph): The graph, attached to this store.
+            run_key (str): What identifies the run input, e.g. a hash of it.
+
+        Returns:
+            tuple[RunnableConfig, bool]: The run config with the thread ID, and
+                whether the run should resume with a None input.
+        """
+        now = time.time()
+        async with self.saver.conn.execute(
+            "SELECT thread_id, resumes FROM threads WHERE run_key = ? AND finished = 0 "
+            "AND created_at > ? ORDER BY updated_at DESC LIMIT 1",
+            (run_key, now - self.unfinished_ttl),
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if row is not None:
+            thread_id, resumes = row
+            config = {"configurable": {"thread_id": thread_id}}
+            snapshot = await graph.aget_state(config)
+            if resumes >= self.max_resumes:
+                # Resuming failed every time, so start over
+                await self.finish(config)
+            elif snapshot.next:
+                await self._resume(thread_id)
+                return config, True
+            elif not snapshot.values:
+                # The run stopped before its first checkpoint
+                await self._resume(thread_id)
+                return config, False
+            else:
+                # The run finished but was not marked, e.g. the app stopped at the end
+                await self.finish(config)
+
+        thread_id = uuid.uuid4().hex
+        await self.saver.conn.execute(
+            "INSERT INTO threads (thread_id, run_key, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (thread_id, run_key, now, now),
+        )
+        await self.saver.conn.commit()
+        return {"configurable": {"thread_id": thread_id}}, False
+
+    async def _resume(self, thread_id: str) -> None:
+        await self.saver.conn.execute(
+            "UPDATE threads SET updated_at = ?, resumes = resumes + 1 "
+            "WHERE thread_id = ?",
+            (time.time(), thread_id),
+        )
+        await self.saver.conn.commit()
+
+    async def finish(self, config: RunnableConfig) -> None:
+        """Mark the thread of a run as finished, so its input starts over next time.
+
+        Args:
+            config (RunnableConfig): The run config with the thread ID.
+        """
+        await self.saver.conn.execute(
+            "UPDATE threads SET finished = 1, updated_at = ? WHERE thread_id = ?",
+            (time.time(), config["configurable"]["thread_id"]),
+        )
+        await self.saver.conn.commit()
+
+    async def purge(self) -> int:
+        """Delete old threads with their checkpoints.
+
+        Returns:
+            int: The number of deleted threads.
+        """
+        now = time.time()
+        async with self.saver.conn.execute(
+            "SELECT thread_id FROM threads WHERE (finished = 1 AND updated_at <= ?) "
+            "OR (finished = 0 AND created_at <= ?)",
+            (now - self.finished_ttl, now - self.unfinished_ttl),
+        ) as cursor:
+            thread_ids = [row[0] for row in await cursor.fetchall()]
+        for thread_id in thread_ids:
+            await self.saver.adelete_thread(thread_id)
+            await self.saver.conn.execute(
+                "DELETE FROM threads WHERE thread_id = ?", (thread_id,)
+            )
+        await self.saver.conn.commit()
+        return len(thread_ids)
@@ -0,0 +1,219 @@
+"""Load harness: throughput, latency percentiles and peak memory of graph runs."""
+
+import asyncio
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+# Measured values may drift this much from the baseline before they count as a
+# regression, since wall times of a shared machine are noisy
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class LoadResult:
+    """Measurements of the runs at one concurrency.
+
+    Attributes:
+        concurrency (int): The runs in flight at once.
+        runs (int): The runs measured.
+        errors (int): The runs that raised.
+        seconds (float): The wall time of all runs.
+        throughput (float): The runs completed per second.
+        p50 (float): The median seconds of a run.
+        p95 (float): The 95th percentile seconds of a run.
+        p99 (float): The 99th percentile seconds of a run.
+        peak_rss_mb (float): The peak resident memory of the process.
+    """
+
+    concurrency: int
+    runs: int
+    errors: int
+    seconds: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    peak_rss_mb: float
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Get the `q` percentile of values, interpolating between the closest two."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class RssSampler:
+    """Samples the resident memory of the process in a background thread.
+
+    `ru_maxrss` only grows over the life of the process, so it cannot tell the
+    peak of one concurrency from the peak of an earlier one. On Linux the
+    sampler reads `/proc/self/statm` instead and falls back to `ru_maxrss`
+    elsewhere.
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 0
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux reports kilobytes and macOS bytes
+            return peak if sys.platform == "darwin" else peak * 1024
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RssSampler":
+        self.peak = self._rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+async def run_load(
+    run_once: Callable[[int], Awaitable[object]], concurrency: int, runs: int
+) -> LoadResult:
+    """Run `runs` runs with at most `concurrency` in flight and measure them.
+
+    Args:
+        run_once (Callable[[int], Awaitable[object]]): Runs the graph once, given
+            the index of the run.
+        concurrency (int): The runs in flight at once.
+        runs (int): The number of runs.
+
+    Returns:
+        LoadResult: The measurements.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed(index: int) -> None:
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            try:
+                await run_once(index)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(i) for i in range(runs)))
+        seconds = time.perf_counter() - start
+    return LoadResult(
+        concurrency=concurrency,
+        runs=runs,
+        errors=errors,
+        seconds=round(seconds, 3),
+        throughput=round(len(latencies) / seconds, 3),
+        p50=round(percentile(latencies, 50), 4),
+        p95=round(percentile(latencies, 95), 4),
+        p99=round(percentile(latencies, 99), 4),
+        peak_rss_mb=round(rss.peak / 2**20, 1),
+    )
+
+
+def format_results(results: list[LoadResult]) -> str:
+    """Format results as a table, one row per concurrency."""
+    lines = [
+        f"{'concurrency':>11} {'runs':>5} {'errors':>6} {'runs/s':>8} "
+        f"{'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'peak RSS':>10}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.concurrency:>11} {result.runs:>5} {result.errors:>6} "
+            f"{result.throughput:>8.2f} {result.p50:>8.3f} {result.p95:>8.3f} "
+            f"{result.p99:>8.3f} {result.peak_rss_mb:>8.1f}MB"
+        )
+    return "\n".join(lines)
+
+
+def save_baseline(path: Path, results: list[LoadResult], config: dict) -> None:
+    """Save results as the baseline of later runs with the same config."""
+    path.write_text(
+        json.dumps(
+            {"config": config, "results": [asdict(result) for result in results]},
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+
+def compare(
+    path: Path,
+    results: list[LoadResult],
+    config: dict,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> list[str]:
+    """Compare results with a saved baseline.
+
+    A run regresses when it has errors, when its throughput drops or its p95
+    latency grows by more than `tolerance`, or when its peak memory grows by
+    more than twice `tolerance`.
+
+    Args:
+        path (Path): The baseline file.
+        results (list[LoadResult]): The results to check.
+        config (dict): The config of the results, which must match the baseline.
+        tolerance (float): The allowed relative drift.
+
+    Returns:
+        list[str]: The regressions found, empty if none.
+    """
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    if baseline["config"] != config:
+        raise ValueError(
+            f"The baseline was measured with {baseline['config']}, not {config}."
+        )
+    expected = {result["concurrency"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = expected.get(result.concurrency)
+        if base is None:
+            continue
+        label = f"concurrency {result.concurrency}"
+        if result.errors:
+            regressions.append(f"{label}: {result.errors} runs failed")
+        if result.throughput < base["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: throughput {result.throughput:.2f} runs/s, "
+                f"baseline {base['throughput']:.2f}"
+            )
+        if result.p95 > base["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: p95 {result.p95:.3f}s, baseline {base['p95']:.3f}s"
+            )
+        if result.peak_rss_mb > base["peak_rss_mb"] * (1 + 2 * tolerance):
+            regressions.append(
+                f"{label}: peak RSS {result.peak_rss_mb:.1f}MB, "
+                f"baseline {base['peak_rss_mb']:.1f}MB"
+            )
+    return regressions
@@ -0,0 +1,473 @@
+"""Process-wide scheduler of outbound requests to the LLM, search and data providers.
+
+Every provider gets one `AdaptiveLimiter`, shared by all graph runs in the
+process, which admits a request once
+
+- the requests in flight are below its adaptive concurrency limit,
+- its requests-per-minute and tokens-per-minute buckets cover the request, and
+- no waiting request has a higher priority or was queued earlier.
+
+The concurrency limit grows by one per limit's worth of good responses and
+shrinks when a provider answers with a 429 or its latency per token climbs
+(AIMD), so a limiter settles on what the provider actually sustains instead of
+a fixed guess. Failed requests are retried with jittered exponential backoff.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from agent_common.tracing import event
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priorities, lower first: interactive runs are admitted before batch jobs
+INTERACTIVE = 0
+BATCH = 10
+
+# Buckets hold this many seconds of their rate, so a burst cannot drain a minute
+BURST_SECONDS = 10.0
+# A latency this many times the long-term average counts as congestion. The
+# latency of a request with a token estimate is taken per this many tokens, so
+# a long completion is not mistaken for a slow provider
+SLOW_FACTOR = 1.5
+LATENCY_TOKENS = 1000
+# The limit shrinks by these factors, at most once per cooldown
+SLOW_DECREASE = 0.9
+RATE_LIMIT_DECREASE = 0.5
+DECREASE_COOLDOWN = 2.0
+# Backoff of retries, in seconds
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+MAX_RETRIES = 5
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "priority", default=INTERACTIVE
+)
+
+
+def _env_float(name: str, default: float | None) -> float | None:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return float(value) if value else None
+
+
+@dataclass(frozen=True)
+class Limits:
+    """Limits of the requests to one provider.
+
+    Attributes:
+        max_concurrency (int): The most requests in flight at once.
+        min_concurrency (int): The fewest requests in flight the limit shrinks to.
+        rpm (float | None): The requests per minute, unlimited if None.
+        tpm (float | None): The tokens per minute, unlimited if None.
+    """
+
+    max_concurrency: int
+    min_concurrency: int = 1
+    rpm: float | None = None
+    tpm: float | None = None
+
+
+# The LLM and search defaults match the lowest paid tiers of OpenAI and Tavily
+DEFAULT_LIMITS = {
+    "llm": Limits(
+        max_concurrency=int(os.environ.get("LLM_PRACTICE_LLM_CONCURRENCY", "16")),
+        rpm=_env_float("LLM_PRACTICE_LLM_RPM", 500),
+        tpm=_env_float("LLM_PRACTICE_LLM_TPM", 200_000),
+    ),
+    "search": Limits(
+        max_concurrency=int(os.environ.get("LLM_PRACTICE_SEARCH_CONCURRENCY", "8")),
+        rpm=_env_float("LLM_PRACTICE_SEARCH_RPM", 100),
+    ),
+    "market_data": Limits(
+        max_concurrency=int(
+            os.environ.get("LLM_PRACTICE_MARKET_DATA_CONCURRENCY", "4")
+        ),
+        rpm=_env_float("LLM_PRACTICE_MARKET_DATA_RPM", 120),
+    ),
+}
+
+
+@contextlib.contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the requests made in the block, and the tasks it starts, at a priority.
+
+    Args:
+        level (int): The priority, e.g. `INTERACTIVE` or `BATCH`. Lower goes first.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(*texts: str, completion: int = 0) -> int:
+    """Estimate the tokens of a request from its prompt texts, at 4 characters each.
+
+    Args:
+        *texts (str): The prompt texts.
+        completion (int): The tokens expected in the response.
+
+    Returns:
+        int: The estimated tokens.
+    """
+    return sum(len(text) for text in texts) // 4 + completion
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Check if an error is a provider's rate limit response (HTTP 429)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    name = type(error).__name__
+    # e.g. Tavily's UsageLimitExceededError and yfinance's YFRateLimitError
+    return "RateLimit" in name or "UsageLimit" in name or "429" in str(error)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Check if a request that failed with an error may succeed when retried.
+
+    Besides rate limits, these are timeouts, dropped connections and server
+    errors, which the OpenAI client would otherwise retry on its own.
+    """
+    if is_rate_limited(error) or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and (status in (408, 409) or status >= 500):
+        return True
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Get the seconds a rate limit response asks to wait, if it says."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` per second, up to `BURST_SECONDS` of its rate."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Get the seconds until `amount` can be taken, 0 if it can be now."""
+        self._refill(now)
+        # A request larger than the bucket waits for a full bucket
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Take `amount` out of the bucket, which may go negative."""
+        self.level -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    wake: Callable[[], None] = dataclasses.field(compare=False)
+    tokens: int = dataclasses.field(compare=False, default=0)
+    cancelled: bool = dataclasses.field(compare=False, default=False)
+
+
+class AdaptiveLimiter:
+    """Admits the requests to one provider across every graph run in the process.
+
+    A graph's `max_concurrency` only bounds the tasks of one run, so many runs
+    at once can still flood a provider. The state is guarded by a thread lock,
+    so async requests from any event loop, e.g. the new loop Streamlit starts
+    per run, and sync requests from tool threads share the same limits.
+    """
+
+    def __init__(self, limits: Limits, name: str = "") -> None:
+        self.limits = limits
+        self.name = name
+        self.limit = float(limits.max_concurrency)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._requests = TokenBucket(limits.rpm) if limits.rpm else None
+        self._tokens = TokenBucket(limits.tpm) if limits.tpm else None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._samples = 0
+        self._short_latency = 0.0
+        self._long_latency = 0.0
+
+    # Admission, with the lock held
+
+    def _head(self) -> _Waiter | None:
+        while self._waiters and self._waiters[0].cancelled:
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    def _wake_head(self) -> None:
+        head = self._head()
+        if head is not None:
+            head.wake()
+
+    def _try_admit(self, waiter: _Waiter) -> float | None:
+        """Admit the waiter if it can go now.
+
+        Returns:
+            float | None: 0 if admitted, else the seconds to wait before trying
+                again, or None to wait until woken by a release.
+        """
+        if self._head() is not waiter or self.in_flight >= int(self.limit):
+            return None
+        now = time.monotonic()
+        delay = self._paused_until - now
+        for bucket, amount in ((self._requests, 1), (self._tokens, waiter.tokens)):
+            if bucket is not None and amount:
+                delay = max(delay, bucket.delay(amount, now))
+        if delay > 0:
+            return delay
+        for bucket, amount in ((self._requests, 1), (self._tokens, waiter.tokens)):
+            if bucket is not None and amount:
+                bucket.take(amount)
+        heapq.heappop(self._waiters)
+        self.in_flight += 1
+        # The next waiter may fit too
+        self._wake_head()
+        return 0.0
+
+    def _enqueue(self, wake: Callable[[], None], tokens: int) -> _Waiter:
+        waiter = _Waiter(_priority.get(), next(self._seq), wake, tokens)
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+        return waiter
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        with self._lock:
+            waiter.cancelled = True
+            self._wake_head()
+
+    def _decrease(self, factor: float, now: float) -> None:
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.limits.min_concurrency), self.limit * factor)
+        logger.debug("%s limit decreased to %.1f", self.name, self.limit)
+
+    def _release(
+        self, latency: float | None, error: BaseException | None, tokens: int = 0
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            if error is not None and is_rate_limited(error):
+                self._decrease(RATE_LIMIT_DECREASE, now)
+                pause = retry_after(error) or BACKOFF_BASE
+                self._paused_until = max(self._paused_until, now + pause)
+            elif latency is not None:
+                # Compare the recent latency to the long-term one, so only a
+                # sustained rise counts. Runs go from short to long requests, so
+                # requests with a token estimate are compared per token
+                if tokens:
+                    latency *= LATENCY_TOKENS / tokens
+                self._samples += 1
+                if self._samples == 1:
+                    self._short_latency = self._long_latency = latency
+                self._short_latency += 0.2 * (latency - self._short_latency)
+                self._long_latency += 0.02 * (latency - self._long_latency)
+                if self._samples > 10 and (
+                    self._short_latency > SLOW_FACTOR * self._long_latency
+                ):
+                    self._decrease(SLOW_DECREASE, now)
+                else:
+                    self.limit = min(
+                        float(self.limits.max_concurrency), self.limit + 1 / self.limit
+                    )
+            self._wake_head()
+
+    # Waiting for admission
+
+    async def _acquire(self, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake() -> None:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:  # The loop of an abandoned waiter is closed
+                pass
+
+        start = time.perf_counter()
+        waiter = self._enqueue(wake, tokens)
+        try:
+            while True:
+                with self._lock:
+                    ready.clear()
+                    delay = self._try_admit(waiter)
+                if delay == 0:
+                    break
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(ready.wait(), delay)
+        except BaseException:
+            self._cancel(waiter)
+            raise
+        event("queue_wait", limiter=self.name, seconds=time.perf_counter() - start)
+
+    def _acquire_sync(self, tokens: int) -> None:
+        ready = threading.Event()
+        start = time.perf_counter()
+        waiter = self._enqueue(ready.set, tokens)
+        try:
+            while True:
+                with self._lock:
+                    ready.clear()
+                    delay = self._try_admit(waiter)
+                if delay == 0:
+                    break
+                ready.wait(delay)
+        except BaseException:
+            self._cancel(waiter)
+            raise
+        event("queue_wait", limiter=self.name, seconds=time.perf_counter() - start)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tokens: int = 0) -> AsyncIterator[None]:
+        """Wait for admission and hold a slot for the duration of the block.
+
+        Args:
+            tokens (int): The tokens the request is expected to use.
+        """
+        await self._acquire(tokens)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as error:
+            self._release(None, error)
+            raise
+        self._release(time.perf_counter() - start, None, tokens)
+
+    @contextlib.contextmanager
+    def slot_sync(self, tokens: int = 0) -> Iterator[None]:
+        """Blocking `slot`, for requests made from threads."""
+        self._acquire_sync(tokens)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as error:
+            self._release(None, error)
+            raise
+        self._release(time.perf_counter() - start, None, tokens)
+
+    # Requests with retries
+
+    @staticmethod
+    def backoff(attempt: int, error: BaseException) -> float:
+        """Get the seconds to wait before retrying a failed request.
+
+        The wait honours the provider's Retry-After, else is drawn uniformly up
+        to an exponentially growing cap, so retries of concurrent requests do
+        not arrive together.
+        """
+        wait = retry_after(error)
+        if wait is not None:
+            return wait + random.uniform(0, BACKOFF_BASE)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+    async def call(self, request: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Make a request once admitted, retrying it while it fails transiently.
+
+        Args:
+            request (Callable[[], Awaitable[T]]): Makes the request.
+            tokens (int): The tokens the request is expected to use.
+
+        Returns:
+            T: The response.
+        """
+        for attempt in itertools.count():
+            try:
+                async with self.slot(tokens):
+                    return await request()
+            except Exception as error:
+                if attempt >= MAX_RETRIES or not is_retryable(error):
+                    raise
+                wait = self.backoff(attempt, error)
+                logger.warning(
+                    "%s failed (%r), retrying in %.1fs", self.name, error, wait
+                )
+                await asyncio.sleep(wait)
+
+    def call_sync(self, request: Callable[[], T], tokens: int = 0) -> T:
+        """Blocking `call`, for requests made from threads."""
+        for attempt in itertools.count():
+            try:
+                with self.slot_sync(tokens):
+                    return request()
+            except Exception as error:
+                if attempt >= MAX_RETRIES or not is_retryable(error):
+                    raise
+                wait = self.backoff(attempt, error)
+                logger.warning(
+                    "%s failed (%r), retrying in %.1fs", self.name, error, wait
+                )
+                time.sleep(wait)
+
+
+_limiters: dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> AdaptiveLimiter:
+    """Get the process-wide limiter of a provider, creating it on first use.
+
+    Args:
+        name (str): The provider, "llm", "search" or "market_data".
+
+    Returns:
+        AdaptiveLimiter: The shared limiter.
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = AdaptiveLimiter(DEFAULT_LIMITS[name], name)
+    return limiter
+
+
+def set_limits(name: str, **limits: float | None) -> None:
+    """Change the limits of a provider, for the requests made after the call.
+
+    Args:
+        name (str): The provider, "llm", "search" or "market_data".
+        **limits: The fields of `Limits` to change.
+    """
+    with _limiters_lock:
+        DEFAULT_LIMITS[name] = dataclasses.replace(DEFAULT_LIMITS[name], **limits)
+        _limiters[name] = AdaptiveLimiter(DEFAULT_LIMITS[name], name)
@@ -0,0 +1,224 @@
+"""Response cache for chat models."""
+
+import json
+import threading
+import zlib
+from collections import deque
+from typing import Any, Callable
+
+import numpy as np
+from agent_common.cache import CacheStats, MemoryStore, SQLiteStore, make_key
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+EMBEDDING_DIM = 512
+# Hashed embeddings of longer texts fill most dimensions, so that even unrelated
+# texts of a few thousand words score above the semantic threshold. Texts of up
+# to this many words score about 0.5 when they share no words.
+SEMANTIC_MAX_WORDS = 200
+
+
+def hashed_embedding(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embed text locally with the hashing trick over words and word bigrams.
+
+    Args:
+        text (str): The text to embed.
+        dim (int): The embedding dimension.
+
+    Returns:
+        np.ndarray: The L2-normalized embedding.
+    """
+    words = text.lower().split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if features:
+        indices = [zlib.crc32(feature.encode("utf-8")) % dim for feature in features]
+        np.add.at(vector, indices, 1.0)
+        vector /= np.linalg.norm(vector)
+    return vector
+
+
+class SemanticTier:
+    """Near-duplicate lookup of the last prompt message over local embeddings.
+
+    Only prompts with the same model config and the same earlier messages (e.g.
+    the system prompt) are compared, so a match differs from the cached prompt
+    only in the wording of its last message. Nodes therefore keep the parts a
+    response must match exactly, e.g. the theme and language, out of the last
+    message. Last messages over `max_words` words are left to the exact tier.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], np.ndarray] = hashed_embedding,
+        threshold: float = 0.95,
+        maxsize: int = 256,
+        max_words: int = SEMANTIC_MAX_WORDS,
+    ) -> None:
+        self.embed = embed
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.max_words = max_words
+        self._entries: dict[str, deque[tuple[np.ndarray, RETURN_VAL_TYPE]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(prompt: str, llm_string: str) -> tuple[str, str]:
+        """Split a serialized prompt into its namespace key and last message."""
+        messages = json.loads(prompt)
+        last = messages[-1].get("kwargs", {}).get("content", "")
+        if not isinstance(last, str):
+            last = json.dumps(last, ensure_ascii=False)
+        return make_key(llm_string, messages[:-1]), last
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        """Find the response of the most similar cached prompt above the threshold.
+
+        Args:
+            prompt (str): The serialized prompt messages.
+            llm_string (str): The serialized model config.
+
+        Returns:
+            RETURN_VAL_TYPE | None: The cached generations.
+        """
+        namespace, text = self._split(prompt, llm_string)
+        if len(text.split()) > self.max_words:
+            return None
+        with self._lock:
+            entries = list(self._entries.get(namespace, ()))
+        if not entries:
+            return None
+        vectors = np.stack([vector for vector, _ in entries])
+        scores = vectors @ self.embed(text)
+        best = int(np.argmax(scores))
+        return entries[best][1] if scores[best] >= self.threshold else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Add a prompt and its response, unless its last message is too long.
+
+        Args:
+            prompt (str): The serialized prompt messages.
+            llm_string (str): The serialized model config.
+            return_val (RETURN_VAL_TYPE): The generations to cache.
+        """
+        namespace, text = self._split(prompt, llm_string)
+        if len(text.split()) > self.max_words:
+            return
+        vector = self.embed(text)
+        with self._lock:
+            entries = self._entries.setdefault(namespace, deque(maxlen=self.maxsize))
+            entries.append((vector, return_val))
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+class LLMResponseCache(BaseCache):
+    """Exact-match cache of chat model responses with an optional semantic tier.
+
+    LangChain keys lookups on the serialized prompt messages and the model's
+    `llm_string`, which holds the model name, temperature and bound tools, so each
+    structured-output schema gets its own entries. The memory backend keeps the
+    generations themselves, so a hit returns the already parsed message and its
+    tool-call arguments without deserializing anything.
+    """
+
+    def __init__(
+        self,
+        backend: MemoryStore | SQLiteStore,
+        ttl: float | None = None,
+        semantic: SemanticTier | None = None,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.semantic = semantic
+        self.stats = CacheStats()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        """Look up the response of a prompt.
+
+        Args:
+            prompt (str): The serialized prompt messages.
+            llm_string (str): The serialized model config.
+
+        Returns:
+            RETURN_VAL_TYPE | None: The cached generations.
+        """
+        value = self.backend.get(make_key(llm_string, prompt))
+        if value is not None:
+            if isinstance(self.backend, SQLiteStore):
+                self.stats.disk_hits += 1
+                return loads(value)
+            self.stats.memory_hits += 1
+            return value
+        if self.semantic is not None:
+            value = self.semantic.lookup(prompt, llm_string)
+            if value is not None:
+                self.stats.semantic_hits += 1
+                return value
+        self.stats.misses += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Cache the response of a prompt.
+
+        Args:
+            prompt (str): The serialized prompt messages.
+            llm_string (str): The serialized model config.
+            return_val (RETURN_VAL_TYPE): The generations to cache.
+        """
+        value = (
+            dumps(return_val) if isinstance(self.backend, SQLiteStore) else return_val
+        )
+        self.backend.set(make_key(llm_string, prompt), value, self.ttl)
+        if self.semantic is not None:
+            self.semantic.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Remove every cached response."""
+        self.backend.clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+
+    # Lookups are local and fast, so skip the executor hop of the default async API
+    async def alookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        """Look up a cached response without leaving the event loop."""
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ) -> None:
+        """Cache a response without leaving the event loop."""
+        self.update(prompt, llm_string, return_val)
+
+
+_llm_caches: dict[tuple[str, bool], LLMResponseCache] = {}
+_llm_caches_lock = threading.Lock()
+
+
+def get_llm_cache(backend: str = "memory", semantic: bool = False) -> LLMResponseCache:
+    """Get the process-wide LLM response cache of a backend.
+
+    Args:
+        backend (str): "memory" for an in-process LRU or "sqlite" to persist
+            responses on disk.
+        semantic (bool): Whether to also serve near-duplicate prompts.
+
+    Returns:
+        LLMResponseCache: The shared response cache.
+    """
+    key = (backend, semantic)
+    with _llm_caches_lock:
+        if key not in _llm_caches:
+            if backend == "memory":
+                store = MemoryStore(maxsize=1024)
+            elif backend == "sqlite":
+                store = SQLiteStore(table="llm_responses")
+            else:
+                raise ValueError(f"Unknown LLM cache backend: {backend}")
+            _llm_caches[key] = LLMResponseCache(
+                store, semantic=SemanticTier() if semantic else None
+            )
+        return _llm_caches[key]
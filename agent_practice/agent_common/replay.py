@@ -0,0 +1,467 @@
+"""Record/replay stand-ins of the chat model and Tavily, for offline runs.
+
+Every stand-in answers from a cassette of recorded responses. A request that is
+not in the cassette is recorded from the live service when the stand-in wraps
+one, and is otherwise answered with a synthetic response, so a run without a
+cassette needs no API keys at all. Latency and token counts are injected, so
+the graph around the stand-ins can be measured under realistic waits.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from agent_common.cache import make_key
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+    CallbackManagerForToolRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, ConfigDict, Field
+
+# Synthetic texts are made of these words, one token each
+FILLER_WORDS = (
+    "market investors growth quarter revenue policy analysts demand supply "
+    "shares outlook report earnings technology rates inflation"
+).split()
+
+
+def filler(tokens: int, seed: str = "") -> str:
+    """Make a deterministic text of about `tokens` tokens."""
+    offset = sum(seed.encode("utf-8")) % len(FILLER_WORDS)
+    words = [FILLER_WORDS[(offset + i) % len(FILLER_WORDS)] for i in range(tokens)]
+    # Break into sentences and paragraphs, like a model or an article would
+    lines = [" ".join(words[i : i + 60]) + "." for i in range(0, len(words), 60)]
+    return "\n\n".join(lines)
+
+
+class Cassette:
+    """Recorded responses of a service, keyed by request, in a JSON file.
+
+    Without a path, the cassette is empty and nothing is recorded.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._entries: dict[str, Any] = {}
+        if self.path is not None and self.path.exists():
+            self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        """Get a recorded response, or None."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, value: Any) -> None:
+        """Record a response."""
+        with self._lock:
+            self._entries[key] = value
+
+    def save(self) -> None:
+        """Write the responses to the cassette file."""
+        if self.path is None:
+            return
+        with self._lock:
+            payload = json.dumps(self._entries, ensure_ascii=False)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def sample_arguments(schema: dict, overrides: dict, items: int) -> dict:
+    """Make arguments that match the JSON schema of a tool.
+
+    Args:
+        schema (dict): The JSON schema of the tool parameters.
+        overrides (dict): Values of arguments by name, used as they are.
+        items (int): The number of items of array arguments.
+
+    Returns:
+        dict: The arguments.
+    """
+    definitions = schema.get("$defs", {})
+
+    def sample(node: dict, name: str) -> Any:
+        if "$ref" in node:
+            node = definitions[node["$ref"].rsplit("/", 1)[-1]]
+        if "enum" in node:
+            return node["enum"][0]
+        if "anyOf" in node:
+            return sample(node["anyOf"][0], name)
+        kind = node.get("type")
+        if kind == "object":
+            return {
+                key: overrides[key] if key in overrides else sample(value, key)
+                for key, value in node.get("properties", {}).items()
+            }
+        if kind == "array":
+            item = node.get("items", {})
+            if "enum" in item:
+                return list(item["enum"])[:items]
+            return [sample(item, f"{name} {i + 1}") for i in range(items)]
+        if kind in ("integer", "number"):
+            return node.get("default", 1)
+        if kind == "boolean":
+            return node.get("default", False)
+        return name.replace("_", " ")
+
+    return sample({**schema, "type": "object"}, "")
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model stand-in for `ChatOpenAI`.
+
+    A request is answered from the cassette, else by the `live` model when one
+    is given, which records the answer, else synthetically. A synthetic answer
+    is a call of the forced tool when the model is bound with a `tool_choice`,
+    e.g. for structured output, a call of every bound tool when the tools have
+    not been called since the last human message, and otherwise a text of
+    `output_tokens` tokens.
+
+    Every answer waits `latency` seconds before its first token and
+    `token_latency` seconds per output token.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model_name: str = "gpt-4o-mini"
+    latency: float = 0.0
+    token_latency: float = 0.0
+    output_tokens: int = 200
+    list_items: int = 5
+    # Arguments of synthetic tool calls by tool name, then argument name
+    arguments: dict[str, dict[str, Any]] = Field(default_factory=dict)
+    cassette: Cassette = Field(default_factory=Cassette, exclude=True)
+    live: BaseChatModel | None = Field(default=None, exclude=True)
+    tools: list[dict] = Field(default_factory=list)
+    tool_choice: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(
+        self, tools: list, tool_choice: Any = None, **kwargs: Any
+    ) -> "FakeChatModel":
+        """Bind tools, so the synthesized responses call them."""
+        return self.model_copy(
+            update={
+                "tools": [convert_to_openai_tool(tool) for tool in tools],
+                "tool_choice": tool_choice,
+            }
+        )
+
+    def _key(self, messages: list[BaseMessage]) -> str:
+        # Message and tool call IDs differ between runs, so they are left out
+        return make_key(
+            self.model_name,
+            [tool["function"]["name"] for tool in self.tools],
+            self.tool_choice,
+            [
+                (
+                    message.type,
+                    message.name,
+                    message.content,
+                    [
+                        (call["name"], call["args"])
+                        for call in getattr(message, "tool_calls", [])
+                    ],
+                )
+                for message in messages
+            ],
+        )
+
+    def _synthesize(self, messages: list[BaseMessage]) -> AIMessage:
+        prompt = "".join(str(message.content) for message in messages)
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": self.output_tokens,
+            "total_tokens": len(prompt) // 4 + self.output_tokens,
+        }
+        tools = self.tools
+        if tools and self.tool_choice not in (None, "auto", "none"):
+            forced = self.tool_choice
+            if isinstance(forced, dict):
+                forced = forced.get("function", {}).get("name")
+            tools = [
+                tool for tool in tools if tool["function"]["name"] == forced
+            ] or tools[:1]
+        else:
+            # Answer once the tools have been called after the last human message
+            for message in reversed(messages):
+                if isinstance(message, ToolMessage):
+                    tools = []
+                    break
+                if isinstance(message, HumanMessage):
+                    break
+        if not tools:
+            return AIMessage(
+                content=filler(self.output_tokens, prompt[-200:]),
+                usage_metadata=usage,
+            )
+        tool_calls = [
+            {
+                "name": tool["function"]["name"],
+                "args": sample_arguments(
+                    tool["function"].get("parameters", {}),
+                    self.arguments.get(tool["function"]["name"], {}),
+                    self.list_items,
+                ),
+                "id": f"call_{i}",
+            }
+            for i, tool in enumerate(tools)
+        ]
+        return AIMessage(content="", tool_calls=tool_calls, usage_metadata=usage)
+
+    def _lookup(self, messages: list[BaseMessage]) -> tuple[str, AIMessage | None]:
+        key = self._key(messages)
+        recorded = self.cassette.get(key)
+        if recorded is None:
+            return key, None
+        return key, messages_from_dict([recorded])[0]
+
+    def _live(self) -> BaseChatModel:
+        if not self.tools:
+            return self.live
+        return self.live.bind_tools(self.tools, tool_choice=self.tool_choice)
+
+    def _record(self, key: str, message: BaseMessage) -> AIMessage:
+        message = AIMessage(
+            content=message.content,
+            tool_calls=getattr(message, "tool_calls", []),
+            usage_metadata=getattr(message, "usage_metadata", None),
+        )
+        self.cassette.put(key, message_to_dict(message))
+        return message
+
+    def _wait(self, message: AIMessage) -> float:
+        tokens = (message.usage_metadata or {}).get("output_tokens", 0)
+        return self.latency + self.token_latency * tokens
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key, message = self._lookup(messages)
+        if message is None and self.live is not None:
+            message = self._record(key, self._live().invoke(messages))
+        message = message or self._synthesize(messages)
+        time.sleep(self._wait(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key, message = self._lookup(messages)
+        if message is None and self.live is not None:
+            message = self._record(key, await self._live().ainvoke(messages))
+        message = message or self._synthesize(messages)
+        await asyncio.sleep(self._wait(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> list[AIMessageChunk]:
+        """Split a message into the chunks a streaming model would send."""
+        if message.tool_calls:
+            return [
+                AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                        for i, call in enumerate(message.tool_calls)
+                    ],
+                    usage_metadata=message.usage_metadata,
+                )
+            ]
+        words = str(message.content).split(" ")
+        chunks = [
+            AIMessageChunk(content=word if i == 0 else " " + word)
+            for i, word in enumerate(words)
+        ]
+        chunks[-1].usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key, message = self._lookup(messages)
+        if message is None and self.live is not None:
+            message = self._record(key, self._live().invoke(messages))
+        message = message or self._synthesize(messages)
+        time.sleep(self.latency)
+        for chunk in self._chunks(message):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key, message = self._lookup(messages)
+        if message is None and self.live is not None:
+            message = self._record(key, await self._live().ainvoke(messages))
+        message = message or self._synthesize(messages)
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(message):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=chunk)
+
+
+class FakeSearch:
+    """Shared request handling of the Tavily stand-ins.
+
+    Synthetic results have `content_tokens` tokens of raw content each.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette | None = None,
+        live: Any | None = None,
+        latency: float = 0.0,
+        content_tokens: int = 800,
+    ) -> None:
+        self.cassette = cassette or Cassette()
+        self.live = live
+        self.latency = latency
+        self.content_tokens = content_tokens
+
+    def key(self, params: dict) -> str:
+        """Get the cassette key of a search."""
+        return make_key("tavily", params)
+
+    def synthesize(self, params: dict) -> dict:
+        """Make up a search response with stable, query-dependent results."""
+        query = params["query"]
+        count = params.get("max_results", 5)
+        results = [
+            {
+                "title": f"{query}: article {i + 1}",
+                "url": f"https://example.com/{make_key(query, i)[:12]}",
+                "content": filler(60, f"{query}{i}"),
+                "score": 1.0 - i / count,
+                "raw_content": (
+                    filler(self.content_tokens, f"{query}{i}")
+                    if params.get("include_raw_content")
+                    else None
+                ),
+            }
+            for i in range(count)
+        ]
+        images = (
+            [f"https://example.com/{make_key(query, i)[:12]}.png" for i in range(count)]
+            if params.get("include_images")
+            else []
+        )
+        return {"query": query, "results": results, "images": images}
+
+
+class FakeTavilyClient(FakeSearch):
+    """Stand-in for `TavilyClient`, wrapping a live client to record."""
+
+    def search(self, **params: Any) -> dict:
+        """Replay, record or synthesize a search response."""
+        key = self.key(params)
+        response = self.cassette.get(key)
+        if response is None and self.live is not None:
+            response = self.live.search(**params)
+            self.cassette.put(key, response)
+        time.sleep(self.latency)
+        return response or self.synthesize(params)
+
+
+class FakeAsyncTavilyClient(FakeSearch):
+    """Stand-in for `AsyncTavilyClient`, wrapping a live client to record."""
+
+    async def search(self, **params: Any) -> dict:
+        """Replay, record or synthesize a search response."""
+        key = self.key(params)
+        response = self.cassette.get(key)
+        if response is None and self.live is not None:
+            response = await self.live.search(**params)
+            self.cassette.put(key, response)
+        await asyncio.sleep(self.latency)
+        return response or self.synthesize(params)
+
+
+class SearchInput(BaseModel):
+    """Input of the fake search tool."""
+
+    query: str = Field(description="search query to look up")
+
+
+class FakeTavilySearchResults(BaseTool):
+    """Stand-in for the `TavilySearchResults` tool, wrapping a live tool to record."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    name: str = "tavily_search_results_json"
+    description: str = "A search engine. Input should be a search query."
+    args_schema: type[BaseModel] = SearchInput
+    max_results: int = 5
+    include_raw_content: bool = False
+    search: FakeSearch = Field(default_factory=FakeSearch, exclude=True)
+
+    def _run(
+        self, query: str, run_manager: CallbackManagerForToolRun | None = None
+    ) -> list[dict]:
+        params = {
+            "query": query,
+            "max_results": self.max_results,
+            "include_raw_content": self.include_raw_content,
+        }
+        key = self.search.key(params)
+        results = self.search.cassette.get(key)
+        if results is None and self.search.live is not None:
+            results = self.search.live.invoke({"query": query})
+            if isinstance(results, list):
+                self.search.cassette.put(key, results)
+        time.sleep(self.search.latency)
+        if results is None:
+            results = [
+                {"url": result["url"], "content": result["content"]}
+                for result in self.search.synthesize(params)["results"]
+            ]
+        return results
@@ -0,0 +1,523 @@
+"""Per-node latency, token, cost and cache tracing of graph runs.
+
+Tracing is off unless `LLM_PRACTICE_TRACE` is set, to "1" for the default sink
+or to the path of a JSON Lines file. Every finished run then appends its spans
+to the sink, one span per line with the fields of the OpenTelemetry span data
+model, and prints a waterfall of the run to stderr. To print the waterfalls of
+earlier runs:
+
+    python -m agent_common.tracing .cache/traces.jsonl --last 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import var_child_runnable_config
+
+DEFAULT_TRACE_PATH = ".cache/traces.jsonl"
+# USD per million input and output tokens. Models are matched by name prefix, so
+# dated snapshots share the price of their model
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+WATERFALL_WIDTH = 30
+
+# The span opened by `span` in the current context, if any
+_current_span: ContextVar[dict | None] = ContextVar("current_span", default=None)
+
+
+def price(model: str, input_tokens: int, output_tokens: int) -> float | None:
+    """Get the USD cost of an LLM call, or None for a model without a price."""
+    matches = [name for name in PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    input_price, output_price = PRICES[max(matches, key=len)]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class JsonlSink:
+    """Appends span records to a JSON Lines file, one trace at a time."""
+
+    def __init__(self, path: str | Path = DEFAULT_TRACE_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def write(self, records: list[dict]) -> None:
+        """Append span records as JSON lines."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class Tracer(BaseCallbackHandler):
+    """Callback handler that records the spans of graph runs.
+
+    A span is recorded for the root run, every graph node, including the nodes
+    of subgraphs, every LLM call and every tool call. Other runnables, e.g.
+    prompts and parsers, are folded into their nearest recorded ancestor. A run
+    is written to the sink as one trace when its root run ends.
+    """
+
+    # Record in the calling thread or event loop instead of an executor
+    run_inline = True
+
+    def __init__(self, sink: JsonlSink | None = None, summary: bool = True) -> None:
+        self.sink = sink
+        self.summary = summary
+        self._lock = threading.Lock()
+        # Every live run: the ID of its root run and of its nearest recorded span
+        self._runs: dict[UUID, tuple[UUID, UUID | None]] = {}
+        self._spans: dict[UUID, dict] = {}
+        # Every live trace: its span records and run IDs, in start order
+        self._traces: dict[UUID, tuple[list[dict], list[UUID]]] = {}
+
+    def _start(
+        self,
+        run_id: UUID,
+        parent_run_id: UUID | None,
+        name: str | None,
+        attributes: dict | None,
+    ) -> dict | None:
+        """Register a run, and open a span for it if `name` is given.
+
+        Returns:
+            dict | None: The record of the span, if one was opened.
+        """
+        with self._lock:
+            if parent_run_id is None:
+                root, parent = run_id, None
+                self._traces[root] = ([], [])
+            elif parent_run_id in self._runs:
+                root, parent = self._runs[parent_run_id]
+            else:
+                # The run belongs to a trace that started before the tracer
+                return None
+            records, run_ids = self._traces[root]
+            run_ids.append(run_id)
+            if name is None:
+                self._runs[run_id] = (root, parent)
+                return None
+            # Run IDs start with a timestamp, so span IDs take their random end
+            record = {
+                "trace_id": root.hex,
+                "span_id": run_id.hex[-16:],
+                "parent_span_id": parent.hex[-16:] if parent else None,
+                "name": name,
+                "start_time_unix_nano": time.time_ns(),
+                "end_time_unix_nano": None,
+                "attributes": attributes or {},
+                "events": [],
+                "status": {"code": "UNSET"},
+            }
+            records.append(record)
+            self._spans[run_id] = record
+            self._runs[run_id] = (root, run_id)
+            return record
+
+    def _end(
+        self,
+        run_id: UUID,
+        error: BaseException | None = None,
+        attributes: dict | None = None,
+    ) -> None:
+        """Close the span of a run, and write the trace if the run is the root."""
+        with self._lock:
+            record = self._spans.get(run_id)
+            if record is not None:
+                record["end_time_unix_nano"] = time.time_ns()
+                record["attributes"].update(attributes or {})
+                record["status"] = (
+                    {"code": "ERROR", "message": repr(error)}
+                    if error is not None
+                    else {"code": "OK"}
+                )
+            trace = self._traces.pop(run_id, None)
+            if trace is None:
+                return
+            records, run_ids = trace
+            for id_ in run_ids:
+                self._runs.pop(id_, None)
+                self._spans.pop(id_, None)
+        self.export(records)
+
+    def export(self, records: list[dict]) -> None:
+        """Write a finished trace to the sink and print its waterfall."""
+        if self.sink is not None:
+            self.sink.write(records)
+        if self.summary:
+            print(format_waterfall(records), file=sys.stderr, flush=True)
+
+    def add_event(self, run_id: UUID, name: str, attributes: dict) -> None:
+        """Add an event to the span of a run, or of its nearest recorded ancestor."""
+        with self._lock:
+            _, span_run_id = self._runs.get(run_id, (None, None))
+            record = self._spans.get(span_run_id)
+            if record is not None:
+                record["events"].append(
+                    {
+                        "name": name,
+                        "time_unix_nano": time.time_ns(),
+                        "attributes": attributes,
+                    }
+                )
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any] | None,
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start a span for a graph or node run."""
+        metadata = metadata or {}
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            attributes = {"span.type": "run"}
+            if "thread_id" in metadata:
+                attributes["langgraph.thread_id"] = metadata["thread_id"]
+            self._start(run_id, None, name or "run", attributes)
+        elif (
+            name is not None
+            and name == metadata.get("langgraph_node")
+            and not name.startswith("__")
+        ):
+            attributes = {
+                "span.type": "node",
+                "langgraph.step": metadata.get("langgraph_step"),
+            }
+            self._start(run_id, parent_run_id, name, attributes)
+        else:
+            self._start(run_id, parent_run_id, None, None)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """End the span of a graph or node run."""
+        self._end(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """End the span of a failed graph or node run."""
+        self._end(run_id, error)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any] | None,
+        messages: list,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start a span for an LLM call."""
+        metadata = metadata or {}
+        attributes = {
+            "span.type": "llm",
+            "gen_ai.request.model": metadata.get("ls_model_name"),
+        }
+        self._start(run_id, parent_run_id, kwargs.get("name") or "llm", attributes)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        """Record the time to the first streamed token."""
+        with self._lock:
+            record = self._spans.get(run_id)
+            if record is not None and "first_token_s" not in record["attributes"]:
+                record["attributes"]["first_token_s"] = (
+                    time.time_ns() - record["start_time_unix_nano"]
+                ) / 1e9
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        """End the span of an LLM call with its token usage."""
+        input_tokens = output_tokens = 0
+        cache_hit = False
+        model = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is None:
+                    continue
+                usage = message.usage_metadata or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                model = model or message.response_metadata.get("model_name")
+                # A cached response keeps the message ID of the run that made it
+                cache_hit = cache_hit or (
+                    message.id is not None and str(run_id) not in message.id
+                )
+        if not input_tokens and response.llm_output:
+            usage = response.llm_output.get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+
+        with self._lock:
+            record = self._spans.get(run_id)
+            model = model or (record or {}).get("attributes", {}).get(
+                "gen_ai.request.model"
+            )
+        attributes = {
+            "gen_ai.usage.input_tokens": input_tokens,
+            "gen_ai.usage.output_tokens": output_tokens,
+            "cache_hit": cache_hit,
+        }
+        if model:
+            attributes["gen_ai.response.model"] = model
+            cost = price(model, input_tokens, output_tokens)
+            # A cached response costs nothing
+            attributes["cost_usd"] = 0.0 if cache_hit else cost
+        self._end(run_id, attributes=attributes)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """End the span of a failed LLM call."""
+        self._end(run_id, error)
+
+    def on_tool_start(
+        self,
+        serialized: dict[str, Any] | None,
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Start a span for a tool call."""
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, name, {"span.type": "tool"})
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """End the span of a tool call."""
+        self._end(run_id)
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        """End the span of a failed tool call."""
+        self._end(run_id, error)
+
+
+_tracer: Tracer | None = None
+_tracer_lock = threading.Lock()
+_tracer_loaded = False
+
+
+def get_tracer() -> Tracer | None:
+    """Get the process-wide tracer, or None if `LLM_PRACTICE_TRACE` is not set.
+
+    Returns:
+        Tracer | None: The shared tracer.
+    """
+    global _tracer, _tracer_loaded
+    if not _tracer_loaded:
+        with _tracer_lock:
+            if not _tracer_loaded:
+                setting = os.environ.get("LLM_PRACTICE_TRACE", "").strip()
+                if setting.lower() not in ("", "0", "false", "no", "off"):
+                    path = (
+                        DEFAULT_TRACE_PATH
+                        if setting.lower() in ("1", "true", "yes", "on")
+                        else setting
+                    )
+                    _tracer = Tracer(JsonlSink(path))
+                _tracer_loaded = True
+    return _tracer
+
+
+def _current_run() -> tuple[Tracer, UUID] | None:
+    """Get the tracer of the current runnable context and the current run ID."""
+    config = var_child_runnable_config.get()
+    if not config:
+        return None
+    callbacks = config.get("callbacks")
+    run_id = getattr(callbacks, "parent_run_id", None)
+    if run_id is None:
+        return None
+    for handler in callbacks.handlers:
+        if isinstance(handler, Tracer):
+            return handler, run_id
+    return None
+
+
+def event(name: str, **attributes: Any) -> None:
+    """Record an event, e.g. a cache hit or a queue wait, on the current span.
+
+    The current span is the innermost `span` block, else the span of the node,
+    LLM call or tool call that is running. Without a tracer the call returns
+    right away.
+
+    Args:
+        name (str): The name of the event.
+        **attributes: The attributes of the event.
+    """
+    if _tracer is None:
+        return
+    record = _current_span.get()
+    if record is not None:
+        record["events"].append(
+            {"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes}
+        )
+        return
+    current = _current_run()
+    if current is not None:
+        tracer, run_id = current
+        tracer.add_event(run_id, name, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[dict]:
+    """Record a block that is not a runnable, e.g. a client call, as a span.
+
+    The span is a child of the current node, LLM call or tool call. Without a
+    tracer nothing is recorded.
+
+    Args:
+        name (str): The name of the span.
+        **attributes: The attributes of the span.
+
+    Yields:
+        dict: The attributes of the span, to add to inside the block.
+    """
+    current = _current_run() if _tracer is not None else None
+    if current is None:
+        yield attributes
+        return
+    tracer, parent_run_id = current
+    run_id = uuid4()
+    record = tracer._start(
+        run_id, parent_run_id, name, {"span.type": "span", **attributes}
+    )
+    if record is None:
+        yield attributes
+        return
+    token = _current_span.set(record)
+    try:
+        yield record["attributes"]
+    except BaseException as e:
+        tracer._end(run_id, e)
+        raise
+    else:
+        tracer._end(run_id)
+    finally:
+        _current_span.reset(token)
+
+
+def format_waterfall(records: list[dict]) -> str:
+    """Format the spans of one trace as a waterfall with per-span details.
+
+    Args:
+        records (list[dict]): The span records of the trace.
+
+    Returns:
+        str: The waterfall, one line per span in start order.
+    """
+    if not records:
+        return ""
+    records = sorted(records, key=lambda record: record["start_time_unix_nano"])
+    start = records[0]["start_time_unix_nano"]
+    end = max(
+        record["end_time_unix_nano"] or record["start_time_unix_nano"]
+        for record in records
+    )
+    total = max(end - start, 1)
+    depths = {}
+    for record in records:
+        depths[record["span_id"]] = depths.get(record["parent_span_id"], -1) + 1
+
+    llm_calls = [
+        record for record in records if record["attributes"].get("span.type") == "llm"
+    ]
+    tokens = sum(
+        record["attributes"].get("gen_ai.usage.input_tokens", 0)
+        + record["attributes"].get("gen_ai.usage.output_tokens", 0)
+        for record in llm_calls
+        if not record["attributes"].get("cache_hit")
+    )
+    cost = sum(record["attributes"].get("cost_usd") or 0.0 for record in llm_calls)
+    cached = sum(bool(record["attributes"].get("cache_hit")) for record in llm_calls)
+    waits = [
+        event["attributes"].get("seconds", 0.0)
+        for record in records
+        for event in record["events"]
+        if event["name"] == "queue_wait"
+    ]
+    lines = [
+        f"{records[0]['name']} {records[0]['trace_id'][-8:]}  {total / 1e9:.2f}s  "
+        f"{len(llm_calls)} LLM calls ({cached} cached)  {tokens:,} tokens  "
+        f"${cost:.4f}  queue {sum(waits):.2f}s"
+    ]
+    for record in records:
+        begin = record["start_time_unix_nano"] - start
+        duration = (record["end_time_unix_nano"] or end) - record[
+            "start_time_unix_nano"
+        ]
+        offset = min(round(begin / total * WATERFALL_WIDTH), WATERFALL_WIDTH - 1)
+        width = max(round(duration / total * WATERFALL_WIDTH), 1)
+        bar = (" " * offset + "█" * width)[:WATERFALL_WIDTH].ljust(WATERFALL_WIDTH)
+        name = "  " * depths[record["span_id"]] + record["name"]
+        lines.append(
+            f"{begin / 1e9:7.2f}s {duration / 1e9:7.2f}s |{bar}| {name:<36} "
+            f"{_details(record)}".rstrip()
+        )
+    return "\n".join(lines)
+
+
+def _details(record: dict) -> str:
+    """Summarize the tokens, cache hits, waits and errors of a span."""
+    attributes = record["attributes"]
+    details = []
+    if attributes.get("span.type") == "llm":
+        details.append(
+            f"{attributes.get('gen_ai.usage.input_tokens', 0):,}+"
+            f"{attributes.get('gen_ai.usage.output_tokens', 0):,} tokens"
+        )
+        if "first_token_s" in attributes:
+            details.append(f"first token {attributes['first_token_s']:.2f}s")
+    # Caches without a span of their own record their hits as events
+    if attributes.get("cache_hit") or any(
+        event["attributes"].get("hit") for event in record["events"]
+    ):
+        details.append("cached")
+    wait = sum(
+        event["attributes"].get("seconds", 0.0)
+        for event in record["events"]
+        if event["name"] == "queue_wait"
+    )
+    if wait >= 0.01:
+        details.append(f"queued {wait:.2f}s")
+    if record["status"]["code"] == "ERROR":
+        details.append("error")
+    return ", ".join(details)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the waterfalls of traces.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_TRACE_PATH)
+    parser.add_argument("--last", type=int, default=1, help="Traces to print.")
+    args = parser.parse_args()
+
+    traces: dict[str, list[dict]] = {}
+    with open(args.path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                traces.setdefault(record["trace_id"], []).append(record)
+    for records in list(traces.values())[-args.last :]:
+        print(format_waterfall(records), end="\n\n")
@@ -1,17 +1,76 @@
 """Streamlit app for the newsletter agent."""
 
 import asyncio
+import time
 
 import streamlit as st
+from agent_common.cache import make_key
+from agent_common.checkpoints import CheckpointStore
 from dotenv import load_dotenv
-from graph import create_newsletter_graph
+from events import ProgressEvent
+from graph import DEFAULT_MAX_SECTIONS, get_newsletter_graph
+from langchain_core.messages import AIMessageChunk
+
+# Seconds between redraws of a streaming text, so fast token streams are batched
+STREAM_REDRAW_INTERVAL = 0.05
+# Shown in place of a section whose sub-theme found no articles
+DROPPED_SECTION = "_No recent news found, so this section is left out._"
+
+
+class StreamingMarkdown:
+    """Markdown placeholder that shows LLM output as its tokens arrive."""
+
+    def __init__(self, placeholder) -> None:
+        self.placeholder = placeholder
+        self.buffer = ""
+        self.last_redraw = 0.0
+
+    def append(self, token: str) -> None:
+        """Append a token, redrawing at most every `STREAM_REDRAW_INTERVAL`."""
+        self.buffer += token
+        now = time.monotonic()
+        if now - self.last_redraw >= STREAM_REDRAW_INTERVAL:
+            self.placeholder.markdown(self.buffer + " ▌")
+            self.last_redraw = now
+
+    def finish(self, text: str) -> None:
+        """Replace the streamed tokens with the final text."""
+        self.buffer = text
+        self.placeholder.markdown(text)
+
+
+def render_progress_event(container, statuses: dict, event: ProgressEvent) -> None:
+    """Show a progress event in the status box of its step and key.
+
+    Args:
+        container: The Streamlit container the status boxes are added to.
+        statuses (dict): The status boxes shown so far, by step and key.
+        event (ProgressEvent): The event to show.
+    """
+    status = statuses.get((event.step, event.key))
+    if status is None:
+        status = statuses[(event.step, event.key)] = container.status(
+            event.message, expanded=False
+        )
+    status.update(label=event.message, state=event.status, expanded=False)
+    for item in event.items:
+        status.markdown(f"- {item}")
+
+
+def start_final_newsletter(container) -> StreamingMarkdown:
+    """Add the final newsletter heading and its streaming placeholder."""
+    with container:
+        st.markdown("## Final Newsletter")
+        return StreamingMarkdown(st.empty())
 
 
 async def run_graph(inputs: dict) -> None:
-    """Run the newsletter graph."""
-
-    graph = create_newsletter_graph()
+    """Run the newsletter graph.
 
+    Node updates drive the progress, progress events of the nodes are shown in
+    status boxes, and the tokens of each section and of the
+    final edit are streamed into their placeholders as the LLM writes them.
+    """
     # Create a status container for progress tracking
     status_container = st.container()
 
@@ -26,38 +85,123 @@ async def run_graph(inputs: dict) -> None:
         with st.expander("Detailed Progress", expanded=True):
             search_status = st.empty()
             theme_status = st.empty()
-            subtheme_status = st.empty()
             write_status = st.empty()
             aggregate_status = st.empty()
             edit_status = st.empty()
 
+    # Progress of the work inside nodes, e.g. one status box per sub-theme search
+    progress_container = st.container()
+    progress_statuses = {}
+
+    # Sections stream in parallel once the sub-themes are known, and the final
+    # newsletter streams below them
+    sections_container = st.container()
+    sections: dict[str, StreamingMarkdown] = {}
+
+    def add_sections(sub_themes: list[str]) -> None:
+        with sections_container:
+            for sub_theme in sub_themes:
+                with st.expander(sub_theme, expanded=True):
+                    sections[sub_theme] = StreamingMarkdown(st.empty())
+
+    draft_container = st.container()
+    final_container = st.container()
+    final_newsletter: StreamingMarkdown | None = None
+
     step = 0
-    total_steps = 10  # Total number of steps in our graph
+    # search, themes, aggregate and edit, plus one step per section, which
+    # searches its sub-theme and writes, once the number of sub-themes is known
+    fixed_steps = 4
+    total_steps = fixed_steps + inputs.get("max_sections", DEFAULT_MAX_SECTIONS)
+    sections_written = 0
 
     try:
-        async for output in graph.astream(inputs):
-            for key, value in output.items():
-                step += 1
-                progress_bar.progress(step / total_steps)
-                status_text.text(f"Current Step: {key}")
-
-                # Update detailed status based on the current step
-                if key == "search_news":
-                    search_status.success("✅ Article search is completed!")
-                elif key == "generate_themes":
-                    theme_status.success("✅ Theme generation is completed!")
-                elif key == "search_sub_theme_articles":
-                    subtheme_status.success("✅ Sub-theme research is completed!")
-                elif key.startswith("write_section"):
-                    write_status.success(f"✅ Section {key[-1]} is written!")
-                elif key == "aggregate":
-                    aggregate_status.success("✅ Draft compilation is completed!")
-                    with st.expander("Draft Newsletter", expanded=False):
-                        st.markdown(value["messages"][0].content)
-                elif key == "edit_newsletter":
-                    edit_status.success("✅ Final editing is completed!")
-                    st.markdown("## Final Newsletter")
-                    st.markdown(value["messages"][0].content)
+        async with CheckpointStore.open() as checkpoints:
+            graph = checkpoints.attach(get_newsletter_graph())
+            config, resume = await checkpoints.thread(
+                graph, make_key("newsletter", inputs)
+            )
+            if resume:
+                # Show what the interrupted run already finished
+                values = (await graph.aget_state(config)).values
+                status_text.info("Resuming the previous run from its last step.")
+                if "newsletter_theme" in values:
+                    sub_themes = values["newsletter_theme"].sub_themes
+                    total_steps = fixed_steps + len(sub_themes)
+                    add_sections(sub_themes)
+                    for sub_theme, content in values.get("results", {}).items():
+                        if sub_theme in sections:
+                            sections[sub_theme].finish(content or DROPPED_SECTION)
+
+            async for mode, chunk in graph.astream(
+                None if resume else inputs,
+                config,
+                stream_mode=["updates", "messages", "custom"],
+            ):
+                if mode == "custom":
+                    if isinstance(chunk, ProgressEvent):
+                        render_progress_event(
+                            progress_container, progress_statuses, chunk
+                        )
+                    continue
+                if mode == "messages":
+                    message, metadata = chunk
+                    # Only answer tokens are shown, not structured output
+                    if not (
+                        isinstance(message, AIMessageChunk)
+                        and isinstance(message.content, str)
+                        and message.content
+                    ):
+                        continue
+                    node_name = metadata.get("langgraph_node")
+                    if node_name == "write_section":
+                        section = sections.get(metadata.get("sub_theme"))
+                        if section:
+                            section.append(message.content)
+                    elif node_name == "edit_newsletter":
+                        if final_newsletter is None:
+                            final_newsletter = start_final_newsletter(final_container)
+                        final_newsletter.append(message.content)
+                    continue
+
+                for key, value in chunk.items():
+                    step += 1
+                    if key == "generate_themes":
+                        num_sections = len(value["newsletter_theme"].sub_themes)
+                        total_steps = fixed_steps + num_sections
+                    progress_bar.progress(min(step / total_steps, 1.0))
+                    status_text.text(f"Current Step: {key}")
+
+                    # Update detailed status based on the current step
+                    if key == "search_news":
+                        search_status.success("✅ Article search is completed!")
+                    elif key == "generate_themes":
+                        theme_status.success("✅ Theme generation is completed!")
+                        add_sections(value["newsletter_theme"].sub_themes)
+                    elif key == "write_section":
+                        for sub_theme, content in value["results"].items():
+                            if sub_theme in sections:
+                                sections[sub_theme].finish(content or DROPPED_SECTION)
+                        sections_written += 1
+                        total_sections = total_steps - fixed_steps
+                        write_status.success(
+                            f"✅ {sections_written}/{total_sections} sections are written!"
+                        )
+                    elif key == "aggregate":
+                        aggregate_status.success("✅ Draft compilation is completed!")
+                        with (
+                            draft_container,
+                            st.expander("Draft Newsletter", expanded=False),
+                        ):
+                            st.markdown(value["messages"][0].content)
+                    elif key == "edit_newsletter":
+                        edit_status.success("✅ Final editing is completed!")
+                        # Cached responses arrive whole, without streamed tokens
+                        if final_newsletter is None:
+                            final_newsletter = start_final_newsletter(final_container)
+                        final_newsletter.finish(value["messages"][0].content)
+
+            await checkpoints.finish(config)
 
         status_text.success("Newsletter generation completed!")
 
@@ -81,10 +225,24 @@ if __name__ == "__main__":
         ["Korean", "English"],
         index=0,
     )
+    max_sections = st.number_input(
+        "Number of sections:",
+        min_value=1,
+        max_value=10,
+        value=DEFAULT_MAX_SECTIONS,
+    )
 
     if keyword.strip() == "":
         st.warning("Please enter a valid keyword.")
         st.stop()
 
     if st.button("Generate Newsletter"):
-        asyncio.run(run_graph({"keyword": keyword, "language": language}))
+        asyncio.run(
+            run_graph(
+                {
+                    "keyword": keyword,
+                    "language": language,
+                    "max_sections": int(max_sections),
+                }
+            )
+        )
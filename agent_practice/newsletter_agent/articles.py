@@ -0,0 +1,85 @@
+"""Content-addressed store of article texts, referenced from graph state by hash."""
+
+import hashlib
+import threading
+
+from agent_common.cache import MemoryStore, SQLiteStore, TieredCache
+
+# Articles outlive the unfinished runs that reference them, which can resume for
+# up to a week
+ARTICLE_TTL = 8 * 24 * 60 * 60
+
+
+class ArticleStore:
+    """Article texts stored once by content hash.
+
+    Graph state only carries the `content_id` of an article, so checkpoints and
+    section tasks stay small however long the articles are.
+    """
+
+    def __init__(self, cache: TieredCache, ttl: float | None = ARTICLE_TTL) -> None:
+        self.cache = cache
+        self.ttl = ttl
+
+    def put(self, text: str) -> str:
+        """Store an article text.
+
+        Args:
+            text (str): The article text.
+
+        Returns:
+            str: The content ID of the text.
+        """
+        content_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.cache.set(content_id, text, self.ttl)
+        return content_id
+
+    def get(self, content_id: str) -> str:
+        """Get an article text, or an empty string if it has expired.
+
+        Args:
+            content_id (str): The content ID of the text.
+
+        Returns:
+            str: The article text.
+        """
+        return self.cache.get(content_id) or ""
+
+    def resolve(self, articles: list[dict]) -> list[dict]:
+        """Add the `raw_content` of articles that reference their text by ID.
+
+        Args:
+            articles (list[dict]): Articles with a `content_id` field.
+
+        Returns:
+            list[dict]: Copies of the articles with their `raw_content`.
+        """
+        return [
+            {**article, "raw_content": self.get(article.get("content_id", ""))}
+            for article in articles
+        ]
+
+
+_article_store: ArticleStore | None = None
+_article_store_lock = threading.Lock()
+
+
+def get_article_store() -> ArticleStore:
+    """Get the process-wide article store.
+
+    Returns:
+        ArticleStore: The shared article store.
+    """
+    global _article_store
+    if _article_store is None:
+        with _article_store_lock:
+            if _article_store is None:
+                _article_store = ArticleStore(
+                    TieredCache(
+                        MemoryStore(maxsize=256),
+                        SQLiteStore(table="articles"),
+                        dumps=str,
+                        loads=str,
+                    )
+                )
+    return _article_store
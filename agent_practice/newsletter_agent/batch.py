@@ -0,0 +1,392 @@
+"""Generate newsletters for a manifest of keywords and languages.
+
+Each line of the manifest is a JSON object with `keyword` and `language`, and
+optionally `max_sections`. A CSV file with those columns works too. For example:
+
+    python batch.py manifest.jsonl --output newsletters/
+
+The languages of a keyword share one article search and theme generation, and
+their sub-theme searches through the search cache, so only the translation of
+the themes, the writing and the editing is done per language. Every newsletter is written to
+`<output>/<keyword>/<language>.md` with its timing next to it, and a rerun skips
+the newsletters that are already on disk.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from agent_common.cache import make_key
+from agent_common.checkpoints import DEFAULT_CHECKPOINT_PATH, CheckpointStore
+from agent_common.limiter import BATCH, DEFAULT_LIMITS, priority, set_limits
+from dotenv import load_dotenv
+from events import ProgressEvent
+from graph import DEFAULT_MAX_SECTIONS, DEFAULT_MODEL, get_newsletter_graph
+from langgraph.graph.state import CompiledStateGraph
+from node import NewsletterThemeOutput
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RUNS = 4
+# State keys that the languages of a keyword share. The other languages translate
+# the themes, and share the sub-theme searches through the search cache, or join
+# them while still in flight.
+RESEARCH_KEYS = ("newsletter_theme", "theme_language")
+
+
+@dataclass(frozen=True)
+class Job:
+    """One newsletter to generate."""
+
+    keyword: str
+    language: str
+    max_sections: int = DEFAULT_MAX_SECTIONS
+
+
+@dataclass
+class RunReport:
+    """Outcome and timing of one newsletter run, written next to its output.
+
+    Attributes:
+        keyword (str): The keyword of the newsletter.
+        language (str): The language of the newsletter.
+        status (str): "ok", "error" or "skipped".
+        started_at (str): The ISO start time of the run, in UTC.
+        seconds (float): The wall time of the run.
+        research_reused (bool): Whether the themes came from another run of the
+            keyword.
+        steps (list[dict]): The seconds from the start of the run to the end of
+            each node, in completion order.
+        error (str | None): The error of a failed run.
+    """
+
+    keyword: str
+    language: str
+    status: str
+    started_at: str = ""
+    seconds: float = 0.0
+    research_reused: bool = False
+    steps: list[dict] = field(default_factory=list)
+    error: str | None = None
+
+
+def read_manifest(path: Path) -> list[Job]:
+    """Read the jobs of a JSON Lines or CSV manifest, dropping repeats.
+
+    Args:
+        path (Path): The manifest file.
+
+    Returns:
+        list[Job]: The jobs, in manifest order.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    jobs = [
+        Job(
+            keyword=row["keyword"].strip(),
+            language=row["language"].strip(),
+            max_sections=int(row.get("max_sections") or DEFAULT_MAX_SECTIONS),
+        )
+        for row in rows
+    ]
+    return list(dict.fromkeys(jobs))
+
+
+def slugify(text: str) -> str:
+    """Turn a keyword into a directory name, keeping non-ASCII letters."""
+    return re.sub(r"[^\w]+", "-", text.strip().lower()).strip("-") or "keyword"
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write a file through a temporary file, so a crash never leaves half of it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class BatchRunner:
+    """Runs the jobs of a manifest concurrently and writes their outputs.
+
+    At most `max_runs` graphs run at once, while the process-wide limiters bound
+    the LLM and search requests of all of them together, at batch priority.
+    Runs are checkpointed on the same threads as the app, so an interrupted
+    newsletter resumes from its last completed node.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledStateGraph,
+        output_dir: Path,
+        max_runs: int = DEFAULT_MAX_RUNS,
+        checkpoint_path: str = DEFAULT_CHECKPOINT_PATH,
+    ) -> None:
+        self.graph = graph
+        self.output_dir = output_dir
+        self.max_runs = max_runs
+        self.checkpoint_path = checkpoint_path
+
+    def job_dir(self, job: Job) -> Path:
+        """Get the output directory of the job's keyword."""
+        return self.output_dir / slugify(job.keyword)
+
+    def output_path(self, job: Job) -> Path:
+        """Get the path of the job's newsletter."""
+        return self.job_dir(job) / f"{slugify(job.language)}.md"
+
+    def research_path(self, job: Job) -> Path:
+        """Get the path of the themes shared by the job's languages."""
+        return self.job_dir(job) / f"research-{job.max_sections}.json"
+
+    def load_research(self, job: Job) -> dict | None:
+        """Load the themes an earlier run saved for the keyword."""
+        path = self.research_path(job)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if "theme_language" not in data:
+            # Saved before the themes were translated, so research again
+            return None
+        return {
+            "newsletter_theme": NewsletterThemeOutput(**data["newsletter_theme"]),
+            "theme_language": data["theme_language"],
+        }
+
+    def save_research(self, job: Job, research: dict) -> None:
+        """Save the themes for the other languages and reruns."""
+        write_atomic(
+            self.research_path(job),
+            json.dumps(
+                {
+                    "newsletter_theme": research["newsletter_theme"].model_dump(),
+                    "theme_language": research["theme_language"],
+                },
+                ensure_ascii=False,
+            ),
+        )
+
+    async def run(self, jobs: list[Job]) -> list[RunReport]:
+        """Run every job whose output is not on disk yet.
+
+        Args:
+            jobs (list[Job]): The jobs to run.
+
+        Returns:
+            list[RunReport]: The report of each job, in job order.
+        """
+        runs = asyncio.Semaphore(self.max_runs)
+        groups: dict[tuple[str, int], list[Job]] = {}
+        for job in jobs:
+            groups.setdefault((job.keyword, job.max_sections), []).append(job)
+
+        reports = {}
+
+        async def run_group(group: list[Job]) -> None:
+            pending = []
+            for job in group:
+                if self.output_path(job).exists():
+                    reports[job] = RunReport(job.keyword, job.language, "skipped")
+                else:
+                    pending.append(job)
+            if not pending:
+                return
+
+            research = asyncio.get_running_loop().create_future()
+            saved = self.load_research(pending[0])
+            if saved is not None:
+                research.set_result(saved)
+
+            async def run_language(job: Job, researcher: bool) -> None:
+                shared = None
+                if not researcher:
+                    try:
+                        shared = await research
+                    except Exception:
+                        # The research run failed, so this run searches itself
+                        shared = None
+                async with runs:
+                    reports[job] = await self.run_job(
+                        job, checkpoints, shared, research if researcher else None
+                    )
+
+            # The first language researches while the others wait for its results
+            researcher = not research.done()
+            await asyncio.gather(
+                *(
+                    run_language(job, researcher and i == 0)
+                    for i, job in enumerate(pending)
+                )
+            )
+            if research.done():
+                # Mark a failed research as seen when no other run awaited it
+                research.exception()
+
+        # Interactive runs of the app in the same process go first
+        with priority(BATCH):
+            async with CheckpointStore.open(self.checkpoint_path) as checkpoints:
+                await asyncio.gather(*(run_group(group) for group in groups.values()))
+        return [reports[job] for job in jobs]
+
+    async def run_job(
+        self,
+        job: Job,
+        checkpoints: CheckpointStore,
+        research: dict | None,
+        research_ready: asyncio.Future | None,
+    ) -> RunReport:
+        """Run the graph for one job and write its newsletter and report.
+
+        Args:
+            job (Job): The job to run.
+            checkpoints (CheckpointStore): The store the run is checkpointed to.
+            research (dict | None): The themes to reuse.
+            research_ready (asyncio.Future | None): Resolved with the themes of
+                this run as soon as they are known.
+
+        Returns:
+            RunReport: The report of the run.
+        """
+        report = RunReport(
+            job.keyword,
+            job.language,
+            "ok",
+            started_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            research_reused=research is not None,
+        )
+        inputs = {
+            "keyword": job.keyword,
+            "language": job.language,
+            "max_sections": job.max_sections,
+        }
+        start = time.perf_counter()
+        newsletter = None
+        found = {}
+        try:
+            graph = checkpoints.attach(self.graph)
+            # The same key as the app, which runs the same inputs without research
+            config, resume = await checkpoints.thread(
+                graph, make_key("newsletter", inputs)
+            )
+            if resume:
+                values = (await graph.aget_state(config)).values
+                found = {key: values[key] for key in RESEARCH_KEYS if key in values}
+                if len(found) == len(RESEARCH_KEYS) and research_ready:
+                    self.save_research(job, found)
+                    research_ready.set_result(found)
+            async for mode, chunk in graph.astream(
+                None if resume else {**inputs, **(research or {})},
+                config,
+                stream_mode=["updates", "custom"],
+            ):
+                if mode == "custom":
+                    if isinstance(chunk, ProgressEvent):
+                        logger.debug(f"[{job.keyword}/{job.language}] {chunk.message}")
+                    continue
+                for key, value in chunk.items():
+                    report.steps.append(
+                        {"node": key, "seconds": round(time.perf_counter() - start, 3)}
+                    )
+                    if key == "generate_themes":
+                        found.update(value)
+                        if research_ready and not research_ready.done():
+                            self.save_research(job, found)
+                            research_ready.set_result(found)
+                    if key == "edit_newsletter":
+                        newsletter = value["messages"][0].content
+            if newsletter is None:
+                raise RuntimeError("The graph finished without a newsletter.")
+            write_atomic(self.output_path(job), newsletter)
+            await checkpoints.finish(config)
+        except Exception as e:
+            logger.exception(f"Newsletter for {job} failed")
+            report.status, report.error = "error", repr(e)
+            if research_ready and not research_ready.done():
+                research_ready.set_exception(e)
+        if research_ready and not research_ready.done():
+            # Never leave the other languages waiting
+            research_ready.set_exception(
+                RuntimeError("The run finished without research results.")
+            )
+        report.seconds = round(time.perf_counter() - start, 3)
+        write_atomic(
+            self.output_path(job).with_suffix(".json"),
+            json.dumps(asdict(report), ensure_ascii=False, indent=2),
+        )
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", type=Path, help="JSON Lines or CSV manifest.")
+    parser.add_argument(
+        "--output", type=Path, default=Path("newsletters"), help="Output directory."
+    )
+    parser.add_argument(
+        "--max-runs",
+        type=int,
+        default=DEFAULT_MAX_RUNS,
+        help="Newsletters generated at once.",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=DEFAULT_LIMITS["llm"].max_concurrency,
+        help="Most LLM requests in flight at once, across all newsletters.",
+    )
+    parser.add_argument(
+        "--search-concurrency",
+        type=int,
+        default=DEFAULT_LIMITS["search"].max_concurrency,
+        help="Most search requests in flight at once, across all newsletters.",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--llm-cache",
+        choices=["memory", "sqlite", "none"],
+        default="sqlite",
+        help="LLM response cache. The SQLite cache also serves reruns.",
+    )
+    parser.add_argument(
+        "--checkpoint-path",
+        default=DEFAULT_CHECKPOINT_PATH,
+        help="SQLite file the runs are checkpointed to.",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    set_limits("llm", max_concurrency=args.llm_concurrency)
+    set_limits("search", max_concurrency=args.search_concurrency)
+
+    graph = get_newsletter_graph(
+        model=args.model,
+        llm_cache=None if args.llm_cache == "none" else args.llm_cache,
+    )
+    runner = BatchRunner(
+        graph,
+        args.output,
+        max_runs=args.max_runs,
+        checkpoint_path=args.checkpoint_path,
+    )
+    reports = asyncio.run(runner.run(read_manifest(args.manifest)))
+
+    for report in reports:
+        print(
+            f"{report.status:<8} {report.seconds:8.1f}s "
+            f"{'reused' if report.research_reused else '':<7}"
+            f"{report.keyword} / {report.language}"
+        )
+    sys.exit(any(report.status == "error" for report in reports))
@@ -0,0 +1,45 @@
+"""Progress events that the newsletter graph emits while it runs."""
+
+from dataclasses import dataclass, field
+from typing import Literal
+
+from langgraph.config import get_stream_writer
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """Progress of one unit of work inside a node, e.g. one sub-theme search.
+
+    Events reach subscribers as `custom` chunks of `graph.astream`, so a run
+    that does not stream the `custom` mode pays nothing for them.
+
+    Attributes:
+        step (str): The kind of work, e.g. "search_sub_theme".
+        key (str): What the work is about, e.g. the sub-theme. Later events with
+            the same step and key update the earlier ones.
+        status (str): "running", "complete" or "error".
+        message (str): A short human-readable description.
+        items (list[str]): Details, e.g. the titles of the articles found.
+    """
+
+    step: str
+    key: str
+    status: Literal["running", "complete", "error"]
+    message: str
+    items: list[str] = field(default_factory=list)
+
+
+def emit(event: ProgressEvent) -> None:
+    """Send a progress event to the subscribers of the running graph.
+
+    Outside a graph run, e.g. when a tool is called directly, the event is
+    dropped.
+
+    Args:
+        event (ProgressEvent): The event to send.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(event)
@@ -1,49 +1,155 @@
 """Graph for the newsletter agent."""
 
+import argparse
 import logging
+import threading
 
+from agent_common.llm_cache import get_llm_cache
+from agent_common.tracing import get_tracer
+from dotenv import load_dotenv
+from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from node import NewsletterNode
 from state import State
+from tavily import AsyncTavilyClient
+from tool import NewsletterTool
 from utils import save_graph
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_MAX_SECTIONS = 5
+DEFAULT_MAX_CONCURRENCY = 5
+DEFAULT_SECTION_TOKEN_BUDGET = 6000
+DEFAULT_LLM_CACHE = "memory"
+DEFAULT_CACHED_NODES = ("generate_themes", "localize_themes", "edit_newsletter")
 
-def create_newsletter_graph() -> StateGraph:
-    """Create a newsletter graph."""
+# Process-wide registry of compiled graphs, shared by Streamlit reruns and sessions
+_GRAPHS: dict[tuple, CompiledStateGraph] = {}
+_GRAPHS_LOCK = threading.Lock()
 
+
+def create_newsletter_graph(
+    model: str = DEFAULT_MODEL,
+    max_sections: int = DEFAULT_MAX_SECTIONS,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    section_token_budget: int = DEFAULT_SECTION_TOKEN_BUDGET,
+    llm_cache: str | None = DEFAULT_LLM_CACHE,
+    semantic_cache: bool = False,
+    cached_nodes: tuple[str, ...] = DEFAULT_CACHED_NODES,
+    checkpointer: BaseCheckpointSaver | None = None,
+    llm: BaseChatModel | None = None,
+    search_client: AsyncTavilyClient | None = None,
+) -> CompiledStateGraph:
+    """Create a newsletter graph.
+
+    Args:
+        model (str): The OpenAI chat model used by every node.
+        max_sections (int): Default number of sections per newsletter. A run can
+            override it with the `max_sections` input.
+        max_concurrency (int): Default ceiling on tasks run at once, which bounds
+            the parallel section writers. A run can override it in its config.
+        section_token_budget (int): Token budget of the article references in
+            each section prompt.
+        llm_cache (str | None): LLM response cache backend, "memory" or
+            "sqlite". None disables the cache.
+        semantic_cache (bool): Whether the LLM cache also serves near-duplicate
+            prompts.
+        cached_nodes (tuple[str, ...]): Nodes whose LLM calls use the cache.
+        checkpointer (BaseCheckpointSaver | None): Saver that checkpoints every
+            step, so a run on the same thread resumes after the last completed
+            node. A shared graph can also be attached to a saver per run with
+            `CheckpointStore.attach`.
+        llm (BaseChatModel | None): Chat model used instead of `model`, e.g. a
+            replay stand-in.
+        search_client (AsyncTavilyClient | None): Tavily client used instead of
+            a new one, e.g. a replay stand-in.
+
+    Returns:
+        CompiledStateGraph: The compiled newsletter graph.
+    """
     logger.info("Create newsletter graph...")
 
-    llm = ChatOpenAI(model="gpt-4o-mini")
+    # Failed requests are retried by the scheduler in `limiter`, which also
+    # needs to see rate limits to back off
+    llm = llm or ChatOpenAI(model=model, max_retries=0)
     workflow = StateGraph(State)
-    node = NewsletterNode(llm)
+    node = NewsletterNode(
+        llm,
+        tool=NewsletterTool(search_client) if search_client else None,
+        max_sections=max_sections,
+        section_token_budget=section_token_budget,
+        llm_cache=get_llm_cache(llm_cache, semantic_cache) if llm_cache else None,
+        cached_nodes=cached_nodes,
+    )
 
     # Add nodes
     workflow.add_node("search_news", node.search_keyword_news)
     workflow.add_node("generate_themes", node.generate_themes)
-    workflow.add_node("search_sub_theme_articles", node.search_sub_theme_articles)
-    for i in range(5):
-        node_name = f"write_section_{i}"
-        workflow.add_node(
-            node_name,
-            lambda s, i=i: node.write_section(s, s["newsletter_theme"].sub_themes[i]),
-        )
+    workflow.add_node("localize_themes", node.localize_themes)
+    workflow.add_node("write_section", node.write_section)
     workflow.add_node("aggregate", node.aggregate_results)
     workflow.add_node("edit_newsletter", node.edit_newsletter)
 
     # Add edges
-    workflow.add_edge(START, "search_news")
+    workflow.add_conditional_edges(
+        START,
+        node.route_start,
+        ["search_news", "localize_themes", "write_section"],
+    )
     workflow.add_edge("search_news", "generate_themes")
-    workflow.add_edge("generate_themes", "search_sub_theme_articles")
-    for i in range(5):
-        workflow.add_edge("search_sub_theme_articles", f"write_section_{i}")
-        workflow.add_edge(f"write_section_{i}", "aggregate")
+    workflow.add_conditional_edges(
+        "generate_themes", node.assign_sections, ["write_section"]
+    )
+    workflow.add_conditional_edges(
+        "localize_themes", node.assign_sections, ["write_section"]
+    )
+    workflow.add_edge("write_section", "aggregate")
     workflow.add_edge("aggregate", "edit_newsletter")
     workflow.add_edge("edit_newsletter", END)
 
     logger.info("Newsletter graph is created successfully!")
-    graph = workflow.compile()
-    save_graph(graph)
+    config = {"max_concurrency": max_concurrency, "run_name": "newsletter"}
+    tracer = get_tracer()
+    if tracer is not None:
+        config["callbacks"] = [tracer]
+    return workflow.compile(checkpointer=checkpointer).with_config(**config)
+
+
+def get_newsletter_graph(model: str = DEFAULT_MODEL, **options) -> CompiledStateGraph:
+    """Get the compiled newsletter graph for the config, compiling it on first use.
+
+    The compiled graph holds no per-run state, so a single instance is shared by
+    every run in the process.
+
+    Args:
+        model (str): The OpenAI chat model used by every node.
+        **options: Other keyword arguments of `create_newsletter_graph`.
+
+    Returns:
+        CompiledStateGraph: The cached compiled newsletter graph.
+    """
+    key = (model, tuple(sorted(options.items())))
+    graph = _GRAPHS.get(key)
+    if graph is None:
+        with _GRAPHS_LOCK:
+            graph = _GRAPHS.get(key)
+            if graph is None:
+                graph = _GRAPHS[key] = create_newsletter_graph(model=model, **options)
     return graph
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the newsletter graph image.")
+    parser.add_argument(
+        "--output",
+        default="agent_practice/newsletter_agent/images/graph.png",
+        help="Path of the PNG file to write.",
+    )
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    save_graph(create_newsletter_graph(), args.output)
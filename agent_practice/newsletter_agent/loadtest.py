@@ -0,0 +1,150 @@
+"""Offline load test of the newsletter graph.
+
+The graph runs against the replay stand-ins of the chat model and Tavily, so no
+API is called and the measurements only move with the orchestration around
+them. Run from this directory, e.g.:
+
+    python loadtest.py --concurrency 1 4 16 --runs 32
+    python loadtest.py --save-baseline loadtest.json
+    python loadtest.py --baseline loadtest.json
+
+With a baseline, the command exits with status 1 on a regression. With API keys,
+`--record cassette.json` answers the requests that are not in the cassette from
+the live services and saves them, and `--cassette cassette.json` replays them.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Runs at once."
+    )
+    parser.add_argument("--runs", type=int, default=32, help="Runs per concurrency.")
+    parser.add_argument("--max-sections", type=int, default=5)
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.5, help="Seconds to the first token."
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.002, help="Seconds per token."
+    )
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument(
+        "--search-latency", type=float, default=0.8, help="Seconds per search."
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--cassette", type=Path, help="Responses to replay.")
+    cassette.add_argument(
+        "--record", type=Path, help="Record missing responses from the live APIs."
+    )
+    baseline = parser.add_mutually_exclusive_group()
+    baseline.add_argument("--baseline", type=Path, help="Fail on a regression.")
+    baseline.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=None)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    """Run the load test and report it, returning the exit code."""
+    # Imported here, after the cache path is set
+    from agent_common.harness import (
+        DEFAULT_TOLERANCE,
+        compare,
+        format_results,
+        run_load,
+        save_baseline,
+    )
+    from agent_common.replay import Cassette, FakeAsyncTavilyClient, FakeChatModel
+    from graph import create_newsletter_graph
+
+    cassette = Cassette(args.record or args.cassette)
+    live_llm = live_search = None
+    if args.record:
+        from dotenv import load_dotenv
+        from langchain_openai import ChatOpenAI
+        from tavily import AsyncTavilyClient
+
+        load_dotenv(override=True)
+        live_llm, live_search = ChatOpenAI(model="gpt-4o-mini"), AsyncTavilyClient()
+
+    llm = FakeChatModel(
+        latency=args.llm_latency,
+        token_latency=args.token_latency,
+        output_tokens=args.output_tokens,
+        list_items=args.max_sections,
+        cassette=cassette,
+        live=live_llm,
+    )
+    search = FakeAsyncTavilyClient(
+        cassette=cassette, live=live_search, latency=args.search_latency
+    )
+    # Response caching would hide the latency of repeated requests
+    graph = create_newsletter_graph(llm=llm, search_client=search, llm_cache=None)
+
+    async def run_once(index: int) -> None:
+        # Every run searches its own keyword, so the search cache never hits
+        await graph.ainvoke(
+            {
+                "keyword": f"load test {index}",
+                "language": "English",
+                "max_sections": args.max_sections,
+            }
+        )
+
+    await run_once(-1)  # Warm up imports and connections
+    results = []
+    for level, concurrency in enumerate(args.concurrency):
+        results.append(
+            await run_load(
+                lambda i: run_once(level * args.runs + i), concurrency, args.runs
+            )
+        )
+    print(format_results(results))
+    if args.record:
+        cassette.save()
+
+    config = {
+        key: getattr(args, key)
+        for key in (
+            "runs",
+            "max_sections",
+            "llm_latency",
+            "token_latency",
+            "output_tokens",
+            "search_latency",
+        )
+    }
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, config)
+    if args.baseline:
+        regressions = compare(
+            args.baseline, results, config, args.tolerance or DEFAULT_TOLERANCE
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Keep the caches of real runs out of the measurements, and the other way round
+    os.environ["LLM_PRACTICE_CACHE_PATH"] = os.path.join(
+        tempfile.mkdtemp(prefix="loadtest-"), "cache.sqlite3"
+    )
+    if not args.record:
+        # The stand-ins have no per-minute limits to stay within
+        os.environ.setdefault("LLM_PRACTICE_LLM_RPM", "")
+        os.environ.setdefault("LLM_PRACTICE_LLM_TPM", "")
+        os.environ.setdefault("LLM_PRACTICE_SEARCH_RPM", "")
+        # Clients validate their keys on construction, but nothing here calls them
+        os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+        os.environ.setdefault("TAVILY_API_KEY", "loadtest")
+    sys.exit(asyncio.run(main(args)))
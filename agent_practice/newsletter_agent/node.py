@@ -1,16 +1,27 @@
 """Node for the newsletter agent."""
 
 import asyncio
-from typing import TYPE_CHECKING
+import logging
+from typing import Iterable
 
-from langchain_core.messages import HumanMessage
+from agent_common.limiter import estimate_tokens, get_limiter
+from articles import get_article_store
+from langchain_core.caches import BaseCache
+from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
+from langgraph.types import Send
+from packing import ArticlePacker
 from prompt import NewsletterPrompt
 from pydantic import BaseModel, Field
-from state import State
+from state import SectionState, State
 from tool import NewsletterTool
 
+logger = logging.getLogger(__name__)
+
+# Tokens a written section is expected to take, for the tokens-per-minute limit
+SECTION_COMPLETION_TOKENS = 1000
+
 
 class NewsletterThemeOutput(BaseModel):
     """Output model for structured theme and sub-theme generation."""
@@ -19,18 +30,51 @@ class NewsletterThemeOutput(BaseModel):
         description="The main newsletter theme based on the provided article titles."
     )
     sub_themes: list[str] = Field(
-        description="List of sub-themes or key news items to investigate under the main theme, ensuring they are specific and researchable."
+        description=(
+            "List of sub-themes or key news items to investigate under the main "
+            "theme, ensuring they are specific and researchable."
+        )
     )
 
 
 class NewsletterNode:
     """Node for the newsletter agent."""
 
-    def __init__(self, llm: ChatOpenAI) -> None:
+    def __init__(
+        self,
+        llm: ChatOpenAI,
+        max_sections: int = 5,
+        section_token_budget: int = 6000,
+        llm_cache: BaseCache | None = None,
+        cached_nodes: Iterable[str] = (
+            "generate_themes",
+            "localize_themes",
+            "edit_newsletter",
+        ),
+        tool: NewsletterTool | None = None,
+    ) -> None:
         self.llm = llm
-        self.tool = NewsletterTool()
+        self.tool = tool or NewsletterTool()
+        self.articles = get_article_store()
+        self.max_sections = max_sections
+        self.packer = ArticlePacker(section_token_budget, model=llm.model_name)
+        self.cached_llm = (
+            llm.model_copy(update={"cache": llm_cache}) if llm_cache else llm
+        )
+        self.cached_nodes = set(cached_nodes)
+
+    def llm_for(self, node_name: str) -> ChatOpenAI:
+        """Get the LLM of a node, which uses the response cache if the node opted in.
+
+        Args:
+            node_name (str): The name of the node.
+
+        Returns:
+            ChatOpenAI: The LLM for the node.
+        """
+        return self.cached_llm if node_name in self.cached_nodes else self.llm
 
-    def search_keyword_news(self, state: State) -> State:
+    async def search_keyword_news(self, state: State) -> State:
         """Search for recent news articles based on the keyword.
 
         Args:
@@ -40,10 +84,10 @@ class NewsletterNode:
             State: The updated state of the agent.
         """
         keyword = state["keyword"]
-        article_titles = self.tool.search_recent_news(keyword)
+        article_titles = await self.tool.search_recent_news(keyword)
         return {"article_titles": article_titles}
 
-    def generate_themes(self, state: State) -> State:
+    async def generate_themes(self, state: State) -> State:
         """Generate newsletter themes.
 
         Args:
@@ -54,7 +98,10 @@ class NewsletterNode:
         """
         article_titles = state["article_titles"]
         language = state["language"]
-        newsletter_theme = self.llm.with_structured_output(NewsletterThemeOutput)
+        max_sections = state.get("max_sections") or self.max_sections
+        newsletter_theme = self.llm_for("generate_themes").with_structured_output(
+            NewsletterThemeOutput
+        )
         theme_prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", NewsletterPrompt.generate_themes),
@@ -64,14 +111,27 @@ class NewsletterNode:
 
         # Chain together the system prompt and the structured output model
         subtheme_chain = theme_prompt | newsletter_theme
-        newsletter_theme = subtheme_chain.invoke(
-            {"article_titles": "\n".join(article_titles), "language": language}
+        inputs = {
+            "article_titles": "\n".join(article_titles),
+            "language": language,
+            "num_sub_themes": max_sections,
+        }
+        newsletter_theme = await get_limiter("llm").call(
+            lambda: subtheme_chain.ainvoke(inputs),
+            tokens=estimate_tokens(
+                NewsletterPrompt.generate_themes,
+                inputs["article_titles"],
+                completion=50 * max_sections,
+            ),
         )
-        newsletter_theme.sub_themes = newsletter_theme.sub_themes[:5]
-        return {"newsletter_theme": newsletter_theme}
+        newsletter_theme.sub_themes = newsletter_theme.sub_themes[:max_sections]
+        return {"newsletter_theme": newsletter_theme, "theme_language": language}
+
+    async def localize_themes(self, state: State) -> State:
+        """Translate the themes of an earlier run into the language of this run.
 
-    async def search_sub_theme_articles(self, state: State) -> State:
-        """Search for recent news articles based on the sub-theme.
+        The sub-themes are still searched as the earlier run wrote them, so the
+        searches stay shared through the search cache.
 
         Args:
             state (State): The current state of the agent.
@@ -79,68 +139,129 @@ class NewsletterNode:
         Returns:
             State: The updated state of the agent.
         """
-        subthemes = state["newsletter_theme"].sub_themes
-        results = await asyncio.gather(
-            *[self.tool.search_news_for_subtheme(subtheme) for subtheme in subthemes]
+        source = state["newsletter_theme"]
+        prompt = NewsletterPrompt.localize_themes.format(language=state["language"])
+        content = source.model_dump_json()
+        localized = await get_limiter("llm").call(
+            lambda: self.llm_for("localize_themes")
+            .with_structured_output(NewsletterThemeOutput)
+            .ainvoke([SystemMessage(content=prompt), HumanMessage(content=content)]),
+            tokens=estimate_tokens(prompt, content, completion=len(content) // 2),
         )
+        if len(localized.sub_themes) != len(source.sub_themes) or len(
+            set(localized.sub_themes)
+        ) != len(localized.sub_themes):
+            logger.warning(
+                f"Kept the themes in {state.get('theme_language')}, since their "
+                f"translation into {state['language']} changed the sub-themes"
+            )
+            return {}
+        return {
+            "newsletter_theme": localized,
+            "theme_language": state["language"],
+            "sub_theme_queries": dict(zip(localized.sub_themes, source.sub_themes)),
+        }
 
-        sub_theme_articles = {}
-        for result in results:
-            sub_theme_articles.update(result)
+    def route_start(self, state: State) -> str | list[Send]:
+        """Skip the research steps whose results are already in the input.
 
-        if not any(sub_theme_articles.values()):
-            raise ValueError(
-                "No articles found for any sub-theme. Please try a different keyword."
-            )
-        return {"sub_theme_articles": sub_theme_articles}
+        A run given the theme of an earlier run, e.g. the same keyword in
+        another language, only researches and writes the sections and edits,
+        after translating the theme if it is in another language.
 
-    def write_section(self, state: State, sub_theme: str) -> State:
-        """Write a newsletter section for the sub-theme.
+        Args:
+            state (State): The input state of the run.
+
+        Returns:
+            str | list[Send]: The first node to run, or the section writers.
+        """
+        if state.get("newsletter_theme") is None:
+            return "search_news"
+        if state.get("theme_language") != state["language"]:
+            return "localize_themes"
+        return self.assign_sections(state)
+
+    def assign_sections(self, state: State) -> list[Send]:
+        """Schedule one section writer per generated sub-theme.
+
+        Each writer searches its own sub-theme, so a section is written as soon
+        as its articles arrive instead of after the slowest search. Articles in
+        the state, e.g. given in the input, are used without searching.
 
         Args:
             state (State): The current state of the agent.
-            sub_theme (str): The sub-theme to write a section for.
 
         Returns:
-            State: The updated state of the agent.
+            list[Send]: A `write_section` task for each sub-theme.
         """
-        return asyncio.run(self.write_section_async(state, sub_theme))
+        found = state.get("sub_theme_articles") or {}
+        queries = state.get("sub_theme_queries") or {}
+        return [
+            Send(
+                "write_section",
+                {
+                    "sub_theme": sub_theme,
+                    "query": queries.get(sub_theme, sub_theme),
+                    "keyword": state["keyword"],
+                    "language": state["language"],
+                    **({"articles": found[sub_theme]} if sub_theme in found else {}),
+                },
+            )
+            for sub_theme in state["newsletter_theme"].sub_themes
+        ]
+
+    async def write_section(self, state: SectionState) -> State:
+        """Research and write a newsletter section for the sub-theme.
 
-    async def write_section_async(self, state: State, sub_theme: str) -> State:
-        """Write a newsletter section for the sub-theme asynchronously.
+        A sub-theme without articles is searched again with the keyword over a
+        longer window, and dropped if that finds none either.
 
         Args:
-            state (State): The current state of the agent.
-            sub_theme (str): The sub-theme to write a section for.
+            state (SectionState): The sub-theme to write about, and its articles
+                if they are already known.
 
         Returns:
             State: The updated state of the agent.
         """
-        articles = state["sub_theme_articles"][sub_theme]
+        sub_theme = state["sub_theme"]
+        query = state.get("query", sub_theme)
         language = state["language"]
-
-        # Prepare article references with proper image markdown
-        article_references = "\n".join(
-            [
-                f"Title: {article['title']}\n"
-                + (
-                    f"![Article Image]({article['image_url']})\n"
-                    if article["image_url"]
-                    else ""
-                )
-                + f"Content: {article['raw_content']}..."
-                for article in articles
-            ]
+        refs = state.get("articles")
+        if refs is None:
+            found = await self.tool.search_news_for_subtheme(
+                query, fallback=f"{state['keyword']} {query}"
+            )
+            refs = found[query]
+        if not refs:
+            logger.warning(f"Dropped the section '{sub_theme}' without articles")
+            return {"results": {sub_theme: ""}, "sub_theme_articles": {sub_theme: []}}
+        articles = self.articles.resolve(refs)
+
+        # Prepare article references with proper image markdown, fitted to the
+        # section token budget, off the event loop shared by every run
+        packed = await asyncio.to_thread(self.packer.pack, articles)
+        logger.info(
+            f"Packed {packed.packed_tokens} tokens of articles for '{sub_theme}' "
+            f"({packed.dropped_tokens} tokens dropped)"
         )
 
         prompt = NewsletterPrompt.write_section.format(
             sub_theme=sub_theme,
-            article_references=article_references,
+            article_references=packed.text,
             language=language,
         )
         messages = [HumanMessage(content=prompt)]
-        response = await self.llm.ainvoke(messages)
-        return {"results": {sub_theme: response.content}}
+        # The sub-theme in the run metadata lets the app route streamed tokens
+        response = await get_limiter("llm").call(
+            lambda: self.llm_for("write_section").ainvoke(
+                messages, config={"metadata": {"sub_theme": sub_theme}}
+            ),
+            tokens=estimate_tokens(prompt, completion=SECTION_COMPLETION_TOKENS),
+        )
+        return {
+            "results": {sub_theme: response.content},
+            "sub_theme_articles": {sub_theme: refs},
+        }
 
     def aggregate_results(self, state: State) -> State:
         """Aggregate the results of the newsletter sections.
@@ -153,11 +274,21 @@ class NewsletterNode:
         """
         theme = state["newsletter_theme"].theme
         combined_newsletter = f"# {theme}\n\n"
-        for sub_theme, content in state["results"].items():
-            combined_newsletter += f"## {sub_theme}\n{content}\n\n"
+        # Keep the sub-theme order rather than the order the sections finished in
+        sections = 0
+        for sub_theme in state["newsletter_theme"].sub_themes:
+            # Dropped sections have no content
+            content = state.get("results", {}).get(sub_theme)
+            if content:
+                combined_newsletter += f"## {sub_theme}\n{content}\n\n"
+                sections += 1
+        if not sections:
+            raise ValueError(
+                "No articles found for any sub-theme. Please try a different keyword."
+            )
         return {"messages": [HumanMessage(content=combined_newsletter)]}
 
-    def edit_newsletter(self, state: State) -> State:
+    async def edit_newsletter(self, state: State) -> State:
         """Edit the newsletter.
 
         Args:
@@ -170,9 +301,18 @@ class NewsletterNode:
         language = state["language"]
         combined_newsletter = state["messages"][-1].content
 
-        prompt = NewsletterPrompt.edit_newsletter.format(
-            theme=theme, combined_newsletter=combined_newsletter, language=language
+        # The theme and language are in the system message, which a cached
+        # response must match exactly
+        prompt = NewsletterPrompt.edit_newsletter.format(theme=theme, language=language)
+        messages = [
+            SystemMessage(content=prompt),
+            HumanMessage(content=combined_newsletter),
+        ]
+        # The edited newsletter is about as long as the draft
+        response = await get_limiter("llm").call(
+            lambda: self.llm_for("edit_newsletter").ainvoke(messages),
+            tokens=estimate_tokens(
+                prompt, combined_newsletter, completion=len(combined_newsletter) // 4
+            ),
         )
-        messages = [HumanMessage(content=prompt)]
-        response = self.llm.invoke(messages)
         return {"messages": [HumanMessage(content=response.content)]}
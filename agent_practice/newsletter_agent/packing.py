@@ -0,0 +1,264 @@
+"""Token-budgeted packing of article references for section prompts."""
+
+import functools
+import logging
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "o200k_base"
+
+# Short paragraphs that match these are site chrome rather than article content
+BOILERPLATE_PATTERN = re.compile(
+    r"subscribe|sign up|sign in|log in|cookie|all rights reserved|advertisement|"
+    r"click here|read more|follow us|share this|privacy policy|terms of (use|service)",
+    re.IGNORECASE,
+)
+BOILERPLATE_MAX_CHARS = 200
+MIN_PARAGRAPH_CHARS = 40
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+# MinHash signatures are split into bands of rows, and paragraphs that agree on
+# every row of a band are compared. 8 bands of 4 rows find 98% of the pairs at
+# the near-duplicate threshold.
+MINHASH_BANDS = 8
+MINHASH_ROWS = 4
+# The largest prime below 2**32. With a, b and x below it, a * x + b stays below
+# 2**64, so the hashes (a * x + b) % p are computed without wrapping around
+_MINHASH_PRIME = (1 << 32) - 5
+_MINHASH_RNG = np.random.default_rng(0)
+_MINHASH_A = _MINHASH_RNG.integers(
+    1, _MINHASH_PRIME, MINHASH_BANDS * MINHASH_ROWS, np.uint64
+)
+_MINHASH_B = _MINHASH_RNG.integers(
+    0, _MINHASH_PRIME, MINHASH_BANDS * MINHASH_ROWS, np.uint64
+)
+
+
+@dataclass
+class PackedArticles:
+    """Article references packed into a token budget."""
+
+    text: str
+    packed_tokens: int
+    dropped_tokens: int
+
+
+class CharEncoding:
+    """Stand-in for a tiktoken encoding that counts 4 characters as a token.
+
+    It is used when the BPE file of the model cannot be loaded, e.g. offline.
+    """
+
+    name = "chars"
+
+    def encode_ordinary(self, text: str) -> list[str]:
+        """Split a text into 4-character tokens."""
+        return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+    def encode_ordinary_batch(self, texts: list[str]) -> list[list[str]]:
+        """Split texts into 4-character tokens."""
+        return [self.encode_ordinary(text) for text in texts]
+
+    def decode(self, tokens: list[str], errors: str = "replace") -> str:
+        """Join tokens back into text."""
+        return "".join(tokens)
+
+
+@functools.lru_cache(maxsize=None)
+def load_encoding(model: str) -> "tiktoken.Encoding | CharEncoding":
+    """Load the tokenizer of a model, falling back to a character estimate.
+
+    Args:
+        model (str): The model name.
+
+    Returns:
+        tiktoken.Encoding | CharEncoding: The encoding.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as error:
+        # tiktoken downloads the BPE file on first use
+        logger.warning(f"Counting 4 characters per token, no encoding: {error!r}")
+        return CharEncoding()
+
+
+def _shingles(paragraph: str) -> set[int]:
+    """Get the hashed word shingles of a paragraph for near-duplicate detection."""
+    words = re.findall(r"\w+", paragraph.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {hash(" ".join(words))}
+    return {
+        hash(" ".join(words[i : i + SHINGLE_SIZE]))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _minhash_bands(shingles: set[int]) -> list[bytes]:
+    """Get the LSH band keys of the MinHash signature of a set of shingles."""
+    prime = np.uint64(_MINHASH_PRIME)
+    values = np.fromiter(shingles, np.int64, len(shingles)).astype(np.uint64) % prime
+    hashes = (_MINHASH_A[:, None] * values[None, :] + _MINHASH_B[:, None]) % prime
+    signature = hashes.min(axis=1)
+    return [
+        band.tobytes() + bytes([index])
+        for index, band in enumerate(signature.reshape(MINHASH_BANDS, MINHASH_ROWS))
+    ]
+
+
+def _is_boilerplate(paragraph: str) -> bool:
+    """Check whether a paragraph is too short or looks like site chrome."""
+    if len(paragraph) < MIN_PARAGRAPH_CHARS:
+        return True
+    return len(paragraph) <= BOILERPLATE_MAX_CHARS and bool(
+        BOILERPLATE_PATTERN.search(paragraph)
+    )
+
+
+class ArticlePacker:
+    """Pack article references into a token budget for one section prompt."""
+
+    def __init__(self, token_budget: int = 6000, model: str = "gpt-4o-mini") -> None:
+        self.token_budget = token_budget
+        self.model = model
+
+    @functools.cached_property
+    def encoding(self) -> "tiktoken.Encoding | CharEncoding":
+        """The tokenizer of the model, loaded on first use."""
+        return load_encoding(self.model)
+
+    def clean(
+        self, articles: list[dict], max_tokens: int | None = None
+    ) -> list[list[list]]:
+        """Split articles into tokenized paragraphs, dropping boilerplate and duplicates.
+
+        A paragraph is dropped when it repeats a paragraph already kept, from the
+        same or an earlier article, exactly or with word shingles that overlap by
+        at least `NEAR_DUPLICATE_THRESHOLD` (Jaccard similarity). Only the
+        paragraphs that share a MinHash band are compared, so cleaning takes
+        linear time.
+
+        Args:
+            articles (list[dict]): Articles with a `raw_content` field.
+            max_tokens (int | None): Stop cleaning an article once its kept
+                paragraphs reach this many tokens. None cleans every paragraph.
+
+        Returns:
+            list[list[list]]: The tokens of the kept paragraphs of each article.
+        """
+        exact: set[int] = set()
+        seen: list[set[int]] = []
+        buckets: dict[bytes, list[int]] = {}
+        cleaned = []
+        for article in articles:
+            paragraphs = []
+            tokens_kept = 0
+            for paragraph in (article.get("raw_content") or "").splitlines():
+                if max_tokens is not None and tokens_kept >= max_tokens:
+                    break
+                paragraph = " ".join(paragraph.split())
+                if _is_boilerplate(paragraph):
+                    continue
+                digest = hash(paragraph.lower())
+                if digest in exact:
+                    continue
+                shingles = _shingles(paragraph)
+                bands = _minhash_bands(shingles)
+                candidates = {
+                    index for band in bands for index in buckets.get(band, ())
+                }
+                if any(
+                    len(shingles & seen[index]) / len(shingles | seen[index])
+                    >= NEAR_DUPLICATE_THRESHOLD
+                    for index in candidates
+                ):
+                    continue
+                exact.add(digest)
+                for band in bands:
+                    buckets.setdefault(band, []).append(len(seen))
+                seen.append(shingles)
+                tokens = self.encoding.encode_ordinary(paragraph)
+                paragraphs.append(tokens)
+                tokens_kept += len(tokens)
+            cleaned.append(paragraphs)
+        return cleaned
+
+    def pack(self, articles: list[dict]) -> PackedArticles:
+        """Pack article references into the token budget.
+
+        Titles and image links are always kept. The remaining budget is shared
+        between articles in proportion to their cleaned length, up to the whole
+        budget each, and each article keeps its paragraphs in order until its
+        share runs out. A paragraph cut by the end of the share ends at its last
+        whole word. The dropped tokens are counted on the raw contents.
+
+        Args:
+            articles (list[dict]): Articles with `title`, `image_url` and
+                `raw_content` fields.
+
+        Returns:
+            PackedArticles: The article references and their token counts.
+        """
+        headers = [
+            f"Title: {article['title']}\n"
+            + (
+                f"![Article Image]({article['image_url']})\n"
+                if article["image_url"]
+                else ""
+            )
+            for article in articles
+        ]
+        header_tokens = sum(
+            len(tokens) for tokens in self.encoding.encode_ordinary_batch(headers)
+        )
+        raw_tokens = sum(
+            len(tokens)
+            for tokens in self.encoding.encode_ordinary_batch(
+                [article.get("raw_content") or "" for article in articles]
+            )
+        )
+
+        budget = max(self.token_budget - header_tokens, 0)
+        # No article can get more than the whole budget, so cleaning stops there
+        paragraph_tokens = self.clean(articles, max_tokens=budget)
+        demands = [
+            sum(len(tokens) for tokens in article) for article in paragraph_tokens
+        ]
+        total_demand = sum(demands)
+        if total_demand <= budget:
+            allowances = demands
+        else:
+            allowances = [budget * demand // total_demand for demand in demands]
+
+        references = []
+        packed_tokens = header_tokens
+        for header, paragraphs, allowance in zip(headers, paragraph_tokens, allowances):
+            body = []
+            for tokens in paragraphs:
+                if allowance <= 0:
+                    break
+                if len(tokens) <= allowance:
+                    body.append(self.encoding.decode(tokens))
+                    packed_tokens += len(tokens)
+                else:
+                    # The cut can split a multibyte character or a word
+                    text = self.encoding.decode(tokens[:allowance], errors="ignore")
+                    text = text.rpartition(" ")[0] or text
+                    body.append(text)
+                    packed_tokens += len(self.encoding.encode_ordinary(text))
+                allowance -= len(tokens)
+            references.append(header + "Content: " + "\n".join(body) + "...")
+
+        return PackedArticles(
+            text="\n".join(references),
+            packed_tokens=packed_tokens,
+            dropped_tokens=max(raw_tokens + header_tokens - packed_tokens, 0),
+        )
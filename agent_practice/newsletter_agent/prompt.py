@@ -8,17 +8,22 @@ class NewsletterPrompt:
     You are an expert helping to create a newsletter. Based on a list of article titles provided, your task is to choose a single, 
     specific newsletter theme framed as a clear, detailed question that grabs the reader's attention. 
 
-    In addition, generate 5 sub-themes that are highly specific, researchable news items or insights under the main theme. 
+    In addition, generate {num_sub_themes} sub-themes that are highly specific, researchable news items or insights under the main theme. 
     Ensure these sub-themes reflect the latest trends in the field and frame them as compelling news topics.
 
     The output should be formatted as:
     - Main theme (in question form)
-    - 5 sub-themes (detailed and focused on emerging trends, technologies, or insights).
+    - {num_sub_themes} sub-themes (detailed and focused on emerging trends, technologies, or insights).
 
     The sub-themes should create a clear direction for the newsletter, avoiding broad, generic topics.
     All your output should be in {language}
     """
 
+    localize_themes = """
+    Translate the newsletter theme and sub-themes in the next message into {language}.
+    Keep their meaning, their question form and the order and number of the sub-themes.
+    """
+
     write_section = """
     Write a newsletter section for the sub-theme: "{sub_theme}".
     
@@ -34,9 +39,7 @@ class NewsletterPrompt:
     """
 
     edit_newsletter = """
-    As an expert editor, review and refine the following newsletter on the theme: {theme}
-
-    {combined_newsletter}
+    As an expert editor, review and refine the newsletter in the next message on the theme: {theme}
 
     Please ensure:
     0. Title should be in question form. subtitles are free to make question or just sentence.
@@ -1,12 +1,13 @@
 """State for the newsletter agent."""
 
-from typing import Annotated, TypedDict
+from typing import Annotated, NotRequired, TypedDict
 
 from langgraph.graph.message import add_messages
 from pydantic import BaseModel
 
 
 def merge_dicts(left: dict, right: dict) -> dict:
+    """Merge dict updates of parallel nodes, later keys winning."""
     return {**left, **right}
 
 
@@ -23,7 +24,20 @@ class State(TypedDict):
     keyword: str
     article_titles: list[str]
     newsletter_theme: NewsletterThemeOutput
-    sub_theme_articles: dict[str, list[dict]]
+    theme_language: NotRequired[str]
+    sub_theme_queries: NotRequired[dict[str, str]]
+    sub_theme_articles: Annotated[dict[str, list[dict]], merge_dicts]
     results: Annotated[dict[str, str], merge_dicts]
     messages: Annotated[list, add_messages]
     language: str
+    max_sections: NotRequired[int]
+
+
+class SectionState(TypedDict):
+    """State sent to a single `write_section` task."""
+
+    sub_theme: str
+    query: NotRequired[str]
+    keyword: str
+    language: str
+    articles: NotRequired[list[dict]]
@@ -1,17 +1,78 @@
 """Tool for searching news articles."""
 
-import streamlit as st
-from tavily import AsyncTavilyClient, TavilyClient
+import asyncio
+import logging
+
+from agent_common.cache import get_search_cache, search_key, search_ttl
+from agent_common.limiter import get_limiter
+from agent_common.tracing import span
+from articles import get_article_store
+from events import ProgressEvent, emit
+from tavily import AsyncTavilyClient
+
+logger = logging.getLogger(__name__)
 
 
 class NewsletterTool:
     """Tool for searching news articles."""
 
-    def __init__(self) -> None:
-        self.client = TavilyClient()
-        self.async_client = AsyncTavilyClient()
+    def __init__(self, async_client: AsyncTavilyClient | None = None) -> None:
+        self.async_client = async_client or AsyncTavilyClient()
+        self.cache = get_search_cache()
+        self.articles = get_article_store()
+        # Searches in flight by cache key
+        self._pending: dict[str, asyncio.Future] = {}
+
+    async def search(self, **search_params) -> dict:
+        """Search with Tavily, serving repeated searches from the search cache.
+
+        Args:
+            **search_params: The keyword arguments of `AsyncTavilyClient.search`.
+
+        Returns:
+            dict: The search response.
+        """
+        params = dict(search_params)
+        key = search_key(params.pop("query"), **params)
+        with span("tavily.search", query=search_params["query"]) as attributes:
+            response = self.cache.get(key)
+            attributes["cache_hit"] = response is not None
+            if response is None:
+                response = await self._search_once(key, search_params)
+        return response
 
-    def search_recent_news(self, keyword: str) -> list:
+    async def _search_once(self, key: str, search_params: dict) -> dict:
+        """Search with Tavily, sharing the response with the same searches in flight.
+
+        Runs started together, e.g. the languages of a batch keyword, search the
+        same sub-themes before any response reaches the cache.
+        """
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            return await asyncio.shield(pending)
+
+        pending = self._pending[key] = loop.create_future()
+        try:
+            response = await get_limiter("search").call(
+                lambda: self.async_client.search(**search_params)
+            )
+        except BaseException as e:
+            if isinstance(e, Exception):
+                pending.set_exception(e)
+                # Mark it retrieved, since no search may be waiting on it
+                pending.exception()
+            else:
+                pending.cancel()
+            raise
+        finally:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+        self.cache.set(key, response, ttl=search_ttl(search_params.get("days")))
+        pending.set_result(response)
+        return response
+
+    async def search_recent_news(self, keyword: str) -> list:
         """Search for recent news articles based on the keyword.
 
         Args:
@@ -20,7 +81,7 @@ class NewsletterTool:
         Returns:
             list: A list of titles of the search results.
         """
-        search_result = self.client.search(
+        search_result = await self.search(
             query=keyword,
             max_results=5,
             topic="news",
@@ -29,59 +90,82 @@ class NewsletterTool:
         titles = [result["title"] for result in search_result["results"]]
         return titles
 
-    async def search_news_for_subtheme(self, subtheme: str) -> dict:
+    async def search_news_for_subtheme(
+        self, subtheme: str, fallback: str | None = None
+    ) -> dict:
         """Search for recent news articles based on the sub-theme.
 
         Args:
             subtheme (str): The sub-theme to search for.
+            fallback (str | None): A broader query searched over a longer window
+                when the sub-theme finds no articles.
 
         Returns:
-            dict: A dictionary containing the search results.
+            dict: The articles found for the sub-theme, with their text in the
+                article store under `content_id`.
         """
-        search_params = {
-            "query": subtheme,
-            "max_results": 3,
-            "topic": "news",
-            "days": 7,
-            "include_images": True,
-            "include_raw_content": True,
-        }
+        step = "search_sub_theme"
+        queries = [(subtheme, 7)] + ([(fallback, 30)] if fallback else [])
+        article_info = []
+        error = None
+        for query, days in queries:
+            emit(
+                ProgressEvent(
+                    step, subtheme, "running", f"Searching '{query}' related news..."
+                )
+            )
+            try:
+                response = await self.search(
+                    query=query,
+                    max_results=3,
+                    topic="news",
+                    days=days,
+                    include_images=True,
+                    include_raw_content=True,
+                )
+            except Exception as e:
+                logger.exception(f"Search for sub-theme '{subtheme}' failed")
+                error = e
+                continue
+            article_info = self.article_info(response)
+            if article_info:
+                break
 
-        try:
-            with st.status(
-                label=f"Searching '{subtheme}' related news...",
-                expanded=False,
-            ) as status:
-                response = await self.async_client.search(**search_params)
-                images = response.get("images", [])
-                results = response.get("results", [])
-
-                article_info = []
-                for i, result in enumerate(results):
-                    article_info.append(
-                        {
-                            "title": result.get("title", ""),
-                            "image_url": images[i] if i < len(images) else "",
-                            "raw_content": result.get("raw_content", ""),
-                        }
-                    )
-
-                if article_info:
-                    status.update(
-                        label=f"Found {len(article_info)} articles related to '{subtheme}'.",
-                        state="complete",
-                        expanded=False,
-                    )
-                    for article in article_info:
-                        status.markdown(f"- {article['title']}")
-                else:
-                    status.update(
-                        label=f"No articles found related to '{subtheme}'.",
-                        state="error",
-                        expanded=False,
-                    )
-            return {subtheme: article_info}
-
-        except Exception as e:
-            st.write(f"Error in search_news_for_subtheme: {e}")
-            return {subtheme: []}
+        if article_info:
+            emit(
+                ProgressEvent(
+                    step,
+                    subtheme,
+                    "complete",
+                    f"Found {len(article_info)} articles related to '{subtheme}'.",
+                    [article["title"] for article in article_info],
+                )
+            )
+        elif error is not None:
+            emit(
+                ProgressEvent(
+                    step, subtheme, "error", f"Searching '{subtheme}' failed: {error}"
+                )
+            )
+        else:
+            emit(
+                ProgressEvent(
+                    step,
+                    subtheme,
+                    "error",
+                    f"No articles found related to '{subtheme}'.",
+                )
+            )
+        return {subtheme: article_info}
+
+    def article_info(self, response: dict) -> list[dict]:
+        """Get the articles of a search response, putting their text in the store."""
+        images = response.get("images", [])
+        return [
+            {
+                "title": result.get("title", ""),
+                "image_url": images[i] if i < len(images) else "",
+                "content_id": self.articles.put(result.get("raw_content") or ""),
+            }
+            for i, result in enumerate(response.get("results", []))
+        ]
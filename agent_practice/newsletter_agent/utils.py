@@ -1,7 +1,7 @@
-from typing import TYPE_CHECKING
+"""Utilities for the newsletter agent."""
 
-import cv2
-import numpy as np
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from langgraph.graph import Graph
@@ -18,11 +18,7 @@ def save_graph(
     """
     try:
         graph_image = graph.get_graph().draw_mermaid_png()
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(graph_image, np.uint8)
-        # Decode image
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        # Save image using cv2
-        cv2.imwrite(filename, img)
+        # The mermaid renderer already returns PNG bytes, so write them as-is
+        Path(filename).write_bytes(graph_image)
     except Exception as e:
         print(f"Failed to save graph visualization: {e}")
@@ -0,0 +1,147 @@
+"""Typed result of a stock analysis, with compact serializers."""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# yfinance statement rows and their column names in the analysis
+FINANCIAL_ITEMS = {
+    "TotalRevenue": "revenue",
+    "OperatingIncome": "operating_income",
+    "NetIncome": "net_income",
+    "EBITDA": "ebitda",
+    "DilutedEPS": "diluted_eps",
+}
+# Per-share items are kept in currency units, the rest are shown in millions
+PER_SHARE_ITEMS = {"diluted_eps"}
+
+
+@dataclass(frozen=True)
+class FinancialTable:
+    """Key income statement items of a ticker by period.
+
+    Attributes:
+        periods (np.ndarray): The period end dates as datetime64[D], newest first.
+        items (list[str]): The item names, in `FINANCIAL_ITEMS` order.
+        values (np.ndarray): The float64 values of shape (periods, items), NaN
+            where the statement has no value.
+    """
+
+    periods: np.ndarray
+    items: list[str]
+    values: np.ndarray
+
+    @classmethod
+    def from_statement(cls, financials: pd.DataFrame) -> "FinancialTable":
+        """Extract the key items from a yfinance income statement.
+
+        Args:
+            financials (pd.DataFrame): Statement items as rows and period end
+                dates as columns.
+
+        Returns:
+            FinancialTable: The key items by period.
+        """
+        table = financials.reindex(list(FINANCIAL_ITEMS)).T.sort_index(ascending=False)
+        return cls(
+            periods=pd.to_datetime(table.index).values.astype("datetime64[D]"),
+            items=list(FINANCIAL_ITEMS.values()),
+            values=table.to_numpy(np.float64, na_value=np.nan),
+        )
+
+    def to_tsv(self) -> str:
+        """Serialize the table as TSV, in millions except for per-share items.
+
+        Returns:
+            str: The header and one row per period, empty where values are missing.
+        """
+        if not len(self.periods):
+            return ""
+        per_share = np.isin(self.items, list(PER_SHARE_ITEMS))
+        scaled = np.where(per_share, self.values, self.values / 1e6)
+        cells = np.where(
+            per_share, np.char.mod("%.2f", scaled), np.char.mod("%.0f", scaled)
+        )
+        cells[np.isnan(scaled)] = ""
+        return _tsv(["period", *self.items], self.periods.astype(str), cells)
+
+
+def _tsv(header: list[str], labels: np.ndarray, cells: np.ndarray) -> str:
+    """Join a header and rows of a label and formatted cells as TSV."""
+    rows = np.column_stack([labels, cells])
+    return "\n".join("\t".join(row) for row in [header, *rows.tolist()]) + "\n"
+
+
+@dataclass(frozen=True)
+class StockAnalysis:
+    """Prices, technical indicators and financials of a ticker.
+
+    Attributes:
+        ticker (str): The ticker symbol.
+        dates (np.ndarray): The dates of the recent closes as datetime64[D].
+        closes (np.ndarray): The recent float64 closes.
+        indicators (dict[str, float | None]): The latest technical indicators.
+        annual (FinancialTable): The annual income statement items.
+        quarterly (FinancialTable): The quarterly income statement items.
+    """
+
+    ticker: str
+    dates: np.ndarray
+    closes: np.ndarray
+    indicators: dict[str, float | None]
+    annual: FinancialTable
+    quarterly: FinancialTable
+
+    def to_prompt(self) -> str:
+        """Serialize the analysis as compact TSV sections for the LLM.
+
+        Returns:
+            str: The analysis, with money in millions of the reporting currency.
+        """
+        closes = _tsv(
+            ["date", "close"],
+            self.dates.astype(str),
+            np.char.mod("%.2f", self.closes)[:, None],
+        )
+        values = np.array(
+            [np.nan if value is None else value for value in self.indicators.values()]
+        )
+        cells = np.char.mod("%.2f", values)
+        cells[np.isnan(values)] = ""
+        indicators = _tsv(
+            ["indicator", "value"], np.array(list(self.indicators)), cells[:, None]
+        )
+        sections = [
+            (f"{self.ticker} recent closes", closes),
+            ("technical indicators", indicators),
+            ("annual financials (millions, EPS per share)", self.annual.to_tsv()),
+            ("quarterly financials (millions, EPS per share)", self.quarterly.to_tsv()),
+        ]
+        return "\n".join(
+            f"## {title}\n{body or 'N/A'}" for title, body in sections
+        ).strip()
+
+    def to_dict(self) -> dict:
+        """Get the analysis as raw values for programmatic consumers.
+
+        Returns:
+            dict: The ticker, the recent closes, the indicators and both financial
+                tables, with NumPy arrays as is.
+        """
+        return {
+            "ticker": self.ticker,
+            "dates": self.dates,
+            "closes": self.closes,
+            "indicators": self.indicators,
+            "annual": {
+                "periods": self.annual.periods,
+                "items": self.annual.items,
+                "values": self.annual.values,
+            },
+            "quarterly": {
+                "periods": self.quarterly.periods,
+                "items": self.quarterly.items,
+                "values": self.quarterly.values,
+            },
+        }
@@ -1,11 +1,18 @@
 """Streamlit app for stock analysis agent."""
 
 import asyncio
+import time
+from datetime import datetime
+
 import streamlit as st
+from agent_common.cache import make_key
+from agent_common.checkpoints import CheckpointStore
+from artifacts import find_artifacts, get_artifact_store, strip_artifacts
 from dotenv import load_dotenv
-from langchain.schema import HumanMessage
-
-from graph import create_stock_ticker_analysis_graph
+from graph import get_stock_ticker_analysis_graph
+from langchain.schema import BaseMessage, HumanMessage
+from langchain_core.messages import AIMessageChunk
+from state import MEMBERS
 
 # UI text dictionary
 UI_TEXT = {
@@ -20,6 +27,10 @@ UI_TEXT = {
         "analysis_completed": "분석 완료!",
         "analysis_failed": "분석 실패",
         "error_occurred": "오류가 발생했습니다",
+        "resuming": "이전 분석을 마지막 단계부터 이어서 진행합니다.",
+        "member_working": "작업 중... (시도: {})",
+        "member_completed": "완료! (시도: {})",
+        "chart_expired": "차트를 더 이상 사용할 수 없습니다",
     },
     "English": {
         "title": "Stock Analysis Assistant 📈",
@@ -32,13 +43,130 @@ UI_TEXT = {
         "analysis_completed": "Analysis completed!",
         "analysis_failed": "Analysis failed",
         "error_occurred": "An error occurred",
+        "resuming": "Resuming the previous analysis from its last step.",
+        "member_working": "is working... (trial: {})",
+        "member_completed": "completed! (trial: {})",
+        "chart_expired": "Chart is no longer available",
     },
 }
 
 
+# Log entries shown per run, and the characters of a payload kept and shown inline
+MAX_LOG_ENTRIES = 200
+MAX_LOG_PAYLOAD_CHARS = 20_000
+LOG_PREVIEW_CHARS = 500
+# Seconds between redraws of a streaming answer, so fast token streams are batched
+STREAM_REDRAW_INTERVAL = 0.05
+
+
+def format_log_payload(value) -> str:
+    """Format a node output for the logs, one line per key, without repr of messages."""
+    if not isinstance(value, dict):
+        return str(value)[:MAX_LOG_PAYLOAD_CHARS]
+    lines = []
+    for key, item in value.items():
+        if key == "messages":
+            for message in item:
+                if isinstance(message, BaseMessage):
+                    lines.append(f"{message.name or message.type}: {message.content}")
+                else:
+                    lines.append(f"message: {message}")
+        else:
+            lines.append(f"{key}: {item}")
+    return "\n".join(lines)[:MAX_LOG_PAYLOAD_CHARS]
+
+
+def render_log_entry(container, key: str, payload: str) -> None:
+    """Append one log entry, collapsing a long payload behind a popover."""
+    with container:
+        st.markdown(f"**{key}**")
+        if len(payload) <= LOG_PREVIEW_CHARS:
+            st.code(payload, language=None)
+            return
+        st.code(payload[:LOG_PREVIEW_CHARS] + " …", language=None)
+        with st.popover(f"Show all {len(payload):,} characters"):
+            st.code(payload, language=None)
+
+
+def render_member_output(container, charts, result: dict, text: dict) -> None:
+    """Show the message of a member and the charts it referenced.
+
+    Chart data is only fetched from the artifact store and turned into a figure
+    here, when it is shown.
+
+    Args:
+        container: The Streamlit container of the member's message.
+        charts: The Streamlit container of the member's charts.
+        result (dict): The state update of the member node.
+        text (dict): The UI text of the selected language.
+    """
+    if "messages" not in result:
+        return
+    content = result["messages"][0].content
+    container.markdown(strip_artifacts(content))
+    for reference in result.get("artifacts", []):
+        artifact = get_artifact_store().get(reference)
+        if artifact is None:
+            charts.error(f"{text['chart_expired']}: {reference}")
+            continue
+        charts.plotly_chart(artifact.to_figure(), use_container_width=True)
+
+
+class MemberStatus:
+    """Status box of a member, with its answer streamed in as tokens arrive."""
+
+    def __init__(self, name: str, text: dict) -> None:
+        self.display_name = name.replace("_", " ")
+        self.text = text
+        self.trials = 0
+        self.status = st.status(self.display_name, expanded=False)
+        self.markdown = self.status.empty()
+        self.charts = st.container()
+        self.buffer = ""
+        self.message_id = None
+        self.last_redraw = 0.0
+
+    def start(self) -> None:
+        """Mark a new trial of the member as running."""
+        self.trials += 1
+        self.buffer = ""
+        self.markdown.empty()
+        self.status.update(
+            label=f"{self.display_name} {self.text['member_working'].format(self.trials)}",
+            state="running",
+            expanded=True,
+        )
+
+    def stream(self, chunk: AIMessageChunk) -> None:
+        """Append a token of the answer, redrawing at most every interval.
+
+        Only the latest LLM turn of the member is shown, which is its final
+        answer once it stops calling tools.
+        """
+        if chunk.id != self.message_id:
+            self.buffer, self.message_id = "", chunk.id
+        self.buffer += chunk.content
+        now = time.monotonic()
+        if now - self.last_redraw >= STREAM_REDRAW_INTERVAL:
+            self.markdown.markdown(strip_artifacts(self.buffer) + " ▌")
+            self.last_redraw = now
+
+    def complete(self, result: dict) -> None:
+        """Replace the streamed answer with the final one and its charts."""
+        self.status.update(
+            label=f"{self.display_name} {self.text['member_completed'].format(self.trials)}",
+            state="complete",
+            expanded=False,
+        )
+        render_member_output(self.markdown, self.charts, result, self.text)
+
+
 async def run_graph(inputs: dict) -> None:
-    """Run the stock analysis graph."""
-    graph = create_stock_ticker_analysis_graph()
+    """Run the stock analysis graph.
+
+    Node updates drive the progress and logs, and the tokens of the members'
+    answers are streamed into their status boxes as the LLM writes them.
+    """
     language = inputs.get("language", "English")
     text = UI_TEXT[language]
 
@@ -52,10 +180,20 @@ async def run_graph(inputs: dict) -> None:
         with col2:
             progress_bar = st.progress(0)
 
-    # Create log container
+    # Member status boxes are created as the supervisor routes to each member
+    members_container = st.container()
+    members: dict[str, MemberStatus] = {}
+
+    def start_member(name: str) -> None:
+        if name not in members:
+            with members_container:
+                members[name] = MemberStatus(name, text)
+        members[name].start()
+
+    # Create log container. Entries are appended, so each step only sends its own
     with st.expander("Detailed logs", expanded=False):
-        log_container = st.empty()
-        logs = []
+        log_container = st.container()
+    log_count = 0
 
     step_dict = {
         "supervisor": 0,
@@ -66,31 +204,85 @@ async def run_graph(inputs: dict) -> None:
     total_steps = 4
 
     try:
-        for output in graph.stream(inputs):
-            # Add log entry for each output
-            for key, value in output.items():
-                # Format the output for logging
-                log_entry = f"**{key}**:\n```python\n{value}\n```"
-                logs.append(log_entry)
-                log_container.markdown("\n\n".join(logs))
-
-                # Update progress
-                if "next" in value:
-                    next_agent = value["next"]
-                    if next_agent == "FINISH":
-                        progress_bar.progress(1.0)
-                        status_text.success(text["analysis_completed"])
-                        break
-                    progress_bar.progress(step_dict[next_agent] / total_steps)
-                    status_text.text(
-                        f"{text['current_step']}: {next_agent.replace('_', ' ')}"
-                    )
+        async with CheckpointStore.open() as checkpoints:
+            graph = checkpoints.attach(get_stock_ticker_analysis_graph())
+            config, resume = await checkpoints.thread(
+                graph,
+                make_key(
+                    "stock",
+                    inputs["messages"][0].content,
+                    language,
+                    inputs.get("current_date"),
+                ),
+            )
+            if resume:
+                # Show what the interrupted run already finished
+                snapshot = await graph.aget_state(config)
+                status_text.info(text["resuming"])
+                for message in snapshot.values.get("messages", []):
+                    if message.name in MEMBERS:
+                        start_member(message.name)
+                        members[message.name].complete(
+                            {
+                                "messages": [message],
+                                "artifacts": find_artifacts(message.content),
+                            }
+                        )
+                for name in snapshot.next:
+                    if name in MEMBERS:
+                        start_member(name)
+
+            async for mode, chunk in graph.astream(
+                None if resume else inputs,
+                config,
+                stream_mode=["updates", "messages"],
+            ):
+                if mode == "messages":
+                    message, metadata = chunk
+                    member = members.get(metadata.get("member"))
+                    # Only answer text is shown, not tool call arguments or results
+                    if (
+                        member
+                        and isinstance(message, AIMessageChunk)
+                        and isinstance(message.content, str)
+                        and message.content
+                    ):
+                        member.stream(message)
+                    continue
+
+                # Add log entry for each output
+                for key, value in chunk.items():
+                    # Format the output for logging
+                    log_count += 1
+                    if log_count < MAX_LOG_ENTRIES:
+                        render_log_entry(log_container, key, format_log_payload(value))
+                    elif log_count == MAX_LOG_ENTRIES:
+                        log_container.caption(
+                            f"Showing the first {MAX_LOG_ENTRIES - 1} log entries."
+                        )
+
+                    if key in MEMBERS:
+                        members[key].complete(value)
+
+                    # Update progress
+                    if "next" in value:
+                        next_agent = value["next"]
+                        if next_agent == "FINISH":
+                            progress_bar.progress(1.0)
+                            status_text.success(text["analysis_completed"])
+                            break
+                        start_member(next_agent)
+                        progress_bar.progress(step_dict[next_agent] / total_steps)
+                        status_text.text(
+                            f"{text['current_step']}: {next_agent.replace('_', ' ')}"
+                        )
+
+            await checkpoints.finish(config)
 
     except Exception as e:
         status_text.error(text["analysis_failed"])
         st.error(f"{text['error_occurred']}: {str(e)}")
-        logs.append(f"**Error**:\n```python\n{str(e)}\n```")
-        log_container.markdown("\n\n".join(logs))
+        render_log_entry(log_container, "Error", str(e))
 
 
 if __name__ == "__main__":
@@ -135,6 +327,7 @@ if __name__ == "__main__":
                     "messages": [HumanMessage(content=question)],
                     "next": "supervisor",
                     "language": language,
+                    "current_date": datetime.now().strftime("%Y-%m-%d"),
                 }
             )
         )
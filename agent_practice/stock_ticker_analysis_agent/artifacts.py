@@ -0,0 +1,208 @@
+"""Side-channel store of chart data, referenced from messages and state by ID."""
+
+import hashlib
+import re
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from agent_common.cache import MemoryStore
+from downsample import (
+    DEFAULT_CHART_WIDTH,
+    bucket_starts,
+    downsample_line,
+    downsample_ohlc,
+    point_budget,
+)
+from indicators import SMA_WINDOWS
+
+ARTIFACT_SCHEME = "artifact://"
+ARTIFACT_PATTERN = re.compile(r"artifact://([0-9a-f]{32})")
+# Markdown images or links that point at an artifact, which markdown cannot show
+ARTIFACT_LINK_PATTERN = re.compile(r"!?\[[^\]]*\]\(artifact://[0-9a-f]{32}\)")
+
+
+@dataclass(frozen=True)
+class ChartArtifact:
+    """Candlestick chart data as compact columns.
+
+    Attributes:
+        title (str): The chart title.
+        index (np.ndarray): The bar dates as int64 days since the epoch.
+        ohlc (np.ndarray): The float32 open, high, low and close of each bar.
+        overlays (dict[str, np.ndarray]): Float32 line series drawn over the
+            candles, e.g. moving averages, aligned with `index`.
+    """
+
+    title: str
+    index: np.ndarray
+    ohlc: np.ndarray
+    overlays: dict[str, np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def from_frame(cls, title: str, frame: pd.DataFrame) -> "ChartArtifact":
+        """Build a chart artifact from OHLCV bars on a date index.
+
+        The simple moving averages whose window fits in the bars are drawn as
+        overlays, undefined until their window fills.
+
+        Args:
+            title (str): The chart title.
+            frame (pd.DataFrame): The bars with Open, High, Low and Close columns.
+
+        Returns:
+            ChartArtifact: The chart artifact.
+        """
+        close = frame["Close"]
+        return cls(
+            title=title,
+            index=frame.index.values.astype("datetime64[D]").astype(np.int64),
+            ohlc=frame[["Open", "High", "Low", "Close"]].to_numpy(np.float32),
+            overlays={
+                f"SMA {window}": close.rolling(window).mean().to_numpy(np.float32)
+                for window in SMA_WINDOWS
+                if window <= len(frame)
+            },
+        )
+
+    @property
+    def id(self) -> str:
+        """The content hash of the chart, so identical charts share one entry."""
+        digest = hashlib.sha256(self.title.encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.index).tobytes())
+        digest.update(np.ascontiguousarray(self.ohlc).tobytes())
+        for name, values in sorted(self.overlays.items()):
+            digest.update(name.encode("utf-8"))
+            digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()[:32]
+
+    @property
+    def nbytes(self) -> int:
+        """The bytes taken by the chart columns."""
+        return (
+            self.index.nbytes
+            + self.ohlc.nbytes
+            + sum(values.nbytes for values in self.overlays.values())
+        )
+
+    def to_figure(self, width: int | None = DEFAULT_CHART_WIDTH) -> go.Figure:
+        """Build the plotly candlestick figure of the chart.
+
+        Candles and overlays are aggregated over the same buckets down to what
+        a chart of `width` pixels can show, so the figure payload stays bounded
+        for long windows.
+
+        Args:
+            width (int | None): The chart width in pixels. None keeps every bar.
+
+        Returns:
+            go.Figure: The figure.
+        """
+        starts = None
+        if width is not None:
+            starts = bucket_starts(len(self.index), point_budget(width))
+        index, ohlc = self.index, self.ohlc
+        if starts is not None:
+            index, ohlc = index[starts], downsample_ohlc(ohlc, starts)
+        data = [
+            go.Candlestick(
+                x=index.astype("datetime64[D]"),
+                open=ohlc[:, 0],
+                high=ohlc[:, 1],
+                low=ohlc[:, 2],
+                close=ohlc[:, 3],
+                name="Price",
+            )
+        ]
+        for name, values in self.overlays.items():
+            if starts is not None:
+                values = downsample_line(values, starts)
+            data.append(
+                go.Scatter(
+                    x=index.astype("datetime64[D]"),
+                    y=values,
+                    mode="lines",
+                    name=name,
+                )
+            )
+
+        fig = go.Figure(data=data)
+        fig.update_layout(
+            title=self.title,
+            yaxis_title="Stock Price (USD)",
+            xaxis_title="Date",
+        )
+        return fig
+
+
+class ArtifactStore:
+    """Bounded in-process store of chart artifacts."""
+
+    def __init__(self, maxsize: int = 256, ttl: float | None = 60 * 60) -> None:
+        self.ttl = ttl
+        self._artifacts = MemoryStore(maxsize=maxsize)
+
+    def put(self, artifact: ChartArtifact) -> str:
+        """Store an artifact.
+
+        Args:
+            artifact (ChartArtifact): The artifact to store.
+
+        Returns:
+            str: The `artifact://<id>` reference of the artifact.
+        """
+        self._artifacts.set(artifact.id, artifact, self.ttl)
+        return f"{ARTIFACT_SCHEME}{artifact.id}"
+
+    def get(self, reference: str) -> ChartArtifact | None:
+        """Get an artifact by its reference or ID, or None if it has expired.
+
+        Args:
+            reference (str): The `artifact://<id>` reference or the bare ID.
+
+        Returns:
+            ChartArtifact | None: The artifact.
+        """
+        return self._artifacts.get(reference.removeprefix(ARTIFACT_SCHEME))
+
+
+def find_artifacts(text: str) -> list[str]:
+    """Find the artifact references in a text, in order and without repeats.
+
+    Args:
+        text (str): The text to search.
+
+    Returns:
+        list[str]: The `artifact://<id>` references.
+    """
+    return list(
+        dict.fromkeys(
+            f"{ARTIFACT_SCHEME}{match}" for match in ARTIFACT_PATTERN.findall(text)
+        )
+    )
+
+
+def strip_artifacts(text: str) -> str:
+    """Remove artifact links and references from a text for display."""
+    text = ARTIFACT_LINK_PATTERN.sub("", text)
+    return ARTIFACT_PATTERN.sub("", text).strip()
+
+
+_artifact_store: ArtifactStore | None = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Get the process-wide artifact store, shared by the tools and the app.
+
+    Returns:
+        ArtifactStore: The shared artifact store.
+    """
+    global _artifact_store
+    if _artifact_store is None:
+        with _artifact_store_lock:
+            if _artifact_store is None:
+                _artifact_store = ArtifactStore()
+    return _artifact_store
@@ -0,0 +1,314 @@
+"""Microbenchmarks for the stock ticker analysis agent.
+
+Run from this directory, e.g. `python benchmark.py hop`. No API calls are made.
+"""
+
+import argparse
+import os
+import timeit
+from datetime import datetime
+
+# Clients validate their keys on construction, but nothing here calls them
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+
+def report(name: str, seconds: float, number: int) -> None:
+    """Print the mean time of a benchmark in milliseconds."""
+    print(f"{name:<40} {seconds / number * 1000:10.3f} ms")
+
+
+def bench_hop(number: int) -> None:
+    """Compare the setup cost of a member hop before and after reusing agents.
+
+    Before, every hop compiled a new ReAct agent, formatted its prompt and, for
+    the chart generator, built a new Python REPL tool. Now the agents are compiled
+    once and a hop only formats the prompt from state.
+    """
+    from agent import StockTickerAnalysisAgent
+    from langchain_core.messages import HumanMessage
+    from langchain_experimental.tools import PythonREPLTool
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+
+    llm = ChatOpenAI(model="gpt-4o-mini")
+    agent = StockTickerAnalysisAgent(llm)
+    state = {
+        "messages": [HumanMessage(content="Should I buy AAPL?")],
+        "language": "English",
+        "current_date": datetime.now().strftime("%Y-%m-%d"),
+    }
+    members = [
+        (agent.prompt.researcher_prompt, lambda: agent.tool.search_web),
+        (agent.prompt.stock_analyzer_prompt, lambda: agent.tool.analyze_stock_ticker),
+        # python_repl_tool used to be a property that built a new tool per access
+        (
+            agent.prompt.chart_generator_prompt,
+            lambda: PythonREPLTool(
+                globals={"create_stock_chart": agent.tool.create_stock_chart}
+            ),
+        ),
+    ]
+
+    def rebuild_per_hop() -> None:
+        for template, make_tool in members:
+            create_react_agent(
+                llm,
+                tools=[make_tool()],
+                state_modifier=template.format(
+                    language=state["language"],
+                    current_date=datetime.now().strftime("%Y-%m-%d"),
+                ),
+            )
+
+    state_modifiers = [agent.member_prompt(template) for template, _ in members]
+
+    def reuse_compiled() -> None:
+        for state_modifier in state_modifiers:
+            state_modifier(state)
+
+    report(
+        "hop setup, rebuild per hop (before)",
+        timeit.timeit(rebuild_per_hop, number=number),
+        number,
+    )
+    report(
+        "hop setup, compiled once (after)",
+        timeit.timeit(reuse_compiled, number=number),
+        number,
+    )
+
+
+def bench_chart(number: int) -> None:
+    """Compare chart payload size and render time with and without downsampling.
+
+    Render time covers building the figure and serializing it to the JSON the
+    browser receives, for random-walk daily bars over 1, 5 and 20 years. The
+    browser's own drawing time grows with the number of candles shown. The
+    charts carry the moving average overlays the chart tool draws.
+    """
+    import numpy as np
+    import pandas as pd
+    from artifacts import ChartArtifact
+
+    rng = np.random.default_rng(0)
+    for years in (1, 5, 20):
+        bars = 252 * years
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+        spread = np.abs(rng.normal(0, 0.005, bars)) * close
+        frame = pd.DataFrame(
+            {
+                "Open": np.roll(close, 1),
+                "High": close + spread,
+                "Low": close - spread,
+                "Close": close,
+            },
+            index=pd.bdate_range("2000-01-03", periods=bars),
+        )
+        artifact = ChartArtifact.from_frame(f"{years}y", frame)
+
+        for label, width in (("full", None), ("downsampled", 1000)):
+            fig = artifact.to_figure(width)
+            candles, payload = len(fig.data[0].x), len(fig.to_json())
+            seconds = timeit.timeit(
+                lambda: artifact.to_figure(width).to_json(), number=number
+            )
+            report(
+                f"{years}y {label}, {candles} bars, {payload / 1024:.0f} KiB",
+                seconds,
+                number,
+            )
+
+
+def bench_analysis(number: int) -> None:
+    """Compare the size of the analysis tool output before and after typed results.
+
+    Before, the tool returned `str()` of nested dicts with Korean keys and
+    comma-formatted numbers. Now it returns TSV tables. Sizes are in o200k_base
+    tokens when tiktoken can load the encoding, else in characters.
+    """
+    import numpy as np
+    import pandas as pd
+    from analysis import FINANCIAL_ITEMS, FinancialTable, StockAnalysis
+    from indicators import compute_indicators
+
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=260)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    prices = pd.DataFrame(
+        {"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close},
+        index=index,
+    )
+    statements = {
+        freq: pd.DataFrame(
+            rng.uniform(1e10, 1e11, (len(FINANCIAL_ITEMS), periods)),
+            index=list(FINANCIAL_ITEMS),
+            columns=pd.date_range(end="2025-09-30", periods=periods, freq=freq),
+        )
+        for freq, periods in (("YE", 4), ("QE", 5))
+    }
+    indicators = compute_indicators({"AAPL": prices}).summary()["AAPL"]
+
+    def format_number(number):
+        return "N/A" if pd.isna(number) else f"{number:,.0f}"
+
+    def format_financial_summary(financials):
+        return {
+            date.strftime("%Y-%m-%d"): {
+                "총수익": format_number(data.get("TotalRevenue")),
+                "영업이익": format_number(data.get("OperatingIncome")),
+                "순이익": format_number(data.get("NetIncome")),
+                "EBITDA": format_number(data.get("EBITDA")),
+                "EPS(희석)": f"${data.get('DilutedEPS'):.2f}",
+            }
+            for date, data in financials.items()
+        }
+
+    def before() -> str:
+        return str(
+            {
+                "최근 5일간 종가": {
+                    date.strftime("%Y-%m-%d"): price
+                    for date, price in prices["Close"].tail(5).items()
+                },
+                "기술적 지표": indicators,
+                "연간 재무제표 요약": format_financial_summary(statements["YE"]),
+                "분기별 재무제표 요약": format_financial_summary(statements["QE"]),
+            }
+        )
+
+    def after() -> str:
+        closes = prices["Close"].tail(5)
+        return StockAnalysis(
+            ticker="AAPL",
+            dates=closes.index.values.astype("datetime64[D]"),
+            closes=closes.to_numpy(),
+            indicators=indicators,
+            annual=FinancialTable.from_statement(statements["YE"]),
+            quarterly=FinancialTable.from_statement(statements["QE"]),
+        ).to_prompt()
+
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        size, unit = (lambda text: len(encoding.encode(text))), "tokens"
+    except Exception:
+        size, unit = len, "chars"
+
+    for label, build in (("before", before), ("after", after)):
+        report(
+            f"analysis output {label}, {size(build())} {unit}",
+            timeit.timeit(build, number=number),
+            number,
+        )
+
+
+def bench_context(number: int) -> None:
+    """Compare growing the message history by concatenation with the message log.
+
+    Before, every update concatenated the whole history into a new list and every
+    member read all of it. Now an update appends to a shared log, and a member
+    only reads the messages it needs, with older outputs shortened.
+    """
+    import operator
+
+    from context import member_context
+    from langchain_core.messages import HumanMessage
+    from state import MEMBERS, MessageLog, append_messages
+
+    def make_updates(count: int) -> list[list[HumanMessage]]:
+        updates = [[HumanMessage(content="Should I buy AAPL?")]]
+        for i in range(count):
+            name = MEMBERS[i % len(MEMBERS)]
+            content = f"{name} output {i}\n" * 200
+            updates.append([HumanMessage(content=content, name=name)])
+        return updates
+
+    def concatenate(updates: list[list[HumanMessage]]) -> list:
+        messages = []
+        for update in updates:
+            messages = operator.add(messages, update)
+        return messages
+
+    def append(updates: list[list[HumanMessage]]) -> MessageLog:
+        messages = MessageLog()
+        for update in updates:
+            messages = append_messages(messages, update)
+        return messages
+
+    # Concatenation is quadratic in the updates, but copies in C, so the log only
+    # pays off for long histories
+    for count in (20, 5000):
+        updates = make_updates(count)
+        for label, build in (
+            ("concatenate (before)", concatenate),
+            ("message log (after)", append),
+        ):
+            report(
+                f"{count} updates, {label}",
+                timeit.timeit(lambda: build(updates), number=number),
+                number,
+            )
+
+    messages = append(make_updates(200))
+    history = sum(len(message.content) for message in messages)
+    print(f"{'history':<40} {history:10,} chars")
+    for member in MEMBERS:
+        context = sum(
+            len(message.content) for message in member_context(messages, member)
+        )
+        print(f"{member + ' context':<40} {context:10,} chars")
+
+
+def bench_sandbox(number: int) -> None:
+    """Compare running chart code in a fresh interpreter with the warm sandbox pool.
+
+    A fresh interpreter pays for importing pandas, plotly and yfinance on every
+    run, while pool workers fork from a fork server that imported them once.
+    """
+    import subprocess
+    import sys
+
+    from sandbox import SandboxPool
+
+    code = "import pandas, plotly.graph_objects, yfinance\nprint(1)"
+    report(
+        "python run, fresh interpreter (before)",
+        timeit.timeit(
+            lambda: subprocess.run(
+                [sys.executable, "-c", code], check=True, capture_output=True
+            ),
+            number=number,
+        ),
+        number,
+    )
+
+    pool = SandboxPool(size=1)
+    pool.run(code)
+    report(
+        "python run, warm sandbox pool (after)",
+        timeit.timeit(lambda: pool.run(code), number=number),
+        number,
+    )
+    pool.close()
+
+
+BENCHMARKS = {
+    "analysis": bench_analysis,
+    "chart": bench_chart,
+    "context": bench_context,
+    "hop": bench_hop,
+    "sandbox": bench_sandbox,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument(
+        "--number", type=int, default=20, help="Repetitions to average."
+    )
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.number)
@@ -0,0 +1,73 @@
+"""Compacted context that each member sees of the run's messages."""
+
+from typing import Sequence
+
+from artifacts import find_artifacts
+from langchain_core.messages import BaseMessage, HumanMessage
+from state import MEMBERS
+
+# Outputs of other members that each member reads, besides the user's messages.
+# The chart generator only needs the ticker from the user's question
+MEMBER_INPUTS = {
+    "Researcher": (),
+    "Stock_Analyzer": ("Researcher",),
+    "Chart_Generator": (),
+}
+# Member outputs kept verbatim in a member's context. Older ones are shortened
+RECENT_OUTPUTS = 2
+SUMMARY_CHARS = 600
+
+
+def summarize_output(message: BaseMessage) -> BaseMessage:
+    """Shorten an older member output to its opening, keeping chart references.
+
+    Args:
+        message (BaseMessage): The member output.
+
+    Returns:
+        BaseMessage: The output itself if it is short, else a shortened copy
+            from the same member.
+    """
+    content = message.content if isinstance(message.content, str) else ""
+    if len(content) <= SUMMARY_CHARS:
+        return message
+    # Cut at the last line break within the budget, if there is one
+    opening = content[:SUMMARY_CHARS]
+    opening = opening[: opening.rfind("\n")] if "\n" in opening else opening
+    references = [
+        reference for reference in find_artifacts(content) if reference not in opening
+    ]
+    summary = (
+        f"{opening.rstrip()}\n[… {len(content) - len(opening):,} characters omitted]"
+    )
+    if references:
+        summary += "\n" + "\n".join(references)
+    return HumanMessage(content=summary, name=message.name)
+
+
+def member_context(messages: Sequence[BaseMessage], member: str) -> list[BaseMessage]:
+    """Select and compact the messages a member sees on its hop.
+
+    The member sees the user's messages, its own earlier outputs and the outputs
+    of the members in `MEMBER_INPUTS`. The last `RECENT_OUTPUTS` of those
+    outputs are kept verbatim and older ones are shortened.
+
+    Args:
+        messages (Sequence[BaseMessage]): The messages of the run.
+        member (str): The member about to run.
+
+    Returns:
+        list[BaseMessage]: The messages to hand to the member.
+    """
+    visible = {member, *MEMBER_INPUTS.get(member, MEMBERS)}
+    selected = [
+        message
+        for message in messages
+        if message.name not in MEMBERS or message.name in visible
+    ]
+    outputs = [i for i, message in enumerate(selected) if message.name in MEMBERS]
+    older = set(outputs[: max(len(outputs) - RECENT_OUTPUTS, 0)])
+    return [
+        summarize_output(message) if i in older else message
+        for i, message in enumerate(selected)
+    ]
@@ -0,0 +1,88 @@
+"""Vectorized downsampling of chart series to a point budget."""
+
+import numpy as np
+
+DEFAULT_CHART_WIDTH = 1000
+# Narrower candles than this are no longer readable
+PIXELS_PER_CANDLE = 4
+# Series this much longer than the budget are still drawn in full, since
+# aggregating them would save little
+DOWNSAMPLE_MARGIN = 1.2
+
+
+def point_budget(
+    width: int = DEFAULT_CHART_WIDTH, pixels_per_point: int = PIXELS_PER_CANDLE
+) -> int:
+    """Get how many points a chart of a width can show.
+
+    Args:
+        width (int): The chart width in pixels.
+        pixels_per_point (int): The pixels each point needs.
+
+    Returns:
+        int: The point budget, at least 2.
+    """
+    return max(width // pixels_per_point, 2)
+
+
+def bucket_starts(n: int, budget: int) -> np.ndarray | None:
+    """Split `n` rows into at most `budget` near-equal buckets of consecutive rows.
+
+    Args:
+        n (int): The number of rows.
+        budget (int): The maximum number of buckets.
+
+    Returns:
+        np.ndarray | None: The first row of each bucket, or None if the rows
+            are within `DOWNSAMPLE_MARGIN` of the budget and need no buckets.
+    """
+    if n <= budget * DOWNSAMPLE_MARGIN:
+        return None
+    return np.arange(budget, dtype=np.int64) * n // budget
+
+
+def downsample_ohlc(ohlc: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Aggregate OHLC bars into one bar per bucket.
+
+    Each bucket of consecutive bars becomes one bar with the first open, the
+    highest high, the lowest low and the last close, so the downsampled candles
+    still span every price reached. The bar is dated at the first bar of its
+    bucket.
+
+    Args:
+        ohlc (np.ndarray): The open, high, low and close of each bar.
+        starts (np.ndarray): The first bar of each bucket, from `bucket_starts`.
+
+    Returns:
+        np.ndarray: The OHLC of the aggregated bars.
+    """
+    ends = np.append(starts[1:], len(ohlc)) - 1
+    aggregated = np.column_stack(
+        [
+            ohlc[starts, 0],
+            np.maximum.reduceat(ohlc[:, 1], starts),
+            np.minimum.reduceat(ohlc[:, 2], starts),
+            ohlc[ends, 3],
+        ]
+    )
+    return aggregated.astype(ohlc.dtype, copy=False)
+
+
+def downsample_line(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Average a line series over the same buckets as the candles.
+
+    Smooth overlays such as moving averages lose nothing visible this way, and
+    their points line up with the aggregated candles.
+
+    Args:
+        values (np.ndarray): The line values, NaN where undefined.
+        starts (np.ndarray): The first row of each bucket, from `bucket_starts`.
+
+    Returns:
+        np.ndarray: The mean of each bucket, NaN for buckets without values.
+    """
+    defined = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(defined, values, 0), starts)
+    counts = np.add.reduceat(defined, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / counts).astype(values.dtype, copy=False)
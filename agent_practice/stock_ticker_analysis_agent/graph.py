@@ -1,21 +1,61 @@
-import functools
+"""Graph for the stock ticker analysis agent."""
 
-from langchain_core.messages import BaseMessage
+import threading
+
+from agent import StockTickerAnalysisAgent
+from agent_common.llm_cache import get_llm_cache
+from agent_common.tracing import get_tracer
+from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, StateGraph
-from langgraph.prebuilt import create_react_agent
+from state import MEMBERS, State
+from tool import StockTickerAnalysisTool
 
-from agent import StockTickerAnalysisAgent
-from state import State, MEMBERS
+# Process-wide registry of compiled graphs, shared by Streamlit reruns and sessions
+_GRAPHS: dict[tuple, StateGraph] = {}
+_GRAPHS_LOCK = threading.Lock()
 
 
-def create_stock_ticker_analysis_graph() -> StateGraph:
-    """Create the stock ticker analysis graph."""
+def create_stock_ticker_analysis_graph(
+    llm_cache: str | None = "memory",
+    semantic_cache: bool = False,
+    cached_nodes: tuple[str, ...] = ("supervisor",),
+    routing: str = "auto",
+    checkpointer: BaseCheckpointSaver | None = None,
+    llm: BaseChatModel | None = None,
+    tool: StockTickerAnalysisTool | None = None,
+) -> StateGraph:
+    """Create the stock ticker analysis graph.
 
-    llm = ChatOpenAI(model="gpt-4o-mini")
+    Args:
+        llm_cache (str | None): LLM response cache backend, "memory" or "sqlite".
+            None disables the cache.
+        semantic_cache (bool): Whether the LLM cache also serves near-duplicate
+            prompts.
+        cached_nodes (tuple[str, ...]): Nodes whose LLM calls use the cache.
+        routing (str): "deterministic" runs every member in order without asking
+            the LLM. "llm" asks the LLM once per run which members to run. "auto"
+            only asks when the query looks like it needs part of the analysis.
+        checkpointer (BaseCheckpointSaver | None): Saver that checkpoints every
+            step, so a run on the same thread resumes after the last completed
+            node. The app instead attaches its saver to the shared graph per
+            run, with `CheckpointStore.attach`.
+        llm (BaseChatModel | None): Chat model used instead of gpt-4o-mini, e.g.
+            a replay stand-in.
+        tool (StockTickerAnalysisTool | None): Member tools used instead of new
+            ones, e.g. over replayed search and market data.
+    """
+    llm = llm or ChatOpenAI(model="gpt-4o-mini")
 
     workflow = StateGraph(State)
-    agent = StockTickerAnalysisAgent(llm)
+    agent = StockTickerAnalysisAgent(
+        llm,
+        llm_cache=get_llm_cache(llm_cache, semantic_cache) if llm_cache else None,
+        cached_nodes=cached_nodes,
+        routing=routing,
+        tool=tool,
+    )
 
     # Add nodes
     workflow.add_node("Researcher", agent.researcher_agent)
@@ -32,4 +72,24 @@ def create_stock_ticker_analysis_graph() -> StateGraph:
     conditional_map["FINISH"] = END
     workflow.add_conditional_edges("supervisor", lambda x: x["next"], conditional_map)
 
-    return workflow.compile()
+    config = {"run_name": "stock_ticker_analysis"}
+    tracer = get_tracer()
+    if tracer is not None:
+        config["callbacks"] = [tracer]
+    return workflow.compile(checkpointer=checkpointer).with_config(**config)
+
+
+def get_stock_ticker_analysis_graph(**options) -> StateGraph:
+    """Get the compiled graph for the config, compiling it on first use.
+
+    Args:
+        **options: Keyword arguments of `create_stock_ticker_analysis_graph`.
+    """
+    key = tuple(sorted(options.items()))
+    graph = _GRAPHS.get(key)
+    if graph is None:
+        with _GRAPHS_LOCK:
+            graph = _GRAPHS.get(key)
+            if graph is None:
+                graph = _GRAPHS[key] = create_stock_ticker_analysis_graph(**options)
+    return graph
@@ -0,0 +1,272 @@
+"""Vectorized technical indicators over many tickers, updated bar by bar."""
+
+import copy
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+SMA_WINDOWS = (20, 50, 200)
+EMA_SPANS = (12, 26)
+MACD_SIGNAL_SPAN = 9
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_STDS = 2.0
+VOLATILITY_WINDOW = 20
+# Bars kept for the rolling-window indicators
+LOOKBACK = max(*SMA_WINDOWS, BOLLINGER_WINDOW, VOLATILITY_WINDOW + 1)
+
+
+def stack_bars(
+    bars: dict[str, pd.DataFrame],
+) -> tuple[pd.DatetimeIndex, list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Align the bars of many tickers on their union of dates.
+
+    Args:
+        bars (dict[str, pd.DataFrame]): The OHLCV bars of each ticker.
+
+    Returns:
+        tuple[pd.DatetimeIndex, list[str], np.ndarray, np.ndarray, np.ndarray]:
+            The dates, the tickers, and the close, high and low arrays of shape
+            (dates, tickers), with NaN where a ticker has no bar.
+    """
+    tickers = list(bars)
+    index = pd.DatetimeIndex([])
+    for frame in bars.values():
+        index = index.union(frame.index)
+    columns = [
+        (
+            np.column_stack(
+                [
+                    bars[ticker][column].reindex(index).to_numpy(np.float64)
+                    for ticker in tickers
+                ]
+            )
+            if tickers
+            else np.empty((len(index), 0))
+        )
+        for column in ("Close", "High", "Low")
+    ]
+    return index, tickers, *columns
+
+
+def _ewm_step(average: np.ndarray, values: np.ndarray, alpha: float) -> np.ndarray:
+    """Advance exponential moving averages by one bar, skipping missing values.
+
+    An average starts at the first value it sees, like pandas' `adjust=False`.
+    """
+    stepped = np.where(np.isnan(average), values, average + alpha * (values - average))
+    return np.where(np.isnan(values), average, stepped)
+
+
+@dataclass
+class IndicatorState:
+    """Running indicators of a set of tickers.
+
+    Recursive indicators (EMA, MACD, RSI, ATR, drawdown) keep their last values
+    and the rolling ones keep the last `LOOKBACK` closes, so appending bars only
+    costs work proportional to the new bars. Every step is vectorized across the
+    tickers.
+
+    Attributes:
+        tickers (list[str]): The tickers, in column order.
+        last_date (pd.Timestamp | None): The date of the last bar seen.
+    """
+
+    tickers: list[str]
+    last_date: pd.Timestamp | None = None
+    closes: np.ndarray = field(init=False)
+    prev_close: np.ndarray = field(init=False)
+    ema: dict[int, np.ndarray] = field(init=False)
+    macd_signal: np.ndarray = field(init=False)
+    avg_gain: np.ndarray = field(init=False)
+    avg_loss: np.ndarray = field(init=False)
+    atr: np.ndarray = field(init=False)
+    peak: np.ndarray = field(init=False)
+    max_drawdown: np.ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        empty = np.full(len(self.tickers), np.nan)
+        self.closes = np.empty((0, len(self.tickers)))
+        self.prev_close = empty.copy()
+        self.ema = {span: empty.copy() for span in EMA_SPANS}
+        self.macd_signal = empty.copy()
+        self.avg_gain = empty.copy()
+        self.avg_loss = empty.copy()
+        self.atr = empty.copy()
+        self.peak = empty.copy()
+        self.max_drawdown = empty.copy()
+
+    def copy(self) -> "IndicatorState":
+        """Get an independent copy of the state."""
+        return copy.deepcopy(self)
+
+    def update(self, close: np.ndarray, high: np.ndarray, low: np.ndarray) -> None:
+        """Feed new bars of every ticker, in date order.
+
+        Args:
+            close (np.ndarray): The closes, of shape (bars, tickers).
+            high (np.ndarray): The highs, of shape (bars, tickers).
+            low (np.ndarray): The lows, of shape (bars, tickers).
+        """
+        for row_close, row_high, row_low in zip(close, high, low):
+            for span in EMA_SPANS:
+                self.ema[span] = _ewm_step(self.ema[span], row_close, 2 / (span + 1))
+            macd = self.ema[EMA_SPANS[0]] - self.ema[EMA_SPANS[1]]
+            self.macd_signal = _ewm_step(
+                self.macd_signal, macd, 2 / (MACD_SIGNAL_SPAN + 1)
+            )
+
+            change = row_close - self.prev_close
+            self.avg_gain = _ewm_step(
+                self.avg_gain,
+                np.where(np.isnan(change), np.nan, np.fmax(change, 0)),
+                1 / RSI_PERIOD,
+            )
+            self.avg_loss = _ewm_step(
+                self.avg_loss,
+                np.where(np.isnan(change), np.nan, np.fmax(-change, 0)),
+                1 / RSI_PERIOD,
+            )
+
+            # fmax ignores the gaps to a missing previous close on the first bar
+            true_range = np.fmax(
+                row_high - row_low,
+                np.fmax(
+                    np.abs(row_high - self.prev_close),
+                    np.abs(row_low - self.prev_close),
+                ),
+            )
+            self.atr = _ewm_step(self.atr, true_range, 1 / ATR_PERIOD)
+
+            self.peak = np.fmax(self.peak, row_close)
+            self.max_drawdown = np.fmin(self.max_drawdown, row_close / self.peak - 1)
+            self.prev_close = np.where(np.isnan(row_close), self.prev_close, row_close)
+
+        self.closes = np.concatenate([self.closes, close])[-LOOKBACK:]
+
+    def append(self, bars: dict[str, pd.DataFrame]) -> None:
+        """Feed the bars after `last_date` of every ticker.
+
+        Args:
+            bars (dict[str, pd.DataFrame]): The OHLCV bars of the tickers. Bars
+                up to `last_date` are skipped.
+        """
+        unknown = set(bars) - set(self.tickers)
+        if unknown:
+            raise ValueError(f"Tickers not in the indicator state: {sorted(unknown)}")
+        if self.last_date is not None:
+            bars = {
+                ticker: frame[frame.index > self.last_date]
+                for ticker, frame in bars.items()
+            }
+        aligned = {
+            ticker: bars.get(ticker, pd.DataFrame(columns=["Close", "High", "Low"]))
+            for ticker in self.tickers
+        }
+        index, _, close, high, low = stack_bars(aligned)
+        if len(index):
+            self.update(close, high, low)
+            self.last_date = index[-1]
+
+    def _rolling(self, window: int) -> np.ndarray | None:
+        """Get the last `window` closes, or None if fewer bars were seen."""
+        return self.closes[-window:] if len(self.closes) >= window else None
+
+    def values(self) -> dict[str, np.ndarray]:
+        """Get the latest value of every indicator for every ticker.
+
+        Returns:
+            dict[str, np.ndarray]: Arrays of shape (tickers,) by indicator name,
+                NaN where a ticker has too few bars.
+        """
+        missing = np.full(len(self.tickers), np.nan)
+        values = {"close": self.prev_close}
+
+        previous = self.closes[-2] if len(self.closes) >= 2 else missing
+        values["change_1d_pct"] = (self.prev_close / previous - 1) * 100
+
+        for window in SMA_WINDOWS:
+            closes = self._rolling(window)
+            values[f"sma_{window}"] = (
+                np.nanmean(closes, axis=0) if closes is not None else missing
+            )
+        for span in EMA_SPANS:
+            values[f"ema_{span}"] = self.ema[span]
+
+        macd = self.ema[EMA_SPANS[0]] - self.ema[EMA_SPANS[1]]
+        values["macd"] = macd
+        values["macd_signal"] = self.macd_signal
+        values["macd_hist"] = macd - self.macd_signal
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values[f"rsi_{RSI_PERIOD}"] = np.where(
+                self.avg_loss == 0,
+                100.0,
+                100 - 100 / (1 + self.avg_gain / self.avg_loss),
+            )
+
+        closes = self._rolling(BOLLINGER_WINDOW)
+        if closes is not None:
+            middle = np.nanmean(closes, axis=0)
+            width = BOLLINGER_STDS * np.nanstd(closes, axis=0)
+            values["bb_upper"] = middle + width
+            values["bb_lower"] = middle - width
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values["bb_percent_b"] = (self.prev_close - middle + width) / (
+                    2 * width
+                )
+        else:
+            values["bb_upper"] = values["bb_lower"] = values["bb_percent_b"] = missing
+
+        values[f"atr_{ATR_PERIOD}"] = self.atr
+
+        closes = self._rolling(VOLATILITY_WINDOW + 1)
+        if closes is not None:
+            returns = np.diff(np.log(closes), axis=0)
+            values[f"volatility_{VOLATILITY_WINDOW}d_pct"] = (
+                np.nanstd(returns, axis=0, ddof=1)
+                * np.sqrt(TRADING_DAYS_PER_YEAR)
+                * 100
+            )
+        else:
+            values[f"volatility_{VOLATILITY_WINDOW}d_pct"] = missing
+
+        values["drawdown_pct"] = (self.prev_close / self.peak - 1) * 100
+        values["max_drawdown_pct"] = self.max_drawdown * 100
+        return values
+
+    def summary(self, digits: int = 2) -> dict[str, dict[str, float | None]]:
+        """Get the latest indicators of each ticker as rounded numbers.
+
+        Args:
+            digits (int): The decimal places to round to.
+
+        Returns:
+            dict[str, dict[str, float | None]]: The indicators of each ticker,
+                None where a ticker has too few bars.
+        """
+        values = self.values()
+        return {
+            ticker: {
+                name: None if np.isnan(array[i]) else round(float(array[i]), digits)
+                for name, array in values.items()
+            }
+            for i, ticker in enumerate(self.tickers)
+        }
+
+
+def compute_indicators(bars: dict[str, pd.DataFrame]) -> IndicatorState:
+    """Compute the indicators of many tickers in one pass over their stacked bars.
+
+    Args:
+        bars (dict[str, pd.DataFrame]): The OHLCV bars of each ticker.
+
+    Returns:
+        IndicatorState: The indicator state, ready for `append` and `summary`.
+    """
+    state = IndicatorState(list(bars))
+    state.append(bars)
+    return state
@@ -0,0 +1,217 @@
+"""Offline load test of the stock ticker analysis graph.
+
+The graph runs against the replay stand-ins of the chat model and Tavily, and
+against market data fixtures instead of Yahoo Finance, so no API is called and
+the measurements only move with the orchestration around them. Every run has
+each member call its tool once, including a chart in the sandbox, and answer.
+Run from this directory, e.g.:
+
+    python loadtest.py --concurrency 1 4 16 --runs 32
+    python loadtest.py --save-baseline loadtest.json
+    python loadtest.py --baseline loadtest.json
+
+With a baseline, the command exits with status 1 on a regression. Without
+`--fixtures`, synthetic prices and statements are generated. With API keys,
+`--record cassette.json --fixtures fixtures/` answers the requests that are not
+recorded yet from the live services and saves them, and `--cassette
+cassette.json --fixtures fixtures/` replays them.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def write_synthetic_fixtures(root: Path, ticker: str, days: int = 800) -> None:
+    """Write a random walk of prices and flat statements in the fixture layout."""
+    rng = np.random.default_rng(sum(ticker.encode("utf-8")))
+    dates = pd.bdate_range(end=datetime.now(), periods=days * 5 // 7, name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+    history = pd.DataFrame(
+        {
+            "Open": close * (1 + rng.normal(0, 0.003, len(dates))),
+            "High": close * 1.01,
+            "Low": close * 0.99,
+            "Close": close,
+            "Volume": rng.integers(1_000_000, 5_000_000, len(dates)),
+        },
+        index=dates.normalize(),
+    )
+    directory = root / ticker
+    directory.mkdir(parents=True, exist_ok=True)
+    history.to_csv(directory / "history.csv")
+
+    items = ["TotalRevenue", "OperatingIncome", "NetIncome", "EBITDA", "DilutedEPS"]
+    values = np.array([[5e10], [1.5e10], [1e10], [2e10], [1.5]])
+    for freq, periods, step in (("yearly", 4, 365), ("quarterly", 5, 91)):
+        ends = [
+            datetime.now().date() - timedelta(days=step * (i + 1))
+            for i in range(periods)
+        ]
+        pd.DataFrame(values.repeat(periods, axis=1), index=items, columns=ends).to_csv(
+            directory / f"financials_{freq}.csv"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Runs at once."
+    )
+    parser.add_argument("--runs", type=int, default=32, help="Runs per concurrency.")
+    parser.add_argument("--ticker", default="AAPL")
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.5, help="Seconds to the first token."
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.002, help="Seconds per token."
+    )
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument(
+        "--search-latency", type=float, default=0.8, help="Seconds per search."
+    )
+    parser.add_argument("--fixtures", type=Path, help="Market data fixtures.")
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument("--cassette", type=Path, help="Responses to replay.")
+    cassette.add_argument(
+        "--record", type=Path, help="Record missing responses from the live APIs."
+    )
+    baseline = parser.add_mutually_exclusive_group()
+    baseline.add_argument("--baseline", type=Path, help="Fail on a regression.")
+    baseline.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=None)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    """Run the load test and report it, returning the exit code."""
+    # Imported here, after the cache and fixture paths are set
+    from agent_common.cache import MemoryStore
+    from agent_common.harness import (
+        DEFAULT_TOLERANCE,
+        compare,
+        format_results,
+        run_load,
+        save_baseline,
+    )
+    from agent_common.replay import (
+        Cassette,
+        FakeChatModel,
+        FakeSearch,
+        FakeTavilySearchResults,
+    )
+    from graph import create_stock_ticker_analysis_graph
+    from langchain_core.messages import HumanMessage
+    from market_data import MarketData, RecordingProvider, YFinanceProvider
+    from sandbox import get_sandbox_pool
+    from tool import StockTickerAnalysisTool
+
+    cassette = Cassette(args.record or args.cassette)
+    live_llm = live_search = None
+    market_data = None
+    if args.record:
+        from dotenv import load_dotenv
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        from langchain_openai import ChatOpenAI
+
+        load_dotenv(override=True)
+        live_llm = ChatOpenAI(model="gpt-4o-mini")
+        live_search = TavilySearchResults(max_results=5)
+        market_data = MarketData(RecordingProvider(YFinanceProvider(), args.fixtures))
+
+    ticker = args.ticker
+    llm = FakeChatModel(
+        latency=args.llm_latency,
+        token_latency=args.token_latency,
+        output_tokens=args.output_tokens,
+        arguments={
+            "search_web": {"query": f"{ticker} stock news"},
+            "analyze_stock_ticker": {"ticker": ticker},
+            "Python_REPL": {"__arg1": f"print(create_stock_chart('{ticker}'))"},
+        },
+        cassette=cassette,
+        live=live_llm,
+    )
+    search = FakeTavilySearchResults(
+        search=FakeSearch(
+            cassette=cassette, live=live_search, latency=args.search_latency
+        )
+    )
+    tool = StockTickerAnalysisTool(market_data=market_data, search_tool=search)
+    # Every run asks the same question, but should search like a new one would
+    tool.search_cache = MemoryStore(maxsize=0)
+    # Response caching would hide the latency of repeated requests
+    graph = create_stock_ticker_analysis_graph(llm=llm, tool=tool, llm_cache=None)
+    current_date = datetime.now().strftime("%Y-%m-%d")
+
+    async def run_once(index: int) -> None:
+        await graph.ainvoke(
+            {
+                "messages": [HumanMessage(content=f"Analyze {ticker}")],
+                "next": "supervisor",
+                "language": "English",
+                "current_date": current_date,
+            }
+        )
+
+    await run_once(-1)  # Warm up imports, the sandbox pool and the price store
+    results = []
+    for concurrency in args.concurrency:
+        results.append(await run_load(run_once, concurrency, args.runs))
+    print(format_results(results))
+    get_sandbox_pool().close()
+    if args.record:
+        cassette.save()
+
+    config = {
+        key: getattr(args, key)
+        for key in (
+            "runs",
+            "ticker",
+            "llm_latency",
+            "token_latency",
+            "output_tokens",
+            "search_latency",
+        )
+    }
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, config)
+    if args.baseline:
+        regressions = compare(
+            args.baseline, results, config, args.tolerance or DEFAULT_TOLERANCE
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.record and not args.fixtures:
+        sys.exit("--record needs --fixtures to save the market data to.")
+    # Keep the caches of real runs out of the measurements, and the other way round
+    scratch = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    os.environ["LLM_PRACTICE_CACHE_PATH"] = str(scratch / "cache.sqlite3")
+    os.environ["LLM_PRACTICE_PRICE_STORE_PATH"] = str(scratch / "prices")
+    if args.fixtures is None:
+        args.fixtures = scratch / "fixtures"
+        write_synthetic_fixtures(args.fixtures, args.ticker)
+    if not args.record:
+        # The market data of the tool, which also serves the sandbox, reads them
+        os.environ["MARKET_DATA_FIXTURES"] = str(args.fixtures)
+        # The stand-ins have no per-minute limits to stay within
+        os.environ.setdefault("LLM_PRACTICE_SEARCH_RPM", "")
+        os.environ.setdefault("LLM_PRACTICE_MARKET_DATA_RPM", "")
+        # Clients validate their keys on construction, but nothing here calls them
+        os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+        os.environ.setdefault("TAVILY_API_KEY", "loadtest")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,278 @@
+"""Market data layer for the stock tools, with caching and an offline provider."""
+
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Protocol
+
+import pandas as pd
+import yfinance as yf
+from agent_common.cache import MemoryStore
+from agent_common.limiter import get_limiter
+from price_store import OHLCV_COLUMNS, PriceStore
+
+# The first fetch of a ticker covers at least this many days, so later analysis
+# and chart requests are served from the price store
+DEFAULT_WINDOW_DAYS = 365
+# Prices move during the session, fundamentals only change with each filing
+PRICE_TTL = 15 * 60
+FUNDAMENTALS_TTL = 7 * 24 * 60 * 60
+# An empty statement is more likely a failed request than a ticker without one,
+# so it is only remembered long enough to not ask again within a run
+EMPTY_FUNDAMENTALS_TTL = 5 * 60
+
+
+class MarketDataProvider(Protocol):
+    """Source of daily bars and financial statements."""
+
+    def history(
+        self, tickers: list[str], start: datetime, end: datetime
+    ) -> dict[str, pd.DataFrame]:
+        """Get daily OHLCV bars in [start, end) for each ticker, in one request."""
+        ...
+
+    def financials(self, ticker: str, freq: str) -> pd.DataFrame:
+        """Get the "yearly" or "quarterly" income statement of a ticker."""
+        ...
+
+
+def _normalize_bars(frame: pd.DataFrame) -> pd.DataFrame:
+    """Keep the OHLCV columns of non-empty bars on a tz-naive date index."""
+    frame = frame.reindex(columns=OHLCV_COLUMNS).dropna(how="all")
+    if frame.index.tz is not None:
+        frame.index = frame.index.tz_localize(None)
+    frame.index.name = "Date"
+    return frame
+
+
+class YFinanceProvider:
+    """Market data from Yahoo Finance."""
+
+    def history(
+        self, tickers: list[str], start: datetime, end: datetime
+    ) -> dict[str, pd.DataFrame]:
+        """Download daily bars from Yahoo Finance."""
+        data = yf.download(
+            tickers,
+            start=start,
+            end=end,
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+        )
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: _normalize_bars(data)}
+        return {
+            ticker: _normalize_bars(data[ticker])
+            for ticker in tickers
+            if ticker in data.columns.get_level_values(0)
+        }
+
+    def financials(self, ticker: str, freq: str) -> pd.DataFrame:
+        """Download the income statement from Yahoo Finance."""
+        return yf.Ticker(ticker).get_financials(freq=freq)
+
+
+class FixtureProvider:
+    """Market data from local CSV files, for offline runs and tests.
+
+    Each ticker has a directory under `root` with `history.csv` (a `Date` column
+    and the OHLCV columns) and `financials_yearly.csv` / `financials_quarterly.csv`
+    (statement items as rows and period end dates as columns, as yfinance returns).
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def history(
+        self, tickers: list[str], start: datetime, end: datetime
+    ) -> dict[str, pd.DataFrame]:
+        """Read bars from the fixture CSV files."""
+        histories = {}
+        for ticker in tickers:
+            path = self.root / ticker / "history.csv"
+            if not path.exists():
+                continue
+            frame = pd.read_csv(path, index_col="Date", parse_dates=True)
+            frame = frame[(frame.index >= start) & (frame.index < end)]
+            histories[ticker] = _normalize_bars(frame)
+        return histories
+
+    def financials(self, ticker: str, freq: str) -> pd.DataFrame:
+        """Read the income statement from a fixture CSV file."""
+        path = self.root / ticker / f"financials_{freq}.csv"
+        if not path.exists():
+            return pd.DataFrame()
+        frame = pd.read_csv(path, index_col=0)
+        frame.columns = pd.to_datetime(frame.columns)
+        return frame
+
+
+class RecordingProvider:
+    """Saves what another provider returns in the files of `FixtureProvider`.
+
+    Recording a run against Yahoo Finance once lets later runs replay the same
+    data offline.
+    """
+
+    def __init__(self, provider: MarketDataProvider, root: str | Path) -> None:
+        self.provider = provider
+        self.root = Path(root)
+
+    def history(
+        self, tickers: list[str], start: datetime, end: datetime
+    ) -> dict[str, pd.DataFrame]:
+        """Get bars from the provider and save them as fixture CSV files."""
+        histories = self.provider.history(tickers, start, end)
+        for ticker, frame in histories.items():
+            path = self.root / ticker / "history.csv"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                saved = pd.read_csv(path, index_col="Date", parse_dates=True)
+                frame = pd.concat([saved, frame])
+                frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+            frame.to_csv(path)
+        return histories
+
+    def financials(self, ticker: str, freq: str) -> pd.DataFrame:
+        """Get the income statement from the provider and save it as a fixture CSV file."""
+        frame = self.provider.financials(ticker, freq)
+        path = self.root / ticker / f"financials_{freq}.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frame.to_csv(path)
+        return frame
+
+
+def default_provider() -> MarketDataProvider:
+    """Get the fixture provider if `MARKET_DATA_FIXTURES` is set, else yfinance."""
+    fixtures = os.environ.get("MARKET_DATA_FIXTURES")
+    return FixtureProvider(fixtures) if fixtures else YFinanceProvider()
+
+
+@dataclass
+class TickerSnapshot:
+    """Prices and financial statements of a ticker."""
+
+    prices: pd.DataFrame
+    annual_financials: pd.DataFrame
+    quarterly_financials: pd.DataFrame
+
+
+class MarketData:
+    """Cached access to market data, shared by the analysis and chart tools.
+
+    Prices are read from the on-disk price store, which only fetches the days it
+    does not cover yet and refreshes the latest bars after `price_ttl` seconds.
+    Financial statements are kept in memory for `fundamentals_ttl` seconds, and
+    empty ones for `EMPTY_FUNDAMENTALS_TTL`.
+    Provider requests go through the process-wide "market_data" limiter.
+    """
+
+    def __init__(
+        self,
+        provider: MarketDataProvider | None = None,
+        store: PriceStore | None = None,
+        price_ttl: float = PRICE_TTL,
+        fundamentals_ttl: float = FUNDAMENTALS_TTL,
+        max_workers: int = 8,
+    ) -> None:
+        self.provider = provider or default_provider()
+        self.store = store or PriceStore()
+        self.price_ttl = price_ttl
+        self.fundamentals_ttl = fundamentals_ttl
+        self._fundamentals = MemoryStore(maxsize=512)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @staticmethod
+    def _window_start(days: int) -> datetime:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=days)
+
+    def batch_prices(self, tickers: list[str], days: int) -> dict[str, pd.DataFrame]:
+        """Get the daily bars of the last `days` days of each ticker.
+
+        Tickers missing the same date range in the price store are downloaded
+        together in a single provider request, and the frames are read-only views
+        of the store.
+
+        Args:
+            tickers (list[str]): The ticker symbols.
+            days (int): The number of calendar days to cover.
+
+        Returns:
+            dict[str, pd.DataFrame]: The OHLCV bars of each ticker found.
+        """
+        start = self._window_start(days)
+        fetch_start = min(start, self._window_start(DEFAULT_WINDOW_DAYS))
+        # The provider end date is exclusive, so end tomorrow to include today
+        fetch_end = self._window_start(0) + timedelta(days=1)
+
+        missing = defaultdict(list)
+        for ticker in tickers:
+            for span in self.store.missing_ranges(
+                ticker, fetch_start, fetch_end, self.price_ttl
+            ):
+                missing[span].append(ticker)
+
+        for (span_start, span_end), group in missing.items():
+            fetched = get_limiter("market_data").call_sync(
+                lambda: self.provider.history(group, span_start, span_end)
+            )
+            for ticker in group:
+                frame = fetched.get(ticker, pd.DataFrame(columns=OHLCV_COLUMNS))
+                self.store.write(ticker, frame, span_start, span_end)
+
+        frames = {ticker: self.store.read(ticker, start) for ticker in tickers}
+        return {ticker: frame for ticker, frame in frames.items() if not frame.empty}
+
+    def prices(self, ticker: str, days: int) -> pd.DataFrame:
+        """Get the daily bars of the last `days` days of a ticker.
+
+        Args:
+            ticker (str): The ticker symbol.
+            days (int): The number of calendar days to cover.
+
+        Returns:
+            pd.DataFrame: The OHLCV bars, empty if the ticker is unknown.
+        """
+        return self.batch_prices([ticker], days).get(
+            ticker, pd.DataFrame(columns=OHLCV_COLUMNS)
+        )
+
+    def financials(self, ticker: str, freq: str = "yearly") -> pd.DataFrame:
+        """Get the "yearly" or "quarterly" income statement of a ticker.
+
+        Args:
+            ticker (str): The ticker symbol.
+            freq (str): "yearly" or "quarterly".
+
+        Returns:
+            pd.DataFrame: Statement items as rows and period end dates as columns.
+        """
+        key = f"{ticker}:{freq}"
+        frame = self._fundamentals.get(key)
+        if frame is None:
+            frame = get_limiter("market_data").call_sync(
+                lambda: self.provider.financials(ticker, freq)
+            )
+            ttl = EMPTY_FUNDAMENTALS_TTL if frame.empty else self.fundamentals_ttl
+            self._fundamentals.set(key, frame, ttl)
+        return frame
+
+    def snapshot(self, ticker: str, days: int = 5) -> TickerSnapshot:
+        """Get prices and both income statements of a ticker, fetched concurrently.
+
+        Args:
+            ticker (str): The ticker symbol.
+            days (int): The number of calendar days of prices to cover.
+
+        Returns:
+            TickerSnapshot: The prices and financial statements.
+        """
+        prices = self._executor.submit(self.prices, ticker, days)
+        annual = self._executor.submit(self.financials, ticker, "yearly")
+        quarterly = self._executor.submit(self.financials, ticker, "quarterly")
+        return TickerSnapshot(prices.result(), annual.result(), quarterly.result())
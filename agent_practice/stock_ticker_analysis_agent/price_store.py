@@ -0,0 +1,241 @@
+"""Columnar on-disk store of daily OHLCV bars, read through memory maps."""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PRICE_STORE_PATH = os.environ.get(
+    "LLM_PRACTICE_PRICE_STORE_PATH", ".cache/prices"
+)
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _to_day(moment: datetime) -> int:
+    """Get the days since the epoch of a datetime."""
+    return (moment - EPOCH).days
+
+
+def _from_day(day: int) -> datetime:
+    """Get the datetime of a number of days since the epoch."""
+    return EPOCH + timedelta(days=day)
+
+
+class PriceStore:
+    """Daily bars of each ticker as flat binary columns that only grow.
+
+    Each ticker has a directory with `dates.<generation>.i8` (int64 days since
+    the epoch, sorted), `ohlcv.<generation>.f8` (float64 rows of the OHLCV
+    columns) and `meta.json`, which holds the generation of the columns, the
+    committed row count, the covered day range [start, end) and when the latest
+    bars were fetched. New bars are written in place after the committed rows
+    before the metadata is replaced, so readers never see a partial write.
+    Committed rows are never written in place: a fetch that corrects them writes
+    the columns of a new generation, which the metadata switches to at once, so
+    frames read earlier keep their values.
+    """
+
+    def __init__(self, root: str | Path = DEFAULT_PRICE_STORE_PATH) -> None:
+        self.root = Path(root)
+        self._lock = threading.RLock()
+
+    def _dir(self, ticker: str) -> Path:
+        return self.root / ticker.upper().replace("/", "_")
+
+    def _meta(self, ticker: str) -> dict | None:
+        path = self._dir(ticker) / "meta.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def _paths(self, ticker: str, generation: int | None) -> tuple[Path, Path]:
+        """Get the column files of a generation, None for the unversioned ones."""
+        directory = self._dir(ticker)
+        suffix = "" if generation is None else f".{generation}"
+        return directory / f"dates{suffix}.i8", directory / f"ohlcv{suffix}.f8"
+
+    def _write_meta(self, ticker: str, meta: dict) -> None:
+        path = self._dir(ticker) / "meta.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, path)
+
+    def _columns(self, ticker: str, meta: dict | None) -> tuple[np.ndarray, np.ndarray]:
+        """Map the committed rows of a ticker read-only."""
+        rows = meta["rows"] if meta else 0
+        if rows == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, 5), dtype=np.float64)
+        dates_path, ohlcv_path = self._paths(ticker, meta.get("generation"))
+        dates = np.memmap(dates_path, np.int64, "r", shape=(rows,))
+        ohlcv = np.memmap(ohlcv_path, np.float64, "r", shape=(rows, 5))
+        return dates, ohlcv
+
+    def missing_ranges(
+        self, ticker: str, start: datetime, end: datetime, max_age: float
+    ) -> list[tuple[datetime, datetime]]:
+        """Get the date ranges to fetch so that the store covers [start, end).
+
+        The bars from the day of the last fetch onwards may have been incomplete
+        then, so they are fetched again once they are older than `max_age`.
+
+        Args:
+            ticker (str): The ticker symbol.
+            start (datetime): The first day to cover.
+            end (datetime): The day after the last day to cover.
+            max_age (float): Seconds the latest bars stay fresh.
+
+        Returns:
+            list[tuple[datetime, datetime]]: The [start, end) ranges to fetch.
+        """
+        with self._lock:
+            meta = self._meta(ticker)
+        if meta is None:
+            return [(start, end)]
+
+        ranges = []
+        if _to_day(start) < meta["start"]:
+            ranges.append((start, _from_day(meta["start"])))
+        if meta["end"] < _to_day(end) or time.time() - meta["fetched_at"] > max_age:
+            fetched_day = _to_day(datetime.fromtimestamp(meta["fetched_at"]))
+            ranges.append((_from_day(min(meta["end"], fetched_day)), end))
+        return ranges
+
+    def write(
+        self, ticker: str, frame: pd.DataFrame, start: datetime, end: datetime
+    ) -> None:
+        """Store the bars fetched for [start, end), replacing stored bars in it.
+
+        The range must touch or overlap the stored range so that the store stays
+        contiguous. Bars after the stored ones are appended in place. Ranges
+        before the stored bars, or that change stored bars, rewrite the columns.
+
+        Args:
+            ticker (str): The ticker symbol.
+            frame (pd.DataFrame): The OHLCV bars fetched for the range.
+            start (datetime): The first day fetched.
+            end (datetime): The day after the last day fetched.
+        """
+        dates = frame.index.values.astype("datetime64[D]").astype(np.int64)
+        ohlcv = frame.reindex(columns=OHLCV_COLUMNS).to_numpy(np.float64)
+        start_day, end_day = _to_day(start), _to_day(end)
+
+        # An empty fetch is more likely a failed request than a range without
+        # bars, so it neither replaces stored bars nor counts as fetched
+        if not len(dates):
+            return
+
+        with self._lock:
+            meta = self._meta(ticker)
+            generation = meta.get("generation") if meta else None
+            if meta is None:
+                meta = {"start": start_day, "end": end_day}
+                rows = self._rewrite(ticker, meta, dates, ohlcv)
+            elif meta["start"] <= start_day <= meta["end"]:
+                old_dates, old_ohlcv = self._columns(ticker, meta)
+                keep = int(np.searchsorted(old_dates, start_day))
+                # A refresh fetches the latest stored bars again, which usually
+                # come back unchanged
+                overlap = meta["rows"] - keep
+                if np.array_equal(dates[:overlap], old_dates[keep:]) and (
+                    np.array_equal(ohlcv[:overlap], old_ohlcv[keep:], equal_nan=True)
+                ):
+                    rows = self._append(ticker, meta, dates[overlap:], ohlcv[overlap:])
+                else:
+                    rows = self._rewrite(
+                        ticker,
+                        meta,
+                        np.concatenate([old_dates[:keep], dates]),
+                        np.concatenate([old_ohlcv[:keep], ohlcv]),
+                    )
+                meta["end"] = max(meta["end"], end_day)
+            elif start_day < meta["start"] <= end_day:
+                old_dates, old_ohlcv = self._columns(ticker, meta)
+                keep = int(np.searchsorted(old_dates, end_day))
+                rows = self._rewrite(
+                    ticker,
+                    meta,
+                    np.concatenate([dates, old_dates[keep:]]),
+                    np.concatenate([ohlcv, old_ohlcv[keep:]]),
+                )
+                meta["start"] = start_day
+                meta["end"] = max(meta["end"], end_day)
+            else:
+                raise ValueError(
+                    f"Range {start:%Y-%m-%d}..{end:%Y-%m-%d} is not contiguous with "
+                    f"the stored bars of {ticker}"
+                )
+            meta["rows"] = rows
+            meta["fetched_at"] = time.time()
+            self._write_meta(ticker, meta)
+            if meta.get("generation") != generation:
+                # Memory maps still using the old files keep them alive
+                for path in self._paths(ticker, generation):
+                    path.unlink(missing_ok=True)
+
+    def _rewrite(
+        self, ticker: str, meta: dict, dates: np.ndarray, ohlcv: np.ndarray
+    ) -> int:
+        """Write the columns of a ticker as a new generation and get the row count.
+
+        The new generation is set in `meta`, and is only read once the metadata
+        is written.
+        """
+        self._dir(ticker).mkdir(parents=True, exist_ok=True)
+        meta["generation"] = meta.get("generation", -1) + 1
+        for path, column in zip(
+            self._paths(ticker, meta["generation"]), (dates, ohlcv)
+        ):
+            np.ascontiguousarray(column).tofile(path)
+        return len(dates)
+
+    def _append(
+        self, ticker: str, meta: dict, dates: np.ndarray, ohlcv: np.ndarray
+    ) -> int:
+        """Write bars after the committed rows of a ticker and get the row count."""
+        keep = meta["rows"]
+        for path, column, row_bytes in zip(
+            self._paths(ticker, meta.get("generation")),
+            (dates, ohlcv),
+            (8, 8 * len(OHLCV_COLUMNS)),
+        ):
+            with open(path, "r+b") as file:
+                file.seek(keep * row_bytes)
+                file.write(np.ascontiguousarray(column).tobytes())
+        return keep + len(dates)
+
+    def read(
+        self, ticker: str, start: datetime, end: datetime | None = None
+    ) -> pd.DataFrame:
+        """Get the stored bars of a ticker in [start, end) without copying them.
+
+        The frame is a read-only view of the memory-mapped columns.
+
+        Args:
+            ticker (str): The ticker symbol.
+            start (datetime): The first day to get.
+            end (datetime | None): The day after the last day to get. None gets
+                every bar from `start`.
+
+        Returns:
+            pd.DataFrame: The OHLCV bars, empty if the ticker is not stored.
+        """
+        with self._lock:
+            meta = self._meta(ticker)
+            dates, ohlcv = self._columns(ticker, meta)
+        first = int(np.searchsorted(dates, _to_day(start)))
+        last = len(dates) if end is None else int(np.searchsorted(dates, _to_day(end)))
+        index = pd.DatetimeIndex(
+            dates[first:last].view("datetime64[D]").astype("datetime64[ns]"),
+            name="Date",
+        )
+        return pd.DataFrame(
+            ohlcv[first:last], index=index, columns=OHLCV_COLUMNS, copy=False
+        )
@@ -1,8 +1,15 @@
+"""Prompt for the stock ticker analysis agent."""
+
+
 class StockTickerAnalysisPrompt:
+    """Prompt for the stock ticker analysis agent."""
+
     def __init__(self):
-        self.system_prompt = """Today is {current_date}.
+        self.planner_prompt = """Today is {current_date}.
 You are a supervisor of a stock analysis team. Your team members are: {members}.
-...
+Given the user's request, list the members needed to answer it, in the order they should work.
+By default every member works, in the order listed above.
+Only leave a member out when the request clearly does not need their work.
 """
 
         self.researcher_prompt = """Today is {current_date}.
@@ -23,7 +30,11 @@ The function takes two parameters:
 - days: Number of days to show (default is 30)
 
 Example usage:
-create_stock_chart('AAPL', 30)
+print(create_stock_chart('AAPL', 30))
+
+The function returns a chart reference like artifact://<id>. The chart is shown
+to the user from that reference, so include it in your answer as is and do not
+try to describe the raw chart data.
 
 Please respond in {language}.
 """
@@ -0,0 +1,375 @@
+"""Pool of pre-forked worker processes that run LLM-written Python code."""
+
+import contextlib
+import functools
+import io
+import math
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import queue
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from multiprocessing.connection import Connection
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import yfinance as yf
+from artifacts import ARTIFACT_SCHEME, ChartArtifact
+from market_data import MarketData
+
+# Modules the fork server imports once, so every worker starts with them warm.
+# The tool module imports this one, and with it the market data and chart code
+PRELOAD = ["numpy", "pandas", "plotly.graph_objects", "yfinance", "tool"]
+
+DEFAULT_POOL_SIZE = int(os.environ.get("SANDBOX_POOL_SIZE", "2"))
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_CPU_SECONDS = 20
+DEFAULT_MEMORY_BYTES = 2 * 1024**3
+# Workers are replaced after this many runs, bounding what leaks between runs
+MAX_TASKS_PER_WORKER = 100
+# The only environment variables the fork server and the workers see. The API
+# keys of the app are not among them
+ENV_ALLOWLIST = (
+    "PATH",
+    "HOME",
+    "LANG",
+    "TZ",
+    "TMPDIR",
+    "PYTHONPATH",
+    "VIRTUAL_ENV",
+    "HTTP_PROXY",
+    "HTTPS_PROXY",
+    "NO_PROXY",
+    "http_proxy",
+    "https_proxy",
+    "no_proxy",
+    "SSL_CERT_FILE",
+    "SSL_CERT_DIR",
+    "REQUESTS_CA_BUNDLE",
+)
+# Files that hold the environment of a process, or the secrets of the app
+SECRET_PATH_PATTERN = re.compile(r"^/proc/[^/]+/(?:task/\d+/)?environ$|/\.env[^/]*$")
+# Audit events that start other programs, which the path checks would not see
+BLOCKED_EVENTS = frozenset(
+    {
+        "os.exec",
+        "os.fork",
+        "os.forkpty",
+        "os.posix_spawn",
+        "os.spawn",
+        "os.system",
+        "subprocess.Popen",
+        "pty.spawn",
+    }
+)
+
+
+@dataclass
+class SandboxResult:
+    """Output of one run of sandboxed code.
+
+    Attributes:
+        output (str): The printed output, or the repr of the raised exception.
+        artifacts (list[ChartArtifact]): The charts the code created.
+        recycle (bool): Whether the worker should be replaced after this run.
+    """
+
+    output: str
+    artifacts: list[ChartArtifact] = field(default_factory=list)
+    recycle: bool = False
+
+
+def _set_cpu_limit(seconds: int) -> None:
+    """Limit the CPU time of the current process to `seconds` more than it used."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def sandbox_environ() -> dict[str, str]:
+    """Get the variables of the current environment that workers may see."""
+    return {
+        name: value
+        for name, value in os.environ.items()
+        if name in ENV_ALLOWLIST or name.startswith("LC_")
+    }
+
+
+def _start_forkserver() -> None:
+    """Start the fork server with only the variables of `ENV_ALLOWLIST`.
+
+    The fork server is a new program, so its `/proc/<pid>/environ` shows the
+    environment it was started with, which must not hold the app's secrets. It
+    is started once per process, with the environment swapped out around it.
+    """
+    environ, allowed = dict(os.environ), sandbox_environ()
+    os.environ.clear()
+    os.environ.update(allowed)
+    try:
+        multiprocessing.forkserver.ensure_running()
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def _audit(event: str, args: tuple) -> None:
+    """Refuse to open secret files or start other programs.
+
+    Installed in every worker before it runs code. Audit hooks cannot be
+    removed, so the code cannot turn this off.
+    """
+    if event in BLOCKED_EVENTS:
+        raise PermissionError(f"{event} is not allowed in the sandbox")
+    if event == "open" and isinstance(args[0], (str, bytes, os.PathLike)):
+        path = os.path.realpath(os.fsdecode(args[0]))
+        if SECRET_PATH_PATTERN.search(path):
+            raise PermissionError(f"Reading {path} is not allowed in the sandbox")
+
+
+class _ParentMarketData:
+    """Prices read by the parent process and sent over the worker's pipe.
+
+    Only the parent reads and writes the price store, so a worker can never
+    write its files at the same time as another process.
+    """
+
+    def __init__(self, conn: Connection) -> None:
+        self.conn = conn
+
+    def prices(self, ticker: str, days: int) -> pd.DataFrame:
+        self.conn.send(("prices", (ticker, days)))
+        reply = self.conn.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def _worker_main(
+    conn: Connection,
+    memory_bytes: int | None,
+    environ: dict[str, str],
+    workdir: str,
+) -> None:
+    """Run code sent over `conn` until the pipe closes.
+
+    Every run gets a fresh namespace and the working directory is reset to
+    `workdir` after it, so nothing one run defines is visible to the next.
+    Going over the CPU limit kills the worker with SIGXCPU.
+    """
+    # The tool module imports this one, so it cannot be imported at the top.
+    # It is preloaded by the fork server, which makes this import free
+    from tool import create_stock_chart
+
+    os.environ.clear()
+    os.environ.update(environ)
+    if memory_bytes is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    market_data = _ParentMarketData(conn)
+    os.chdir(workdir)
+    sys.addaudithook(_audit)
+
+    while True:
+        try:
+            code, cpu_seconds = conn.recv()
+        except EOFError:
+            return
+
+        artifacts = []
+
+        def put(artifact: ChartArtifact) -> str:
+            artifacts.append(artifact)
+            return f"{ARTIFACT_SCHEME}{artifact.id}"
+
+        namespace = {
+            "__name__": "__main__",
+            "yf": yf,
+            "go": go,
+            "pd": pd,
+            "np": np,
+            "datetime": datetime,
+            "timedelta": timedelta,
+            "create_stock_chart": functools.partial(
+                create_stock_chart, market_data, put
+            ),
+        }
+        stdout = io.StringIO()
+        recycle = False
+        _set_cpu_limit(cpu_seconds)
+        try:
+            with contextlib.redirect_stdout(stdout):
+                exec(code, namespace)
+            output = stdout.getvalue()
+        except MemoryError as e:
+            output, recycle = repr(e), True
+        except BaseException as e:
+            output = repr(e)
+        finally:
+            os.chdir(workdir)
+        conn.send(("result", SandboxResult(output, artifacts, recycle)))
+
+
+class _Worker:
+    """A worker process and the parent end of its pipe."""
+
+    def __init__(
+        self,
+        context: multiprocessing.context.BaseContext,
+        memory_bytes: int | None,
+        workdir: str,
+    ) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_bytes, sandbox_environ(), workdir),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Pre-forked worker processes that run code with CPU, memory and time limits.
+
+    Workers fork from a fork server that has already imported numpy, pandas,
+    plotly, yfinance and the chart tools, so a run pays no import cost, and a
+    runaway script only ties up its own worker until it is killed and replaced.
+    The fork server and the workers see only the variables of `ENV_ALLOWLIST`,
+    the workers run in an empty temporary directory, and an audit hook stops
+    them from reading `/proc/*/environ` or `.env` files and from starting other
+    programs. They get their prices from the market data of the calling
+    process. This keeps the app's secrets out of reach of plain Python code; it
+    is not a boundary against native code, which only OS-level isolation is.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        cpu_seconds: int = DEFAULT_CPU_SECONDS,
+        memory_bytes: int | None = DEFAULT_MEMORY_BYTES,
+        max_tasks_per_worker: int = MAX_TASKS_PER_WORKER,
+    ) -> None:
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(PRELOAD)
+        _start_forkserver()
+        self._workdir = tempfile.TemporaryDirectory(prefix="sandbox-")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._market_data: MarketData | None = None
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.memory_bytes, self._workdir.name)
+
+    def run(self, code: str, market_data: MarketData | None = None) -> SandboxResult:
+        """Run code in an idle worker, waiting for one if every worker is busy.
+
+        Args:
+            code (str): The Python code to run.
+            market_data (MarketData | None): The market data that serves the
+                prices of the worker's charts. None uses one of the pool.
+
+        Returns:
+            SandboxResult: The printed output and the charts the code created.
+        """
+        worker = self._idle.get()
+        try:
+            try:
+                worker.conn.send((code, self.cpu_seconds))
+            except OSError:
+                # The worker died while idle, so the code goes to a fresh one
+                worker.kill()
+                worker = self._spawn()
+                worker.conn.send((code, self.cpu_seconds))
+            deadline = time.monotonic() + self.timeout
+            while True:
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                    worker.kill()
+                    worker = self._spawn()
+                    return SandboxResult(
+                        f"TimeoutError('Execution took longer than {self.timeout}s')"
+                    )
+                try:
+                    kind, payload = worker.conn.recv()
+                except EOFError:
+                    # The worker died, e.g. from SIGXCPU at the CPU limit
+                    worker.process.join(timeout=1)
+                    exitcode = worker.process.exitcode
+                    worker.kill()
+                    worker = self._spawn()
+                    return SandboxResult(
+                        f"RuntimeError('Execution was stopped by the sandbox limits, "
+                        f"exit code {exitcode}')"
+                    )
+                if kind == "result":
+                    result = payload
+                    break
+                worker.conn.send(self._serve_prices(market_data, *payload))
+            worker.tasks += 1
+            if result.recycle or worker.tasks >= self.max_tasks_per_worker:
+                worker.kill()
+                worker = self._spawn()
+            return result
+        finally:
+            self._idle.put(worker)
+
+    def _serve_prices(
+        self, market_data: MarketData | None, ticker: str, days: int
+    ) -> pd.DataFrame | Exception:
+        """Read the prices a worker asked for, or the error to raise in it."""
+        if market_data is None:
+            if self._market_data is None:
+                self._market_data = MarketData()
+            market_data = self._market_data
+        try:
+            return market_data.prices(ticker, days)
+        except Exception as e:
+            return e
+
+    def close(self) -> None:
+        """Stop every idle worker and remove their working directory."""
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+        self._workdir.cleanup()
+
+
+_sandbox_pool: SandboxPool | None = None
+_sandbox_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Get the process-wide sandbox pool, starting its workers on first use.
+
+    Returns:
+        SandboxPool: The shared sandbox pool.
+    """
+    global _sandbox_pool
+    if _sandbox_pool is None:
+        with _sandbox_pool_lock:
+            if _sandbox_pool is None:
+                _sandbox_pool = SandboxPool()
+    return _sandbox_pool
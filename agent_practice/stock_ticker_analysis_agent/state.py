@@ -1,20 +1,137 @@
+"""State for the stock ticker analysis agent."""
+
 import operator
-from typing import Annotated, Sequence, TypedDict, Literal
+from typing import (
+    Annotated,
+    Iterable,
+    Iterator,
+    Literal,
+    NotRequired,
+    Sequence,
+    TypedDict,
+    overload,
+)
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, convert_to_messages
+from langgraph.prebuilt.chat_agent_executor import AgentState
 from pydantic import BaseModel
 
-
 MEMBERS = ["Researcher", "Stock_Analyzer", "Chart_Generator"]
 
 
+class MessageLog(Sequence[BaseMessage]):
+    """Append-only message history whose appends do not copy earlier messages.
+
+    A log returned by `append` shares one backing list with the log it was
+    appended to, and every log only sees its own prefix of that list, so older
+    logs, e.g. the ones in earlier checkpoints, never change. Appending to a log
+    that is not the latest copies its messages first.
+    """
+
+    __slots__ = ("_items", "_length")
+
+    def __init__(self, messages: Iterable[BaseMessage] = ()) -> None:
+        self._items = list(messages)
+        self._length = len(self._items)
+
+    def append(self, messages: Iterable[BaseMessage]) -> "MessageLog":
+        """Get a log with `messages` after the messages of this one.
+
+        Args:
+            messages (Iterable[BaseMessage]): The messages to append.
+
+        Returns:
+            MessageLog: The new log. This log is unchanged.
+        """
+        items = self._items
+        if self._length != len(items):
+            items = items[: self._length]
+        items.extend(messages)
+        log = MessageLog.__new__(MessageLog)
+        log._items, log._length = items, len(items)
+        return log
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> BaseMessage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[BaseMessage]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._items[: self._length][index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("message index out of range")
+        return self._items[index]
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        for i in range(self._length):
+            yield self._items[i]
+
+    def __repr__(self) -> str:
+        return f"MessageLog({list(self)!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (MessageLog, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def _asdict(self) -> dict:
+        # Checkpoint serializers rebuild the log with MessageLog(**_asdict())
+        return {"messages": list(self)}
+
+
+def append_messages(
+    log: Sequence[BaseMessage] | None, messages: Sequence[BaseMessage]
+) -> MessageLog:
+    """State reducer that appends messages in time proportional to their number.
+
+    Args:
+        log (Sequence[BaseMessage] | None): The current messages.
+        messages (Sequence[BaseMessage]): The messages of a state update, or
+            anything `convert_to_messages` accepts.
+
+    Returns:
+        MessageLog: The messages with the update appended.
+    """
+    if not isinstance(log, MessageLog):
+        log = MessageLog(convert_to_messages(log or ()))
+    if not isinstance(messages, (list, tuple)):
+        messages = [messages]
+    if not all(isinstance(message, BaseMessage) for message in messages):
+        messages = convert_to_messages(messages)
+    return log.append(messages)
+
+
 class State(TypedDict):
     """The state of the agent."""
 
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    messages: Annotated[MessageLog, append_messages]
     next: str
     language: Literal["한글", "English"]
+    # Date the prompts are written for, in YYYY-MM-DD. Defaults to today
+    current_date: NotRequired[str]
+    # Members to run, in order. Filled in by the supervisor when not given
+    plan: NotRequired[list[str]]
+    # Every routing decision of the supervisor, in order
+    route_history: Annotated[list[str], operator.add]
+    # References of the chart artifacts created by members, in order
+    artifacts: Annotated[list[str], operator.add]
+
+
+class MemberState(AgentState):
+    """The state of a member ReAct agent."""
+
+    language: str
+    current_date: str
+
 
+class PlanResponse(BaseModel):
+    """The supervisor's plan of the members to run, in order."""
 
-class RouteResponse(BaseModel):
-    next: Literal["FINISH", *MEMBERS]  # type: ignore
+    members: list[Literal[*MEMBERS]]  # type: ignore
@@ -1,106 +1,175 @@
+"""Tools for the stock ticker analysis agent."""
+
+import functools
+from typing import Callable
+
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from langchain_experimental.tools import PythonREPLTool
+from agent_common.cache import MemoryStore, get_search_cache, search_key, search_ttl
+from agent_common.limiter import get_limiter
+from agent_common.tracing import event
+from analysis import FinancialTable, StockAnalysis
+from artifacts import ChartArtifact, get_artifact_store
+from indicators import IndicatorState
 from langchain_community.tools.tavily_search import TavilySearchResults
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from langchain_core.tools import Tool
+from langchain_experimental.tools.python.tool import sanitize_input
+from market_data import DEFAULT_WINDOW_DAYS, MarketData
+from sandbox import get_sandbox_pool
+
+
+def create_stock_chart(
+    market_data: MarketData,
+    put: Callable[[ChartArtifact], str],
+    ticker: str,
+    days: int = 30,
+) -> str:
+    """Create a stock chart and get its artifact reference.
+
+    The chart data stays in the artifact store, so only the short reference
+    goes through the LLM context and the graph state.
+
+    Args:
+        market_data (MarketData): The source of the prices.
+        put (Callable[[ChartArtifact], str]): Stores the chart and returns its
+            reference.
+        ticker (str): The ticker symbol.
+        days (int): The number of days to show.
+
+    Returns:
+        str: The `artifact://<id>` reference of the chart.
+    """
+    # Get stock data, sharing the cached frame of the analysis tool
+    stock = market_data.prices(ticker, days)
+    if stock.empty:
+        return f"No price data found for {ticker}."
+
+    return put(ChartArtifact.from_frame(f"{ticker} Stock Price", stock))
 
 
 class StockTickerAnalysisTool:
     """Tool for analyzing stock tickers."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        market_data: MarketData | None = None,
+        search_tool: TavilySearchResults | None = None,
+    ) -> None:
         """Initialize the tool with necessary components."""
-        self.tavily_tool = TavilySearchResults(max_results=5)
+        self.tavily_tool = search_tool or TavilySearchResults(max_results=5)
+        self.market_data = market_data or MarketData()
+        self.search_cache = get_search_cache()
+        # Indicator state of each ticker through its second-to-last bar
+        self.indicator_states = MemoryStore(maxsize=512)
+
+    def search_web(self, query: str) -> list:
+        """Search the web for recent information and news about a stock or company."""
+        key = search_key(
+            query,
+            topic="general",
+            days=None,
+            max_results=self.tavily_tool.max_results,
+            include_raw_content=self.tavily_tool.include_raw_content,
+        )
+        results = self.search_cache.get(key)
+        event("search_cache", hit=results is not None)
+        if results is None:
+            results = get_limiter("search").call_sync(
+                lambda: self.tavily_tool.invoke({"query": query})
+            )
+            # Tavily errors come back as strings, which must not be cached
+            if isinstance(results, list):
+                self.search_cache.set(key, results, ttl=search_ttl(None))
+        return results
 
     def analyze_stock_ticker(self, ticker: str) -> str:
-        """Analyze a stock ticker and return a summary of the stock's performance and financial data."""
-
-        def format_number(number):
-            if number is None or pd.isna(number):
-                return "N/A"
-            return f"{number:,.0f}"
-
-        def format_financial_summary(financials):
-            summary = {}
-            for date, data in financials.items():
-                date_str = date.strftime("%Y-%m-%d")
-                summary[date_str] = {
-                    "총수익": format_number(data.get("TotalRevenue")),
-                    "영업이익": format_number(data.get("OperatingIncome")),
-                    "순이익": format_number(data.get("NetIncome")),
-                    "EBITDA": format_number(data.get("EBITDA")),
-                    "EPS(희석)": (
-                        f"${data.get('DilutedEPS'):.2f}"
-                        if pd.notna(data.get("DilutedEPS"))
-                        else "N/A"
-                    ),
-                }
-            return summary
-
-        ticker = yf.Ticker(ticker)
-        historical_prices = ticker.history(period="5d", interval="1d")
-
-        last_5_days_close = historical_prices["Close"].tail(5)
-        last_5_days_close_dict = {
-            date.strftime("%Y-%m-%d"): price
-            for date, price in last_5_days_close.items()
-        }
-
-        # Retrieve annual and quarterly financial statement data
-        annual_financials = ticker.get_financials()
-        quarterly_financials = ticker.get_financials(freq="quarterly")
-
-        return str(
-            {
-                "최근 5일간 종가": last_5_days_close_dict,
-                "연간 재무제표 요약": format_financial_summary(annual_financials),
-                "분기별 재무제표 요약": format_financial_summary(quarterly_financials),
-            }
+        """Analyze a stock ticker's performance and financial data for the LLM."""
+        return self.analyze(ticker).to_prompt()
+
+    def analyze(self, ticker: str) -> StockAnalysis:
+        """Analyze a stock ticker.
+
+        Args:
+            ticker (str): The ticker symbol.
+
+        Returns:
+            StockAnalysis: The last 5 closes, the technical indicators and the key
+                annual and quarterly income statement items.
+        """
+        # Prices and annual and quarterly financial statements, fetched concurrently.
+        # A year of prices warms up every indicator, including the 200-day SMA.
+        snapshot = self.market_data.snapshot(ticker, days=DEFAULT_WINDOW_DAYS)
+        last_5_days_close = snapshot.prices["Close"].tail(5)
+
+        return StockAnalysis(
+            ticker=ticker,
+            dates=last_5_days_close.index.values.astype("datetime64[D]"),
+            closes=last_5_days_close.to_numpy(np.float64),
+            indicators=self.indicator_summary(ticker, snapshot.prices),
+            annual=FinancialTable.from_statement(snapshot.annual_financials),
+            quarterly=FinancialTable.from_statement(snapshot.quarterly_financials),
         )
 
-    def create_stock_chart(self, ticker: str, days: int = 30) -> str:
-        """Create a stock chart using yfinance and plotly."""
-        # Get stock data
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        stock = yf.download(ticker, start=start_date, end=end_date)
-
-        # Create candlestick chart
-        fig = go.Figure(
-            data=[
-                go.Candlestick(
-                    x=stock.index,
-                    open=stock["Open"],
-                    high=stock["High"],
-                    low=stock["Low"],
-                    close=stock["Close"],
-                )
-            ]
-        )
+    def indicator_summary(self, ticker: str, prices: pd.DataFrame) -> dict:
+        """Get the latest technical indicators of a ticker.
+
+        Every bar but the last is final, so the indicator state through the
+        second-to-last bar is kept between calls and only fed the bars added
+        since. The last bar can still change during the session and is applied
+        to a copy.
 
-        # Update layout
-        fig.update_layout(
-            title=f"{ticker} Stock Price",
-            yaxis_title="Stock Price (USD)",
-            xaxis_title="Date",
+        Args:
+            ticker (str): The ticker symbol.
+            prices (pd.DataFrame): The OHLCV bars of the ticker.
+
+        Returns:
+            dict: The rounded indicator values, None where there are too few bars.
+        """
+        if prices.empty:
+            return {}
+        cached = self.indicator_states.get(ticker)
+        settled = cached.copy() if cached is not None else IndicatorState([ticker])
+        settled.append({ticker: prices.iloc[:-1]})
+        self.indicator_states.set(ticker, settled)
+
+        latest = settled.copy()
+        latest.append({ticker: prices})
+        return latest.summary()[ticker]
+
+    def create_stock_chart(self, ticker: str, days: int = 30) -> str:
+        """Create a stock chart and get its artifact reference."""
+        return create_stock_chart(
+            self.market_data, get_artifact_store().put, ticker, days
         )
 
-        # Convert to JSON for storage
-        chart_data = fig.to_json()
-
-        return f"![Chart]\n```json\n{chart_data}\n```"
-
-    @property
-    def python_repl_tool(self):
-        """Get Python REPL tool with stock charting capabilities."""
-        return PythonREPLTool(
-            globals={
-                "yf": yf,
-                "go": go,
-                "create_stock_chart": self.create_stock_chart,
-                "pd": pd,
-                "datetime": datetime,
-                "timedelta": timedelta,
-            }
+    def run_python(self, code: str) -> str:
+        """Run Python code in the sandbox pool and keep the charts it created.
+
+        Args:
+            code (str): The Python code, optionally in a markdown code fence.
+
+        Returns:
+            str: The printed output, or the repr of the raised exception.
+        """
+        result = get_sandbox_pool().run(sanitize_input(code), self.market_data)
+        store = get_artifact_store()
+        for artifact in result.artifacts:
+            store.put(artifact)
+        return result.output
+
+    @functools.cached_property
+    def python_repl_tool(self) -> Tool:
+        """Get the Python REPL tool, which runs code in sandboxed worker processes.
+
+        The workers have `yf`, `go`, `pd`, `np`, `datetime`, `timedelta` and
+        `create_stock_chart` in scope and start every run from a fresh namespace.
+        """
+        return Tool(
+            name="Python_REPL",
+            description=(
+                "A Python shell. Use this to execute python commands. Input should "
+                "be a valid python command. If you want to see the output of a "
+                "value, you should print it out with `print(...)`."
+            ),
+            func=self.run_python,
         )
@@ -0,0 +1,76 @@
+"""Tests of the two-tier cache."""
+
+import time
+
+import pytest
+from agent_common.cache import MemoryStore, SQLiteStore, TieredCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(maxsize=2)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1
+
+    store.set("c", 3)
+
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert len(store) == 2
+
+
+def test_memory_store_expires_entries(clock):
+    store = MemoryStore()
+    store.set("a", 1, ttl=60)
+    store.set("b", 2)
+
+    clock[0] += 61
+
+    assert store.get("a") is None
+    assert store.get("b") == 2
+    assert len(store) == 1
+
+
+def test_disk_hit_is_promoted_for_the_rest_of_its_ttl(clock):
+    cache = TieredCache(MemoryStore(), SQLiteStore(":memory:"))
+    cache.set("key", {"results": [1]}, ttl=60)
+    cache.memory.clear()
+
+    clock[0] += 30
+    assert cache.get("key") == {"results": [1]}
+    assert cache.get("key") == {"results": [1]}
+    assert (cache.stats.disk_hits, cache.stats.memory_hits) == (1, 1)
+
+    clock[0] += 31
+    assert cache.get("key") is None
+    assert cache.stats.misses == 1
+
+
+def test_memory_tier_is_bounded_with_disk_fallback():
+    cache = TieredCache(MemoryStore(maxsize=1), SQLiteStore(":memory:"))
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.get("a") == 1
+    assert cache.stats.disk_hits == 1
+    assert cache.memory.get("b") is None
+
+
+def test_expired_disk_entries_are_purged(clock):
+    disk = SQLiteStore(":memory:")
+    disk.set("a", "1", ttl=60)
+    disk.set("b", "2")
+
+    clock[0] += 61
+
+    assert disk.get("a") is None
+    assert disk.purge_expired() == 1
+    assert disk.get("b") == "2"
@@ -0,0 +1,128 @@
+"""Tests of the resumable checkpoint threads."""
+
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from agent_common.checkpoints import CheckpointStore
+from langgraph.graph import END, START, StateGraph
+
+
+class State(TypedDict):
+    """State of a two-step run."""
+
+    steps: Annotated[list[str], operator.add]
+
+
+class Steps:
+    """The nodes of the run, counting their calls; the second fails while `fail`."""
+
+    def __init__(self, fail: bool) -> None:
+        self.fail = fail
+        self.calls = {"first": 0, "second": 0}
+
+    def first(self, state: State) -> dict:
+        """Run the first step."""
+        self.calls["first"] += 1
+        return {"steps": ["first"]}
+
+    def second(self, state: State) -> dict:
+        """Run the second step, failing while `fail` is set."""
+        self.calls["second"] += 1
+        if self.fail:
+            raise RuntimeError("search failed")
+        return {"steps": ["second"]}
+
+
+def build_graph(store: CheckpointStore, steps: Steps):
+    builder = StateGraph(State)
+    builder.add_node("first", steps.first)
+    builder.add_node("second", steps.second)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return store.attach(builder.compile())
+
+
+async def run(store: CheckpointStore, graph, run_key: str) -> tuple[str, bool]:
+    config, resume = await store.thread(graph, run_key)
+    try:
+        await graph.ainvoke(None if resume else {"steps": []}, config)
+    except RuntimeError:
+        pass
+    else:
+        await store.finish(config)
+    return config["configurable"]["thread_id"], resume
+
+
+def test_failed_run_resumes_until_the_cap():
+    steps = Steps(fail=True)
+
+    async def main() -> list[tuple[str, bool]]:
+        async with CheckpointStore.open(":memory:", max_resumes=2) as store:
+            graph = build_graph(store, steps)
+            return [await run(store, graph, "input") for _ in range(4)]
+
+    runs = asyncio.run(main())
+
+    first_thread = runs[0][0]
+    assert runs[:3] == [
+        (first_thread, False),
+        (first_thread, True),
+        (first_thread, True),
+    ]
+    # The resumes failed every time, so the fourth run starts over
+    assert runs[3][0] != first_thread and not runs[3][1]
+    assert steps.calls == {"first": 2, "second": 4}
+
+
+def test_resumed_run_skips_completed_steps():
+    steps = Steps(fail=True)
+
+    async def main() -> tuple[list[tuple[str, bool]], dict]:
+        async with CheckpointStore.open(":memory:") as store:
+            graph = build_graph(store, steps)
+            failed = await run(store, graph, "input")
+            steps.fail = False
+            resumed = await run(store, graph, "input")
+            state = await graph.aget_state({"configurable": {"thread_id": resumed[0]}})
+            return [failed, resumed], state.values
+
+    (failed, resumed), values = asyncio.run(main())
+
+    assert resumed == (failed[0], True)
+    assert values == {"steps": ["first", "second"]}
+    assert steps.calls == {"first": 1, "second": 2}
+
+
+def test_finished_run_starts_over():
+    steps = Steps(fail=False)
+
+    async def main() -> list[tuple[str, bool]]:
+        async with CheckpointStore.open(":memory:") as store:
+            graph = build_graph(store, steps)
+            return [await run(store, graph, "input") for _ in range(2)]
+
+    runs = asyncio.run(main())
+
+    assert runs[0][0] != runs[1][0]
+    assert not runs[1][1]
+
+
+@pytest.mark.parametrize("run_key", ["input", "other input"])
+def test_stale_or_other_input_starts_over(run_key):
+    steps = Steps(fail=True)
+
+    async def main() -> list[tuple[str, bool]]:
+        async with CheckpointStore.open(":memory:", unfinished_ttl=0.1) as store:
+            graph = build_graph(store, steps)
+            failed = await run(store, graph, "input")
+            if run_key == "input":
+                await asyncio.sleep(0.2)
+            return [failed, await run(store, graph, run_key)]
+
+    failed, retried = asyncio.run(main())
+
+    assert retried[0] != failed[0]
+    assert not retried[1]
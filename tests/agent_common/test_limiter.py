@@ -0,0 +1,148 @@
+"""Tests of the adaptive request limiter."""
+
+import asyncio
+import time
+
+import pytest
+from agent_common import limiter as limiter_module
+from agent_common.limiter import (
+    RATE_LIMIT_DECREASE,
+    SLOW_DECREASE,
+    AdaptiveLimiter,
+    Limits,
+)
+
+
+class ProviderError(Exception):
+    """Error of a provider response with an HTTP status."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FlakyRequest:
+    """Request that fails with queued errors before it succeeds."""
+
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def __call__(self) -> str:
+        """Make the request, raising the next queued error if any."""
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def respond(limiter: AdaptiveLimiter, latency: float) -> None:
+    # Stands in for a request that held a slot for `latency` seconds
+    limiter.in_flight += 1
+    limiter._release(latency, None)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(limiter_module, "BACKOFF_BASE", 0.0)
+
+
+def test_rate_limit_decreases_once_per_cooldown():
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+
+    for _ in range(2):
+        with pytest.raises(ProviderError), limiter.slot_sync():
+            raise ProviderError(429)
+
+    assert limiter.limit == 8 * RATE_LIMIT_DECREASE
+    assert limiter.in_flight == 0
+
+
+def test_rate_limit_stops_at_min_concurrency(monkeypatch):
+    limiter = AdaptiveLimiter(Limits(max_concurrency=4, min_concurrency=3))
+    monkeypatch.setattr(limiter_module, "DECREASE_COOLDOWN", 0.0)
+
+    for _ in range(3):
+        with pytest.raises(ProviderError), limiter.slot_sync():
+            raise ProviderError(429)
+
+    assert limiter.limit == 3
+
+
+def test_good_responses_increase_limit_additively():
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    limiter.limit = 4.0
+
+    for _ in range(4):
+        with limiter.slot_sync():
+            pass
+
+    # One more slot per limit's worth of good responses
+    assert 4.9 < limiter.limit < 5.0
+    limiter.limit = 7.99
+    with limiter.slot_sync():
+        pass
+    assert limiter.limit == 8
+
+
+def test_rising_latency_decreases_limit():
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    for _ in range(20):
+        respond(limiter, 0.1)
+    assert limiter.limit == 8
+
+    for _ in range(5):
+        respond(limiter, 1.0)
+
+    assert limiter.limit == 8 * SLOW_DECREASE
+
+
+def test_call_sync_retries_rate_limit():
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    request = FlakyRequest(ProviderError(429), ProviderError(503))
+
+    assert limiter.call_sync(request) == "ok"
+    assert request.attempts == 3
+    assert limiter.limit < 8
+
+
+def test_call_retries_rate_limit():
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    request = FlakyRequest(ProviderError(429))
+
+    async def call() -> str:
+        return request()
+
+    assert asyncio.run(limiter.call(call)) == "ok"
+    assert request.attempts == 2
+
+
+def test_call_sync_gives_up(monkeypatch):
+    monkeypatch.setattr(limiter_module, "MAX_RETRIES", 2)
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    request = FlakyRequest(*(ProviderError(429) for _ in range(5)))
+
+    with pytest.raises(ProviderError):
+        limiter.call_sync(request)
+    assert request.attempts == 3
+
+
+def test_call_sync_does_not_retry_client_errors():
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    request = FlakyRequest(ProviderError(400))
+
+    with pytest.raises(ProviderError):
+        limiter.call_sync(request)
+    assert request.attempts == 1
+
+
+def test_rate_limit_pauses_admission(monkeypatch):
+    monkeypatch.setattr(limiter_module, "BACKOFF_BASE", 0.2)
+    limiter = AdaptiveLimiter(Limits(max_concurrency=8))
+    with pytest.raises(ProviderError), limiter.slot_sync():
+        raise ProviderError(429)
+
+    start = time.monotonic()
+    with limiter.slot_sync():
+        pass
+    assert time.monotonic() - start >= 0.15
@@ -0,0 +1,95 @@
+"""Tests of the article packer."""
+
+import pytest
+from packing import ArticlePacker, CharEncoding, _minhash_bands, _shingles
+
+
+class ByteEncoding:
+    """Encoding with one token per UTF-8 byte, like BPE on rare characters."""
+
+    def encode_ordinary(self, text: str) -> list[int]:
+        """Split a text into its UTF-8 bytes."""
+        return list(text.encode("utf-8"))
+
+    def encode_ordinary_batch(self, texts: list[str]) -> list[list[int]]:
+        """Split texts into their UTF-8 bytes."""
+        return [self.encode_ordinary(text) for text in texts]
+
+    def decode(self, tokens: list[int], errors: str = "replace") -> str:
+        """Decode UTF-8 bytes."""
+        return bytes(tokens).decode("utf-8", errors=errors)
+
+
+def paragraph(topic: str, words: int = 40) -> str:
+    return " ".join(f"{topic}{i}" for i in range(words))
+
+
+def article(*paragraphs: str, title: str = "Title") -> dict:
+    return {"title": title, "image_url": None, "raw_content": "\n".join(paragraphs)}
+
+
+@pytest.fixture
+def packer():
+    packer = ArticlePacker(token_budget=200)
+    packer.encoding = CharEncoding()
+    return packer
+
+
+def test_exact_and_near_duplicates_are_dropped(packer):
+    text = paragraph("alpha")
+    near = text.replace("alpha39", "omega")
+    cleaned = packer.clean(
+        [article(text, paragraph("beta")), article(text.upper(), near)]
+    )
+
+    assert [len(paragraphs) for paragraphs in cleaned] == [2, 0]
+
+
+def test_boilerplate_is_dropped(packer):
+    cleaned = packer.clean(
+        [article("Subscribe to our newsletter for more stories", paragraph("gamma"))]
+    )
+
+    assert len(cleaned[0]) == 1
+
+
+def test_packing_stays_within_the_budget(packer):
+    articles = [
+        article(*(paragraph(f"a{i}x") for i in range(20)), title="A"),
+        article(*(paragraph(f"b{i}x") for i in range(5)), title="B"),
+    ]
+    packed = packer.pack(articles)
+
+    assert packed.packed_tokens <= packer.token_budget
+    assert packed.dropped_tokens > 0
+    assert "Title: A" in packed.text and "Title: B" in packed.text
+
+
+def test_dropped_tokens_use_the_encoding():
+    packer = ArticlePacker(token_budget=100)
+    packer.encoding = ByteEncoding()
+    korean = " ".join(["한국어 문단입니다"] * 40)
+    packed = packer.pack([article(korean)])
+
+    # Each Hangul syllable is three byte tokens, more than chars / 4 counts
+    assert packed.dropped_tokens > len(korean) // 4
+
+
+def test_cut_paragraphs_end_on_a_whole_word():
+    packer = ArticlePacker(token_budget=100)
+    packer.encoding = ByteEncoding()
+    packed = packer.pack([article(" ".join(["한국어 문단입니다"] * 40))])
+
+    assert "�" not in packed.text
+    content = packed.text.split("Content: ")[1].removesuffix("...")
+    assert content.split()[-1] in ("한국어", "문단입니다")
+
+
+def test_minhash_bands_match_for_similar_paragraphs():
+    text = paragraph("delta", 200)
+    similar = text.replace("delta199", "epsilon")
+    other = paragraph("zeta", 200)
+
+    bands = set(_minhash_bands(_shingles(text)))
+    assert bands & set(_minhash_bands(_shingles(similar)))
+    assert not bands & set(_minhash_bands(_shingles(other)))
@@ -0,0 +1,8 @@
+"""Make the flat modules of the stock ticker analysis agent importable."""
+
+import sys
+from pathlib import Path
+
+# The agent runs from its own directory, which the tests put first on the path
+AGENT_DIR = Path(__file__).parents[2] / "agent_practice" / "stock_ticker_analysis_agent"
+sys.path.insert(0, str(AGENT_DIR))
@@ -0,0 +1,32 @@
+"""Tests of the supervisor's planning shortcut."""
+
+import pytest
+from agent import needs_plan
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Analyze AAPL",
+        "Write a newsletter about AAPL",
+        "Analyze AAPL with a paragraph summary",
+        "AAPL biography and plotting tips",
+        "Analyze AAPL: news, financials and charts",
+    ],
+)
+def test_default_plan(query):
+    assert not needs_plan(query)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Show AAPL charts",
+        "AAPL news",
+        "AAPL 뉴스를 알려줘",
+        "AAPL 차트만",
+        "Only the chart",
+    ],
+)
+def test_partial_plan(query):
+    assert needs_plan(query)
@@ -0,0 +1,35 @@
+"""Tests of chart downsampling."""
+
+import numpy as np
+from downsample import bucket_starts, downsample_line, downsample_ohlc
+
+
+def test_series_near_the_budget_are_kept():
+    assert bucket_starts(252, 250) is None
+    assert bucket_starts(300, 250) is None
+    assert len(bucket_starts(1260, 250)) == 250
+
+
+def test_candles_span_every_price():
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(size=1000))
+    ohlc = np.column_stack([close - 1, close + 2, close - 2, close])
+    starts = bucket_starts(len(ohlc), 100)
+
+    candles = downsample_ohlc(ohlc, starts)
+    assert candles.shape == (100, 4)
+    assert candles[0, 0] == ohlc[0, 0]
+    assert candles[-1, 3] == ohlc[-1, 3]
+    assert candles[:, 1].max() == ohlc[:, 1].max()
+    assert candles[:, 2].min() == ohlc[:, 2].min()
+
+
+def test_lines_skip_the_warm_up():
+    values = np.arange(1000, dtype=np.float32)
+    values[:15] = np.nan
+    starts = bucket_starts(len(values), 100)
+
+    line = downsample_line(values, starts)
+    assert np.isnan(line[0])
+    assert line[1] == 17.0
+    assert line.dtype == np.float32
@@ -0,0 +1,49 @@
+"""Tests of the market data cache."""
+
+import time
+
+import pandas as pd
+from market_data import EMPTY_FUNDAMENTALS_TTL, FUNDAMENTALS_TTL, MarketData
+
+
+class StatementProvider:
+    """Provider that returns queued income statements and counts requests."""
+
+    def __init__(self, *frames: pd.DataFrame) -> None:
+        self.frames = list(frames)
+        self.requests = 0
+
+    def history(self, tickers, start, end):
+        """Return no bars."""
+        return {}
+
+    def financials(self, ticker, freq):
+        """Return the next queued statement."""
+        self.requests += 1
+        return self.frames.pop(0)
+
+
+def statement() -> pd.DataFrame:
+    return pd.DataFrame({pd.Timestamp("2024-12-31"): [1.0]}, index=["Total Revenue"])
+
+
+def test_empty_statements_expire_early(monkeypatch):
+    provider = StatementProvider(pd.DataFrame(), statement())
+    market_data = MarketData(provider)
+    now = time.time()
+
+    assert market_data.financials("AAPL").empty
+    monkeypatch.setattr(time, "time", lambda: now + EMPTY_FUNDAMENTALS_TTL + 1)
+    assert not market_data.financials("AAPL").empty
+    assert provider.requests == 2
+
+
+def test_statements_are_cached(monkeypatch):
+    provider = StatementProvider(statement())
+    market_data = MarketData(provider)
+    now = time.time()
+
+    market_data.financials("AAPL")
+    monkeypatch.setattr(time, "time", lambda: now + FUNDAMENTALS_TTL - 60)
+    market_data.financials("AAPL")
+    assert provider.requests == 1
@@ -0,0 +1,129 @@
+"""Tests of the columnar price store."""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from price_store import OHLCV_COLUMNS, PriceStore
+
+
+def bars(start: str, periods: int, close: float = 100.0) -> pd.DataFrame:
+    """Make business-day bars with a rising close."""
+    index = pd.bdate_range(start, periods=periods, name="Date")
+    values = close + np.arange(periods, dtype=np.float64)
+    return pd.DataFrame({column: values for column in OHLCV_COLUMNS}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(tmp_path)
+
+
+def test_refresh_appends_new_bars(store):
+    store.write(
+        "AAPL", bars("2024-01-01", 10), datetime(2024, 1, 1), datetime(2024, 1, 13)
+    )
+    refresh = bars("2024-01-08", 10, close=105.0)
+    store.write("AAPL", refresh, datetime(2024, 1, 8), datetime(2024, 1, 20))
+
+    frame = store.read("AAPL", datetime(2024, 1, 1))
+    assert len(frame) == 15
+    assert frame.index.is_monotonic_increasing
+    assert frame["Close"].iloc[-1] == 114.0
+    assert len(list(store._dir("AAPL").glob("*.i8"))) == 1
+
+
+def test_corrected_bars_leave_earlier_frames_unchanged(store):
+    store.write(
+        "AAPL", bars("2024-01-01", 10), datetime(2024, 1, 1), datetime(2024, 1, 13)
+    )
+    before = store.read("AAPL", datetime(2024, 1, 1))
+    corrected = bars("2024-01-08", 5, close=500.0)
+    store.write("AAPL", corrected, datetime(2024, 1, 8), datetime(2024, 1, 13))
+
+    after = store.read("AAPL", datetime(2024, 1, 1))
+    assert before["Close"].iloc[-1] == 109.0
+    assert after["Close"].iloc[-1] == 504.0
+    assert len(after) == 10
+    # The old generation is removed once the metadata points at the new one
+    assert len(list(store._dir("AAPL").glob("*.i8"))) == 1
+
+
+def test_prepend_rewrites_before_stored_bars(store):
+    store.write(
+        "AAPL", bars("2024-02-01", 5), datetime(2024, 2, 1), datetime(2024, 2, 8)
+    )
+    store.write(
+        "AAPL", bars("2024-01-29", 3), datetime(2024, 1, 29), datetime(2024, 2, 1)
+    )
+
+    frame = store.read("AAPL", datetime(2024, 1, 1))
+    assert len(frame) == 8
+    assert frame.index[0] == pd.Timestamp("2024-01-29")
+    assert frame.index.is_monotonic_increasing
+
+
+def test_empty_refresh_keeps_bars_and_stays_stale(store):
+    store.write(
+        "AAPL", bars("2024-01-01", 10), datetime(2024, 1, 1), datetime(2024, 1, 13)
+    )
+    meta = store._meta("AAPL")
+    store.write(
+        "AAPL", bars("2024-01-08", 0), datetime(2024, 1, 8), datetime(2024, 1, 20)
+    )
+
+    assert len(store.read("AAPL", datetime(2024, 1, 1))) == 10
+    assert store._meta("AAPL") == meta
+    # The range is still missing, so the next refresh fetches it again
+    assert store.missing_ranges(
+        "AAPL", datetime(2024, 1, 1), datetime(2024, 1, 20), max_age=3600
+    ) == [(datetime(2024, 1, 13), datetime(2024, 1, 20))]
+
+
+def test_empty_first_fetch_is_not_remembered(store):
+    store.write(
+        "AAPL", bars("2024-01-01", 0), datetime(2024, 1, 1), datetime(2024, 1, 13)
+    )
+
+    assert store.read("AAPL", datetime(2024, 1, 1)).empty
+    assert store.missing_ranges(
+        "AAPL", datetime(2024, 1, 1), datetime(2024, 1, 13), max_age=3600
+    ) == [(datetime(2024, 1, 1), datetime(2024, 1, 13))]
+
+
+def test_non_contiguous_range_is_refused(store):
+    store.write(
+        "AAPL", bars("2024-01-01", 5), datetime(2024, 1, 1), datetime(2024, 1, 6)
+    )
+    with pytest.raises(ValueError):
+        store.write(
+            "AAPL", bars("2024-03-01", 5), datetime(2024, 3, 1), datetime(2024, 3, 8)
+        )
+
+
+def test_unversioned_columns_are_read_and_replaced(store):
+    store.write(
+        "AAPL", bars("2024-01-01", 5), datetime(2024, 1, 1), datetime(2024, 1, 6)
+    )
+    # The layout before column generations
+    meta = store._meta("AAPL")
+    for path, legacy in zip(
+        store._paths("AAPL", meta.pop("generation")), ("dates.i8", "ohlcv.f8")
+    ):
+        path.rename(path.with_name(legacy))
+    store._write_meta("AAPL", meta)
+    assert len(store.read("AAPL", datetime(2024, 1, 1))) == 5
+
+    store.write(
+        "AAPL",
+        bars("2024-01-01", 5, close=1.0),
+        datetime(2024, 1, 1),
+        datetime(2024, 1, 6),
+    )
+    assert store.read("AAPL", datetime(2024, 1, 1))["Close"].iloc[0] == 1.0
+    assert sorted(path.name for path in store._dir("AAPL").iterdir()) == [
+        "dates.0.i8",
+        "meta.json",
+        "ohlcv.0.f8",
+    ]
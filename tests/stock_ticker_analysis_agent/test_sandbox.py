@@ -0,0 +1,89 @@
+"""Tests of the limits and secret isolation of the sandbox workers."""
+
+import os
+
+import pytest
+from sandbox import SandboxPool
+
+SECRET = "sk-test-secret"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    environ = dict(os.environ)
+    os.environ["OPENAI_API_KEY"] = SECRET
+    try:
+        pool = SandboxPool(size=1, timeout=4.0, cpu_seconds=1, memory_bytes=2 * 1024**3)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+    yield pool
+    pool.close()
+
+
+def test_workers_do_not_see_secrets(pool):
+    result = pool.run("import os\nprint(os.environ.get('OPENAI_API_KEY'))")
+    assert result.output == "None\n"
+
+
+@pytest.mark.parametrize(
+    "path", ["'/proc/self/environ'", "f'/proc/{os.getppid()}/environ'"]
+)
+def test_process_environments_are_unreadable(pool, path):
+    result = pool.run(f"import os\nprint(open({path}, 'rb').read())")
+    assert result.output.startswith("PermissionError")
+    assert SECRET not in result.output
+
+
+def test_env_files_are_unreadable(pool, tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text(f"OPENAI_API_KEY={SECRET}\n")
+    link = tmp_path / "settings.txt"
+    link.symlink_to(env_file)
+
+    for path in (env_file, link):
+        result = pool.run(f"print(open({str(path)!r}).read())")
+        assert result.output.startswith("PermissionError")
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import subprocess\nsubprocess.run(['env'])",
+        "import os\nos.system('env')",
+    ],
+)
+def test_other_programs_cannot_start(pool, code):
+    assert pool.run(code).output.startswith("PermissionError")
+
+
+def test_workers_run_in_an_empty_directory(pool):
+    pool.run("open('notes.txt', 'w').write('x')")
+    result = pool.run("import os\nprint(os.getcwd(), os.listdir())")
+    workdir, files = result.output.split(" ", 1)
+    assert workdir != os.getcwd()
+    assert files == "['notes.txt']\n"
+
+
+def test_runs_do_not_share_names(pool):
+    pool.run("leak = 1")
+    assert pool.run("print(leak)").output.startswith("NameError")
+
+
+def test_timeout_replaces_the_worker(pool):
+    result = pool.run("import time\ntime.sleep(60)")
+    assert result.output.startswith("TimeoutError")
+    assert pool.run("print(1 + 1)").output == "2\n"
+
+
+def test_cpu_limit_stops_the_worker(pool):
+    result = pool.run("while True:\n    pass")
+    assert result.output.startswith("RuntimeError('Execution was stopped")
+    assert pool.run("print(1 + 1)").output == "2\n"
+
+
+def test_memory_limit_raises_and_recycles(pool):
+    result = pool.run("data = bytearray(4 * 1024**3)")
+    assert result.output.startswith("MemoryError")
+    assert result.recycle
+    assert pool.run("print(1 + 1)").output == "2\n"